@@ -5,6 +5,7 @@ Drawing program for pixel art.
 There are 5 states, the main interface and 4 extra UI windows,
 they can be opened by clicking their respective buttons,
 they're for colors, grid, grid history and settings.
+The color and grid UIs are built when they're first opened or when the user is idle.
 
 Mouse info:
     The MOUSE object contains current and previous coordinates, pressed and released buttons,
@@ -98,7 +99,6 @@ Animations:
 - UI to view grid history
 - dropdown with scrollbar
 - custom utility wins
-- have multiple files open
 - handle old data files
 - UIs as separate windows?
 - gif?
@@ -119,17 +119,29 @@ Animations:
 
 import os
 import json
-from tkinter import filedialog, messagebox
+import runpy
+from math import ceil
 from threading import Thread
 from pathlib import Path
 from json import JSONDecodeError
 from collections.abc import Callable
 from sys import argv, stderr
+from time import perf_counter
 from io import BytesIO
-from typing import NoReturn, Self, TypeAlias, Final, Any
+from typing import BinaryIO, NoReturn, Self, TypeAlias, Final, Any
 
 os.environ["PYGAME_BLEND_ALPHA_SDL2"] = os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
 
+if __name__ == "__main__" and "--batch" in argv[1:]:
+    # Runs before the window is created, workers import src.batch instead of this file
+    runpy.run_module("src.batch", run_name="__main__", alter_sys=True)
+
+# Name and end time of every startup stage
+_STARTUP_TIMES: Final[list[tuple[str, float]]] = [("Start", perf_counter())]
+_SHOULD_PROFILE_STARTUP: Final[bool] = "--profile-startup" in argv[1:]
+if _SHOULD_PROFILE_STARTUP:
+    argv.remove("--profile-startup")  # Not parsed with the file flags
+
 import pygame as pg
 import numpy as np
 from pygame import (
@@ -138,14 +150,17 @@ from pygame import (
     WINDOWMOVED, WINDOWSIZECHANGED, WINDOWFOCUSLOST, WINDOWPOS_CENTERED,
     MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEWHEEL, KEYDOWN, KEYUP, KEYMAPCHANGED,
     K_ESCAPE, K_F1, K_F5, K_F6, K_F7, K_F8, K_F11,
-    K_1, K_a, K_b, K_g, K_h, K_o, K_s, K_v, K_w, K_COMMA,
+    K_TAB, K_1, K_a, K_b, K_g, K_h, K_i, K_k, K_o, K_q, K_s, K_u, K_v, K_w, K_COMMA,
 )
-from numpy import uint8
+from numpy import uint8, uint32
 from numpy.typing import NDArray
-from PIL import Image
+# tkinter, PIL and cv2 are slow to import, they're imported by the functions that need them
+_STARTUP_TIMES.append(("Import pygame and numpy", perf_counter()))
 
 from src.win import WIN, WIN_SURF, WIN_INIT_W, WIN_INIT_H
+_STARTUP_TIMES.append(("Create window", perf_counter()))
 
+from src.classes.grid import Grid, SaveInfo, ask_save_dir_creation, try_write_save
 from src.classes.grid_ui import GridUI
 from src.classes.color_ui import ColorPicker
 from src.classes.settings_ui import SettingsUI
@@ -164,7 +179,7 @@ from src.classes.devices import MOUSE, KEYBOARD
 
 import src.obj_utils as objs
 import src.vars as my_vars
-from src.utils import get_pixels, get_brush_dim_checkbox_info, print_funcs_profiles
+from src.utils import get_img, get_brush_dim_checkbox_info, print_funcs_profiles
 from src.obj_utils import UIElement
 from src.file_utils import (
     FileError, prettify_path, handle_file_os_error,
@@ -172,6 +187,29 @@ from src.file_utils import (
     try_get_paths, try_create_dir,
 )
 from src.lock_utils import LockError, try_lock_file
+from src.canvas import (
+    Box, HistorySnapshot, Canvas, get_img_brush_kernel,
+    SYMMETRY_NONE, SYMMETRY_DIAGONAL, SYMMETRY_RADIAL_4, SYMMETRY_RADIAL_8,
+)
+from src.documents import (
+    ParkedCanvas, EvictInfo, Document, Documents, try_write_evicted, try_read_evicted,
+)
+from src.io_executor import (
+    IO_JOB_DONE, IO_JOB_PROGRESS,
+    submit_io_job, submit_compute_job, post_io_progress, wait_io_jobs,
+)
+from src.tiles_utils import (
+    SAVE_MODE_FAST, SAVE_MODE_DEFAULT, SAVE_MODE_ARCHIVAL,
+    get_tiles_palette, get_kmeans_palette, quantize_tiles,
+)
+from src.project_utils import (
+    PROJECT_SUFFIX, ProgressCallback, read_tiles, read_project_tiles, read_project_info,
+)
+from src.journal_utils import (
+    JournalRecord, JOURNAL_MAX_RECORDS,
+    get_new_journal_path, get_journals_paths, get_journal_record, replay_journal,
+    try_read_journal, try_write_journal, try_append_journal,
+)
 from src.type_utils import XY, WH, HexColor, BlitInfo, RectPos
 from src.consts import (
     BLACK, WHITE, YELLOW, HEX_BLACK,
@@ -189,8 +227,8 @@ from src.imgs import (
     SETTINGS_OFF_IMG, SETTINGS_ON_IMG,
 )
 WIN.set_icon(ICON_IMG)
+_STARTUP_TIMES.append(("Import modules and images", perf_counter()))
 
-_StatesObjs: TypeAlias = tuple[tuple[UIElement, ...], ...]
 _IgnoredExceptions: TypeAlias = tuple[type[Exception], ...] | None
 _PaletteData: TypeAlias = dict[str, Any] | None
 
@@ -229,6 +267,16 @@ _Y_MIRROR: Final[Checkbox] = Checkbox(
     RectPos(_X_MIRROR.rect.right + 10, _BRUSH_DIMS.rect.bottom + 10, "topleft"),
     (Y_MIRROR_OFF_IMG, Y_MIRROR_ON_IMG), None, "Mirror Vertically\n(SHIFT+V)"
 )
+_SYMMETRY: Final[Dropdown] = Dropdown(
+    RectPos(_X_MIRROR.rect.x, _X_MIRROR.rect.bottom + 34, "topleft"),
+    (
+        ("None"    , "Only mirrors"                , SYMMETRY_NONE),
+        ("Diagonal", "Mirror diagonally"           , SYMMETRY_DIAGONAL),
+        ("Radial 4", "Rotate 4 times"              , SYMMETRY_RADIAL_4),
+        ("Radial 8", "Rotate and mirror\n8 times" , SYMMETRY_RADIAL_8),
+    ),
+    "Symmetry", text_h=20
+)
 
 _ADD_COLOR: Final[Button] = Button(
     RectPos(WIN_INIT_W        - 10, WIN_INIT_H - 10, "bottomright"),
@@ -260,29 +308,46 @@ _FILE_TEXT_LABEL: Final[HoverableTextLabel] = HoverableTextLabel(
 )
 _UNSAVED_ICON: Final[UnsavedIcon] = UnsavedIcon()
 
-_COLOR_PICKER: Final[ColorPicker] = ColorPicker()
-_GRID_UI: Final[GridUI]           = GridUI()
-_SETTINGS_UI: Final[SettingsUI]   = SettingsUI()
+# The settings are read every frame, the color and grid UIs are built by Dixel when needed
+_SETTINGS_UI: Final[SettingsUI] = SettingsUI()
 
-_STATES_MAIN_OBJS: Final[_StatesObjs] = (
+# States that aren't built yet have no objects
+_STATES_MAIN_OBJS: Final[list[tuple[UIElement, ...]]] = [
     (
         _SAVE, _SAVE_AS, _OPEN, _CLOSE,
-        _GRID_MANAGER, _BRUSH_DIMS, _X_MIRROR, _Y_MIRROR,
+        _GRID_MANAGER, _BRUSH_DIMS, _X_MIRROR, _Y_MIRROR, _SYMMETRY,
         _ADD_COLOR, _EDIT_GRID, _OPEN_SETTINGS,
         _PALETTES_MANAGER, _TOOLS_MANAGER,
         _FPS_TEXT_LABEL, _FILE_TEXT_LABEL, _UNSAVED_ICON,
     ),
-    (_COLOR_PICKER,),
-    (_GRID_UI,),
+    (),
+    (),
     (),
     (_SETTINGS_UI,),
-)
+]
 
 _EXIT_NO: Final[int]        = 0
 _EXIT_OK: Final[int]        = 1
 _EXIT_CRASH: Final[int]     = 2
 _EXIT_INTERRUPT: Final[int] = 3
 
+_IO_JOB_DATA_SAVE: Final[int]     = 0
+_IO_JOB_PALETTES_SAVE: Final[int] = 1
+_IO_JOB_IMG_SAVE: Final[int]      = 2
+_IO_JOB_UNSAVED_CHECK: Final[int] = 3
+_IO_JOB_JOURNAL: Final[int]       = 4
+_IO_JOB_OPEN: Final[int]          = 5
+_IO_JOB_QUANTIZE: Final[int]      = 6
+_IO_JOB_IMG_SAVE_AS: Final[int]   = 7
+_IO_JOB_DOC_EVICT: Final[int]     = 8
+_IO_JOB_DOC_READ: Final[int]      = 9
+_IO_JOB_BRUSH_READ: Final[int]    = 10
+
+_OPEN_PREVIEW_MAX_DIM: Final[int] = 128
+_IMG_PALETTE_MAX_SIZE: Final[int] = 4_096
+_KMEANS_MAX_COLORS: Final[int]    = 256
+_CUSTOM_BRUSH_MAX_DIM: Final[int] = 64
+
 _WIN_EVENTS: Final[tuple[int, ...]] = (
     WINDOWRESTORED, WINDOWMINIMIZED, WINDOWMAXIMIZED,
     WINDOWMOVED, WINDOWSIZECHANGED,
@@ -299,8 +364,16 @@ _FILE_SAVE_AS_REQUEST: Final[int]       = event.custom_type()
 _FILE_OPEN_REQUEST: Final[int]          = event.custom_type()
 _FILE_CRASH_SAVE_DIR_CHANGE: Final[int] = event.custom_type()
 _TIMED_UPDATE_1000: Final[int]          = event.custom_type()
+_KMEANS_NUM_COLORS_CHOICE: Final[int]   = event.custom_type()
+_BRUSH_FILE_CHOICE: Final[int]          = event.custom_type()
 _CLOCK: Final[Clock] = Clock()
 
+_DATA_PATH: Final[Path] = Path("assets", "data", "data.json")
+_PALETTES_PATH: Final[Path] = Path("assets", "data", "palettes.json")
+# Used by older versions, one file per palette
+_LEGACY_PALETTES_DIR_PATH: Final[Path] = Path("assets", "data", "palettes")
+_STARTUP_TIMES.append(("Create objects", perf_counter()))
+
 def stop(e: BaseException) -> NoReturn:
     """
     Exits gracefully.
@@ -311,12 +384,27 @@ def stop(e: BaseException) -> NoReturn:
         exception
     """
 
+    wait_io_jobs()
     WIN.destroy()
     pg.quit()
     print_funcs_profiles()
 
     raise e
 
+def _print_startup_profile() -> None:
+    """Prints the duration of every startup stage and the time to the first frame."""
+
+    name: str
+    end_time: float
+
+    prev_end_time: float = _STARTUP_TIMES[0][1]
+    for name, end_time in _STARTUP_TIMES[1:]:
+        print(f"{name}: {(end_time - prev_end_time) * 1_000:.1f}ms")
+        prev_end_time = end_time
+
+    tot_time: float = _STARTUP_TIMES[-1][1] - _STARTUP_TIMES[0][1]
+    print(f"Time to first frame: {tot_time * 1_000:.1f}ms (python -X importtime for every import)")
+
 def _ensure_valid_img_format(file_str: str) -> str:
     """
     Changes a path to a png if it's not a supported format.
@@ -335,12 +423,32 @@ def _ensure_valid_img_format(file_str: str) -> str:
     sections: list[str] = file_path.name.rsplit(".", maxsplit=1)
     if len(sections) == 1:
         sections.append("png")
-    elif sections[1] not in ("png", "webp", "bmp", "tiff", "dds", "tga", "ico"):
+    elif sections[1] not in ("dixel", "png", "webp", "bmp", "tiff", "dds", "tga", "ico"):
         sections[1] = "png"
 
     return str(file_path.parent / f"{sections[0]}.{sections[1]}")
 
 
+def _read_grid_img(f: BinaryIO, file_path: Path) -> Surface:
+    """
+    Reads a grid image from a locked image or project file.
+
+    Args:
+        file, path
+    Returns:
+        image
+    """
+
+    if file_path.suffix == PROJECT_SUFFIX:
+        return get_img(read_project_tiles(f)).convert_alpha()
+
+    from PIL import Image
+
+    img_bytes_io: BytesIO = BytesIO(try_read_file(f))
+    img: Image.Image = Image.open(img_bytes_io).convert("RGBA")
+    return pg.image.frombytes(img.tobytes(), img.size, "RGBA").convert_alpha()
+
+
 def _try_get_grid_img(file_str: str, ignored_exceptions: _IgnoredExceptions) -> Surface | None:
     """
     Loads a grid image with retries.
@@ -363,9 +471,7 @@ def _try_get_grid_img(file_str: str, ignored_exceptions: _IgnoredExceptions) ->
         try:
             with file_path.open("rb") as f:
                 try_lock_file(f, should_be_shared=True)
-                img_bytes_io: BytesIO = BytesIO(try_read_file(f))
-                img: Image.Image = Image.open(img_bytes_io).convert("RGBA")
-                pg_img = pg.image.frombytes(img.tobytes(), img.size, "RGBA").convert_alpha()
+                pg_img = _read_grid_img(f, file_path)
             break
         except (FileNotFoundError, PermissionError, LockError, FileError, pg.error) as e:
             exception = type(e)
@@ -388,18 +494,170 @@ def _try_get_grid_img(file_str: str, ignored_exceptions: _IgnoredExceptions) ->
             break
 
     if pg_img is None and (ignored_exceptions is not None and exception not in ignored_exceptions):
+        from tkinter import messagebox
         messagebox.showerror("Image Load Failed", f"{file_path.name}: {error_str}")
     return pg_img
 
 
+def _try_read_file_tiles(
+        file_str: str, on_progress: ProgressCallback | None = None
+) -> tuple[NDArray[uint32] | None, str]:
+    """
+    Reads the tiles of an image or project with retries, it doesn't create surfaces.
+
+    Args:
+        file string, function called every few project chunks (default = None)
+    Returns:
+        tiles (None on failure), error string
+    """
+
+    attempt_i: int
+    should_retry: bool
+
+    from PIL import UnidentifiedImageError
+
+    tiles: NDArray[uint32] | None = None
+    error_str: str = ""
+    for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+        try:
+            tiles = read_tiles(Path(file_str), on_progress)
+            break
+        except (
+            FileNotFoundError, PermissionError, LockError, FileError,
+            UnidentifiedImageError, ValueError
+        ) as e:
+            error_str = {
+                FileNotFoundError: "File missing.",
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+                UnidentifiedImageError: "Invalid image.",
+                ValueError: "Invalid image.",
+            }[type(e)]
+
+            break
+        except OSError as e:
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            break
+
+    return tiles, error_str
+
+
+def _post_open_progress(file_str: str, tiles: NDArray[uint32], progress: float) -> None:
+    """
+    Posts a downsampled copy of the partially read tiles of an opened file.
+
+    Args:
+        file string, tiles, progress (0-1)
+    """
+
+    step: int = ceil(max(tiles.shape) / _OPEN_PREVIEW_MAX_DIM)
+    post_io_progress(_IO_JOB_OPEN, file_str, progress, (tiles[::step, ::step].copy(), step))
+
+
+def _get_quantized_tiles(
+        tiles: NDArray[uint32], hex_colors: list[HexColor] | None, num_colors: int
+) -> tuple[NDArray[uint32], list[HexColor]]:
+    """
+    Reduces the colors of tiles to a palette or to a number of colors found with k-means.
+
+    Args:
+        tiles, palette (None = k-means), number of colors
+    Returns:
+        tiles, palette
+    """
+
+    if hex_colors is None:
+        hex_colors = get_kmeans_palette(tiles, num_colors)
+    return quantize_tiles(tiles, hex_colors), hex_colors
+
+
+def _try_save_file(file_path: Path, content: bytes) -> str | None:
+    """
+    Replaces a file with a new one, creating its directory, with retries.
+
+    Args:
+        path, content
+    Returns:
+        error string (can be None)
+    """
+
+    should_retry: bool
+
+    temp_file_path: Path = file_path.with_suffix(".tmp")
+    error_str: str | None = None
+    dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
+    system_attempt_i: int       = FILE_ATTEMPT_START_I
+    while (
+        dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
+        system_attempt_i       <= FILE_ATTEMPT_STOP_I
+    ):
+        try:
+            # If you open in write mode it will clear the file even if it's locked
+            with temp_file_path.open("ab") as f:
+                try_lock_file(f, should_be_shared=False)
+                try_write_file(f, content)
+            try_replace_file(temp_file_path, file_path)
+            error_str = None
+            break
+        except FileNotFoundError:
+            dir_creation_attempt_i += 1
+            error_str = try_create_dir(file_path.parent, dir_creation_attempt_i)
+            if error_str is not None:
+                error_str = f"Directory {error_str}"
+                break
+        except (PermissionError, LockError, FileError) as e:
+            error_str = {
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+            break
+        except OSError as e:
+            system_attempt_i += 1
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and system_attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** system_attempt_i)
+                continue
+
+            try_remove_file(temp_file_path)
+            break
+
+    return error_str
+
+
+def _try_save_closed_doc(save_info: SaveInfo, journal_path: Path) -> str | None:
+    """
+    Saves the image of a closed document and removes its journal if it succeeds.
+
+    Args:
+        save info, journal path
+    Returns:
+        error string (can be None)
+    """
+
+    error_str: str | None = try_write_save(save_info)
+    if error_str is None:
+        try_remove_file(journal_path)
+
+    return error_str
+
+
 class _Dixel:
     """Drawing program for pixel art."""
 
     __slots__ = (
         "_orig_win_xy", "_orig_win_wh", "_is_minimized", "_is_maximized", "_is_fullscreen",
-        "_file_str", "_new_file_str", "_is_saved",
+        "_file_str", "_new_file_str", "_opened_tiles", "_is_saved",
         "_is_asking_file_save_as", "_is_asking_file_open", "_is_asking_crash_save_dir",
-        "_states_funcs", "_state_i",
+        "_states_funcs", "_state_i", "_hex_color_to_edit",
+        "_docs", "_doc_to_activate", "_saved_palettes_bytes", "_has_legacy_palettes",
+        "_is_checking_unsaved", "_queued_unsaved_color", "_is_quantizing", "_is_loading_brush",
+        "_color_picker", "_grid_editor", "_grid_ratio",
     )
 
     def __init__(self: Self) -> None:
@@ -415,6 +673,8 @@ class _Dixel:
 
         self._file_str: str     = ""
         self._new_file_str: str = ""
+        # Tiles read from the new file, the grid UI can change them before they're shown
+        self._opened_tiles: NDArray[uint32] | None = None
         self._is_saved: bool = False
 
         self._is_asking_file_save_as: bool   = False
@@ -428,9 +688,27 @@ class _Dixel:
             STATE_I_SETTINGS: self._settings_ui,
         }
         self._state_i: int = STATE_I_MAIN  # Used to sync objs.state_i when state changes
+        self._hex_color_to_edit: HexColor | None = None
+
+        # Palettes are rewritten only if different
+        self._saved_palettes_bytes: bytes = b""
+        self._has_legacy_palettes: bool = False
+
+        # Only one check runs at a time, the latest request runs after it
+        self._is_checking_unsaved: bool = False
+        self._queued_unsaved_color: pg.Color | None = None
+        self._is_quantizing: bool = False
+        self._is_loading_brush: bool = False
+
+        # Built on first entry or when idle, see _prewarm_state_uis
+        self._color_picker: ColorPicker | None = None
+        self._grid_editor: GridUI | None = None
+        # Kept here until the grid UI is built
+        self._grid_ratio: tuple[float, float] | None = None
 
         self._load_data()
         self._load_palettes()
+        _STARTUP_TIMES.append(("Load data and palettes", perf_counter()))
 
         img: Surface | None = None
         if len(argv) > 1:
@@ -441,11 +719,17 @@ class _Dixel:
         self._is_saved = img is not None
         if self._is_saved:
             _GRID_MANAGER.grid.set_tiles(img)
+            self._load_project_info(should_set_view=True)
             _UNSAVED_ICON.set_scale(0)
         else:
             self._file_str = ""
             _GRID_MANAGER.grid.refresh_full()
             _UNSAVED_ICON.set_scale(1)
+        self._docs: Documents = Documents(Document(self._file_str, _GRID_MANAGER.grid.canvas))
+        # Document activated when it's read, close active document flag
+        self._doc_to_activate: tuple[Document, bool] | None = None
+        self._recover_journals()
+        _STARTUP_TIMES.append(("Load file", perf_counter()))
         self._refresh_file_text_label()
 
         self._refresh_all_objs()
@@ -459,9 +743,327 @@ class _Dixel:
         if self._is_fullscreen:
             WIN.set_fullscreen(desktop=True)
         WIN.focus()
+        _STARTUP_TIMES.append(("Show window", perf_counter()))
 
         pg.time.set_timer(_TIMED_UPDATE_1000, 1_000)
 
+    def _load_project_info(self: Self, should_set_view: bool) -> None:
+        """
+        Loads the history, palette and view of the opened file if it's a project with retries.
+
+        Args:
+            set view flag
+        """
+
+        attempt_i: int
+        _error_str: str
+        should_retry: bool
+
+        file_path: Path = Path(self._file_str)
+        if file_path.suffix != PROJECT_SUFFIX:
+            return
+
+        info: dict[str, Any] | None = None
+        history: list[tuple[int, int, bytes, bytes]] = []
+        for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+            try:
+                with file_path.open("rb") as f:
+                    try_lock_file(f, should_be_shared=True)
+                    info, history = read_project_info(f)
+                break
+            except (FileNotFoundError, PermissionError, LockError, FileError):
+                break
+            except OSError as e:
+                _error_str, should_retry = handle_file_os_error(e)
+                if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                    pg.time.wait(2 ** attempt_i)
+                    continue
+
+                break
+
+        if info is None:
+            return
+
+        grid: Grid = _GRID_MANAGER.grid
+        if history != []:
+            grid.canvas.set_history(history, info["history_i"])
+            grid.canvas.add_to_history()  # The grid UI can change the tiles before opening
+        if should_set_view:
+            grid.visible_cols = min(max(info["visible_cols"], 1), grid.cols)
+            grid.visible_rows = min(max(info["visible_rows"], 1), grid.rows)
+            grid.offset_x = min(max(info["offset_x"], 0), grid.cols - grid.visible_cols)
+            grid.offset_y = min(max(info["offset_y"], 0), grid.rows - grid.visible_rows)
+            grid.refresh_full()
+
+        palette: list[HexColor] = info["palette"]
+        if palette != [] and palette not in _PALETTES_MANAGER.palettes:
+            _PALETTES_MANAGER.add_palette(palette, color_i=0, offset_y=0, dropdown_i=-1)
+            _PALETTES_MANAGER.refresh_dropdown()
+
+    def _reset_journal(self: Self) -> None:
+        """Starts an empty journal of the active document for the current file."""
+
+        doc: Document = self._docs.active
+        submit_io_job(
+            _IO_JOB_JOURNAL, "Journal Reset Failed.",
+            try_write_journal, doc.journal_path, self._file_str, b""
+        )
+
+        doc.journal_file_str = self._file_str
+        doc.num_journal_records = 0
+        _GRID_MANAGER.grid.canvas.unjournaled_box = None
+
+    def _recover_journals(self: Self) -> None:
+        """
+        Applies the edits in the journals left by a hard kill.
+
+        The first one of the current file is applied to the grid,
+        the others are applied to their file and opened as inactive documents.
+        """
+
+        journal_path: Path
+        doc: Document
+        tiles: NDArray[uint32] | None
+        _error_str: str
+
+        is_active_doc_recovered: bool = False
+        for journal_path in get_journals_paths():
+            journal: tuple[str, list[JournalRecord]] | None = try_read_journal(journal_path)
+            if journal is None or journal[1] == []:
+                try_remove_file(journal_path)
+                continue
+
+            file_str: str = journal[0]
+            if file_str == self._file_str and not is_active_doc_recovered:
+                grid: Grid = _GRID_MANAGER.grid
+                grid.set_info(
+                    replay_journal(grid.tiles, journal[1]),
+                    grid.visible_cols, grid.visible_rows, grid.offset_x, grid.offset_y,
+                    should_reset_history=False
+                )
+                grid.refresh_full()
+                grid.canvas.add_to_history()
+                grid.canvas.unjournaled_box = None
+
+                doc = self._docs.active
+                is_active_doc_recovered = True
+                self._is_saved = False
+                _UNSAVED_ICON.set_scale(1)
+            else:
+                tiles, _error_str = (
+                    _try_read_file_tiles(file_str) if file_str != "" else (None, "")
+                )
+                canvas: Canvas = Canvas(1, 1)
+                canvas.set_history_max_len(_GRID_MANAGER.grid.history.maxlen)
+                # Without the file only the edited tiles are recovered
+                if tiles is None:
+                    tiles = np.zeros((0, 0), uint32)
+                canvas.set_tiles(replay_journal(tiles, journal[1]), should_reset_history=True)
+
+                doc = Document(file_str, canvas)
+                self._docs.add_inactive(doc)
+
+            # The document keeps appending to its journal
+            doc.journal_path = journal_path
+            doc.journal_file_str = file_str
+            doc.num_journal_records = len(journal[1])
+
+    def _upt_journal(self: Self) -> None:
+        """
+        Appends the changed tiles to the journal of the active document.
+
+        It's compacted when it has too many records.
+        """
+
+        doc: Document = self._docs.active
+        if self._file_str != doc.journal_file_str:
+            self._reset_journal()
+
+        grid: Grid = _GRID_MANAGER.grid
+        box: Box | None = grid.canvas.pop_unjournaled_box()
+        if box is None:
+            return
+        if doc.num_journal_records >= JOURNAL_MAX_RECORDS:
+            full_record: bytes = get_journal_record(grid.tiles, 0, 0, grid.cols, grid.rows)
+            submit_io_job(
+                _IO_JOB_JOURNAL, "Journal Write Failed.",
+                try_write_journal, doc.journal_path, self._file_str, full_record
+            )
+            doc.num_journal_records = 1
+        else:
+            record: bytes = get_journal_record(grid.tiles, *box)
+            submit_io_job(
+                _IO_JOB_JOURNAL, "Journal Write Failed.",
+                try_append_journal, doc.journal_path, record
+            )
+            doc.num_journal_records += 1
+
+    def _sync_active_doc(self: Self) -> None:
+        """
+        Stores the file, saved flag and view in the active document before it's parked.
+
+        Its last edits are written to its journal.
+        """
+
+        self._upt_journal()
+
+        doc: Document = self._docs.active
+        grid: Grid = _GRID_MANAGER.grid
+        doc.file_str, doc.is_saved = self._file_str, self._is_saved
+        doc.visible_cols, doc.visible_rows = grid.visible_cols, grid.visible_rows
+        doc.offset_x, doc.offset_y = grid.offset_x, grid.offset_y
+
+    def _evict_unused_docs(self: Self) -> None:
+        """Moves the least recently used documents to disk in the background if they're too big."""
+
+        doc: Document
+        evict_info: EvictInfo
+
+        for doc, evict_info in self._docs.start_evict_unused():
+            submit_io_job(_IO_JOB_DOC_EVICT, (doc, evict_info), try_write_evicted, evict_info)
+
+    def _finish_doc_evict(
+            self: Self, doc: Document, evict_info: EvictInfo, error_str: str | None
+    ) -> None:
+        """
+        Drops the canvas of an evicted document, on failure it stays in memory.
+
+        Args:
+            document, evict info, error string
+        """
+
+        doc.finish_evict(evict_info, error_str)
+        if error_str is not None:
+            print(
+                f"File Eviction Failed.\n{Path(doc.file_str).name or 'New File'}: {error_str}",
+                file=stderr
+            )
+
+    def _activate_doc(self: Self, doc: Document, should_close_active: bool) -> None:
+        """
+        Activates a document, evicted ones are read in the background and activated after.
+
+        Args:
+            document, close the active document flag
+        """
+
+        if doc.is_evicted:
+            read_path: Path | None = doc.start_read()
+            if read_path is not None:
+                submit_io_job(_IO_JOB_DOC_READ, doc, try_read_evicted, read_path)
+            self._doc_to_activate = (doc, should_close_active)
+            return
+        self._doc_to_activate = None
+
+        if should_close_active:
+            self._save_closed_doc()
+        closed_doc: Document = self._docs.active
+        self._sync_active_doc()
+        error_str: str | None = self._docs.activate(self._docs.docs.index(doc))
+        if error_str is not None:
+            from tkinter import messagebox
+            messagebox.showerror("File Load Failed", error_str)
+            if should_close_active:
+                self._close_active_doc()  # Tries another one
+            self._refresh_file_text_label()
+            return
+
+        if should_close_active:
+            self._docs.remove(closed_doc)
+        self._refresh_active_doc()
+
+    def _finish_doc_read(
+            self: Self, doc: Document, parked_canvas: ParkedCanvas | None, error_str: str | None
+    ) -> None:
+        """
+        Keeps the read document in memory and activates it if it's still requested.
+
+        Args:
+            document, parked canvas (None on failure), error string
+        """
+
+        doc.finish_read(parked_canvas)
+        doc_to_activate: tuple[Document, bool] | None = self._doc_to_activate
+        is_requested: bool = doc_to_activate is not None and doc_to_activate[0] is doc
+        if parked_canvas is not None:
+            if doc_to_activate is not None and is_requested:
+                self._activate_doc(doc, doc_to_activate[1])
+            return
+
+        from tkinter import messagebox
+        messagebox.showerror(
+            "File Load Failed", f"{Path(doc.file_str).name or 'New File'}: {error_str}"
+        )
+        if doc in self._docs.docs:
+            self._docs.remove(doc)
+        self._refresh_file_text_label()
+        if doc_to_activate is not None and is_requested:
+            self._doc_to_activate = None
+            if doc_to_activate[1]:
+                self._close_active_doc()  # Tries another one
+
+    def _save_closed_doc(self: Self) -> None:
+        """
+        Saves the active document in the background before it's closed.
+
+        Its journal is removed after saving, it's kept if it fails to be recovered later.
+        """
+
+        self._upt_journal()
+        journal_path: Path = self._docs.active.journal_path
+        if self._file_str == "" or not ask_save_dir_creation(self._file_str):
+            submit_io_job(
+                _IO_JOB_JOURNAL, "Journal Removal Failed.", try_remove_file, journal_path
+            )
+            return
+
+        grid: Grid = _GRID_MANAGER.grid
+        save_info: SaveInfo = grid.get_save_info(
+            self._file_str, _PALETTES_MANAGER.colors_grid.colors
+        )
+        # The result is only shown if it fails, the document is gone
+        submit_io_job(
+            _IO_JOB_IMG_SAVE, (self._docs.active, self._file_str, grid.version),
+            _try_save_closed_doc, save_info, journal_path
+        )
+
+    def _close_active_doc(self: Self) -> None:
+        """Saves and removes the active document, activates the previous one or empties the last."""
+
+        if len(self._docs.docs) > 1:
+            self._activate_doc(
+                self._docs.docs[self._docs.active_i - 1 if self._docs.active_i != 0 else 1],
+                should_close_active=True
+            )
+            return
+
+        self._save_closed_doc()
+        doc: Document = self._docs.active
+        doc.journal_path, doc.journal_file_str = get_new_journal_path(), None
+        self._file_str = ""
+        self._is_saved = False
+        _GRID_MANAGER.grid.set_tiles(None)
+        _UNSAVED_ICON.set_animation(ANIMATION_GROW, WHITE, should_go_to_0=False)
+        self._refresh_file_text_label()
+
+    def _refresh_active_doc(self: Self) -> None:
+        """Shows the active document in the grid, it keeps appending to its journal."""
+
+        self._evict_unused_docs()
+
+        doc: Document = self._docs.active
+        grid: Grid = _GRID_MANAGER.grid
+        assert doc.canvas is not None
+        grid.set_canvas(doc.canvas, doc.visible_cols, doc.visible_rows, doc.offset_x, doc.offset_y)
+        grid.refresh_full()
+
+        self._file_str, self._is_saved = doc.file_str, doc.is_saved
+        if self._is_saved:
+            _UNSAVED_ICON.set_animation(ANIMATION_SHRINK, WHITE, should_go_to_0=True)
+        else:
+            _UNSAVED_ICON.set_animation(ANIMATION_GROW  , WHITE, should_go_to_0=False)
+        self._refresh_file_text_label()
+
     def _try_get_data(self: Self) -> dict[str, Any]:
         """
         Gets the data from the data file with retries.
@@ -486,6 +1088,7 @@ class _Dixel:
 
             "is_x_mirror_on": False,
             "is_y_mirror_on": False,
+            "symmetry_i"    : 1,  # Offsets by 1 because of placeholder option
 
             "brush_dim_i"    : 0,
             "tool_i"         : 0,
@@ -507,14 +1110,14 @@ class _Dixel:
             "is_grid_center_active": False,
             "grid_tile_mode_size": None,
 
-            "sub_tools_states": [False, False],
+            "sub_tools_states": [False, False, False, False, False, False, False, False, False],
         }
-        data_path: Path = Path("assets", "data", "data.json")
         for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
             try:
-                with data_path.open("rb") as f:
+                with _DATA_PATH.open("rb") as f:
                     try_lock_file(f, should_be_shared=True)
-                    data = json.loads(try_read_file(f))
+                    # Keys added by newer versions keep their default
+                    data |= json.loads(try_read_file(f))
                 break
             except FileNotFoundError:
                 break
@@ -526,6 +1129,7 @@ class _Dixel:
                     FileError: e.error_str if isinstance(e, FileError) else "",
                 }[type(e)]
 
+                from tkinter import messagebox
                 messagebox.showerror("Data Load Failed", error_str)
                 break
             except OSError as e:
@@ -534,6 +1138,7 @@ class _Dixel:
                     pg.time.wait(2 ** attempt_i)
                     continue
 
+                from tkinter import messagebox
                 messagebox.showerror("Data Load Failed", error_str)
                 break
 
@@ -554,7 +1159,7 @@ class _Dixel:
 
         # refresh_full is called later
         _GRID_MANAGER.grid.set_info(
-            np.zeros((data["grid_cols"], data["grid_rows"], 4), uint8),
+            np.zeros((data["grid_cols"], data["grid_rows"]), uint32),
             data["grid_visible_cols"], data["grid_visible_rows"],
             data["grid_offset_x"], data["grid_offset_y"],
             should_reset_history=True
@@ -564,12 +1169,11 @@ class _Dixel:
         _Y_MIRROR.set_checked(data["is_y_mirror_on"])
         _GRID_MANAGER.is_x_mirror_on = data["is_x_mirror_on"]
         _GRID_MANAGER.is_y_mirror_on = data["is_y_mirror_on"]
+        _SYMMETRY.set_option_i(data["symmetry_i"])
+        _GRID_MANAGER.symmetry_mode = _SYMMETRY.values[_SYMMETRY.option_i]
 
-        _GRID_UI.is_keeping_wh_ratio = data["grid_ratio"] is not None
-        _GRID_UI.w_ratio, _GRID_UI.h_ratio = (
-            data["grid_ratio"] if _GRID_UI.is_keeping_wh_ratio else
-            (1, 1)
-        )
+        if data["grid_ratio"] is not None:
+            self._grid_ratio = (data["grid_ratio"][0], data["grid_ratio"][1])
 
         WIN.position = self._orig_win_xy = data["orig_win_xy"]
         WIN.size     = self._orig_win_wh = data["orig_win_wh"]
@@ -621,15 +1225,76 @@ class _Dixel:
 
         return data
 
-    def _load_palettes(self: Self) -> None:
-        """Loads the palettes from the palettes files."""
+    def _try_get_palettes_data(self: Self) -> list[_PaletteData] | None:
+        """
+        Gets the palettes data from the palettes file with retries.
+
+        Returns:
+            data (None if missing or invalid)
+        """
+
+        attempt_i: int
+        error_str: str
+        should_retry: bool
+
+        palettes_bytes: bytes | None = None
+        for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+            try:
+                with _PALETTES_PATH.open("rb") as f:
+                    try_lock_file(f, should_be_shared=True)
+                    palettes_bytes = try_read_file(f)
+                break
+            except FileNotFoundError:
+                break
+            except (PermissionError, LockError, FileError) as e:
+                error_str = {
+                    PermissionError: "Permission denied.",
+                    LockError: "File locked.",
+                    FileError: e.error_str if isinstance(e, FileError) else "",
+                }[type(e)]
+
+                from tkinter import messagebox
+                messagebox.showerror("Palettes Data Load Failed", error_str)
+                break
+            except OSError as e:
+                error_str, should_retry = handle_file_os_error(e)
+                if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                    pg.time.wait(2 ** attempt_i)
+                    continue
+
+                from tkinter import messagebox
+                messagebox.showerror("Palettes Data Load Failed", error_str)
+                break
+
+        if palettes_bytes is None:
+            return None
+
+        try:
+            all_data: Any = json.loads(palettes_bytes)["palettes"]
+            if not isinstance(all_data, list):
+                raise TypeError
+        except (JSONDecodeError, KeyError, TypeError):
+            from tkinter import messagebox
+            messagebox.showerror("Palettes Data Load Failed", "Invalid json.")
+            return None
+
+        self._saved_palettes_bytes = palettes_bytes
+        return all_data
+
+    def _get_legacy_palettes_data(self: Self) -> list[_PaletteData]:
+        """
+        Gets the palettes data from the files of older versions.
+
+        Returns:
+            data (None for invalid files)
+        """
 
         palettes_paths: tuple[Path, ...]
         error_str: str | None
-        data: dict[str, Any]
 
-        palettes_paths, error_str = try_get_paths(Path("assets", "data", "palettes"), "*.dixel")
+        palettes_paths, error_str = try_get_paths(_LEGACY_PALETTES_DIR_PATH, "*.dixel")
         if error_str is not None:
+            from tkinter import messagebox
             messagebox.showerror("Palettes Folder Load Failed", error_str)
 
         errors_list: list[str] = []
@@ -638,8 +1303,21 @@ class _Dixel:
             for palette_path in palettes_paths
         ]
         if errors_list != []:
+            from tkinter import messagebox
             messagebox.showerror("Palettes Data Load Failed", "\n".join(errors_list))
 
+        self._has_legacy_palettes = palettes_paths != ()
+        return all_data
+
+    def _load_palettes(self: Self) -> None:
+        """Loads the palettes from the palettes file or from the files of older versions."""
+
+        data: dict[str, Any]
+
+        all_data: list[_PaletteData] | None = self._try_get_palettes_data()
+        if all_data is None:
+            all_data = self._get_legacy_palettes_data()
+
         # Offsets by 1 because of placeholder option
         palette_i: int = min(max(_PALETTES_MANAGER.palette_dropdown.option_i, 1), len(all_data))
         valid_data: list[dict[str, Any]] = [data for data in all_data if data is not None]
@@ -719,7 +1397,8 @@ class _Dixel:
         if should_create:
             img = _GRID_MANAGER.grid.try_save(
                 self._file_str,
-                should_ask_create_dir=False, should_use_gui=False
+                should_ask_create_dir=False, should_use_gui=False,
+                palette=_PALETTES_MANAGER.colors_grid.colors
             )
         return img
 
@@ -745,7 +1424,9 @@ class _Dixel:
 
                 "FLAGS:\n"
                 f"    --mk-file: create file ({argv[0]} new_file --mk-file)\n"
-                f"    --mk-dir: create directory ({argv[0]} new_dir/new_file --mk-dir)"
+                f"    --mk-dir: create directory ({argv[0]} new_dir/new_file --mk-dir)\n"
+                f"    --batch: edit files without a window ({argv[0]} --batch --help)\n"
+                f"    --profile-startup: print the duration of every startup stage"
             )
             stop(SystemExit())
 
@@ -757,9 +1438,7 @@ class _Dixel:
             try:
                 with file_path.open("rb") as f:
                     try_lock_file(f, should_be_shared=True)
-                    img_bytes_io: BytesIO = BytesIO(try_read_file(f))
-                    img: Image.Image = Image.open(img_bytes_io).convert("RGBA")
-                    pg_img = pg.image.frombytes(img.tobytes(), img.size, "RGBA").convert_alpha()
+                    pg_img = _read_grid_img(f, file_path)
                 break
             except FileNotFoundError:
                 pg_img = self._try_create_argv(flags)
@@ -790,11 +1469,16 @@ class _Dixel:
     def _refresh_file_text_label(self: Self) -> None:
         """Refreshes the file text label with the path or with New File."""
 
+        # Position is shown only with multiple files open
+        docs_info_str: str = (
+            "" if len(self._docs.docs) == 1 else
+            f" ({self._docs.active_i + 1}/{len(self._docs.docs)})"
+        )
         if self._file_str == "":
-            _FILE_TEXT_LABEL.set_text("New File")
+            _FILE_TEXT_LABEL.set_text("New File" + docs_info_str)
             _FILE_TEXT_LABEL.hovering_text_label.set_text("Unsaved")
         else:
-            _FILE_TEXT_LABEL.set_text(prettify_path(self._file_str))
+            _FILE_TEXT_LABEL.set_text(prettify_path(self._file_str) + docs_info_str)
             _FILE_TEXT_LABEL.hovering_text_label.set_text(self._file_str)
 
         _UNSAVED_ICON.rec_move_to(
@@ -825,27 +1509,85 @@ class _Dixel:
             for obj in objs.states_objs[self._state_i] if obj.is_active
         ])
 
-    def _refresh_all_objs(self: Self) -> None:
-        """Refreshes every object of all states and refreshes the state active ones."""
+    def _refresh_all_objs(self: Self) -> None:
+        """Refreshes every object of all states and refreshes the state active ones."""
+
+        state_main_objs: tuple[UIElement, ...]
+        obj: UIElement
+
+        objs.states_objs = ()
+        for state_main_objs in _STATES_MAIN_OBJS:
+            state_objs: list[UIElement] = list(state_main_objs)
+            for obj in state_objs:
+                state_objs.extend(obj.sub_objs)
+
+            # Reverses to have sub objects before the main one
+            # When resizing the main object can use their resized attributes
+            state_objs.reverse()
+            objs.states_objs += (tuple(state_objs),)
+
+        objs.state_active_objs = tuple([
+            obj
+            for obj in objs.states_objs[self._state_i] if obj.is_active
+        ])
+
+    def _add_state_ui(self: Self, state_i: int, ui: UIElement) -> None:
+        """
+        Adds a UI that was just built to its state and refreshes the objects.
+
+        Args:
+            state index, UI
+        """
+
+        _STATES_MAIN_OBJS[state_i] = (ui,)
+        self._refresh_all_objs()
+
+    def _get_color_picker(self: Self) -> ColorPicker:
+        """
+        Gets the color UI, it's built the first time.
+
+        Returns:
+            color UI
+        """
+
+        if self._color_picker is None:
+            self._color_picker = ColorPicker()
+            self._add_state_ui(STATE_I_COLOR, self._color_picker)
+
+        return self._color_picker
+
+    def _get_grid_editor(self: Self) -> GridUI:
+        """
+        Gets the grid UI, it's built the first time with the ratio and the grid settings.
 
-        state_main_objs: tuple[UIElement, ...]
-        obj: UIElement
+        Returns:
+            grid UI
+        """
 
-        objs.states_objs = ()
-        for state_main_objs in _STATES_MAIN_OBJS:
-            state_objs: list[UIElement] = list(state_main_objs)
-            for obj in state_objs:
-                state_objs.extend(obj.sub_objs)
+        if self._grid_editor is None:
+            self._grid_editor = GridUI()
+            self._grid_editor.is_keeping_wh_ratio = self._grid_ratio is not None
+            self._grid_editor.w_ratio, self._grid_editor.h_ratio = self._grid_ratio or (1, 1)
+            self._grid_editor.should_show_center = _GRID_MANAGER.grid.should_show_center
+            self._grid_editor.tile_mode_size     = _GRID_MANAGER.grid.tile_mode_size
+            self._add_state_ui(STATE_I_GRID, self._grid_editor)
 
-            # Reverses to have sub objects before the main one
-            # When resizing the main object can use their resized attributes
-            state_objs.reverse()
-            objs.states_objs += (tuple(state_objs),)
+        return self._grid_editor
 
-        objs.state_active_objs = tuple([
-            obj
-            for obj in objs.states_objs[self._state_i] if obj.is_active
-        ])
+    def _prewarm_state_uis(self: Self) -> None:
+        """Builds one of the UIs that aren't built yet if the user is idle in the main interface."""
+
+        is_idle: bool = (
+            self._state_i == STATE_I_MAIN and
+            not any(MOUSE.pressed) and KEYBOARD.pressed == ()
+        )
+        if not is_idle:
+            return
+
+        if self._color_picker is None:
+            self._get_color_picker()
+        elif self._grid_editor is None:
+            self._get_grid_editor()
 
     def _handle_draw(self: Self) -> None:
         """Gets every visible blit_sequence attribute and draws it to the window."""
@@ -939,8 +1681,7 @@ class _Dixel:
         elif event_type == WINDOWMOVED:
             did_move = True
         elif event_type == WINDOWSIZECHANGED:
-            did_resize = True
-            self._resize_objs()
+            did_resize = True  # Objects are resized once after all events
         elif event_type == WINDOWFOCUSLOST:
             for obj in objs.state_active_objs:
                 obj.leave()
@@ -1015,18 +1756,42 @@ class _Dixel:
         """
 
         file_str = _ensure_valid_img_format(file_str)
-        img: Surface | None = _GRID_MANAGER.grid.try_save(file_str, should_ask_create_dir=True)
-        if img is None:
-                red: pg.Color = Color(255, 0, 0)
-                _UNSAVED_ICON.set_animation(ANIMATION_GROW, red  , should_go_to_0=False)
-                self._is_saved = False
-        else:
+        if not ask_save_dir_creation(file_str):
+            self._on_img_saved(did_succeed=False, did_change=False)
+            return
+
+        grid: Grid = _GRID_MANAGER.grid
+        save_info: SaveInfo = grid.get_save_info(
+            file_str, _PALETTES_MANAGER.colors_grid.colors, SAVE_MODE_ARCHIVAL
+        )
+        submit_io_job(
+            _IO_JOB_IMG_SAVE_AS, (self._docs.active, file_str, grid.version),
+            try_write_save, save_info
+        )
+
+    def _finish_save_as(
+            self: Self, doc: Document, file_str: str, version: int, error_str: str | None
+    ) -> None:
+        """
+        Switches to the saved file and refreshes the unsaved icon.
+
+        Args:
+            saved document, file string, version when saving, error string
+        """
+
+        if error_str is not None:
+            from tkinter import messagebox
+            messagebox.showerror("Image Save Failed", error_str)
+
+        if doc is not self._docs.active:
+            if error_str is None:
+                doc.file_str = file_str  # The unsaved check refreshes the flag when activated
+            return
+
+        if error_str is None:
             self._file_str = file_str
-            if not self._is_saved:
-                green: pg.Color = Color(0, 255, 0)
-                _UNSAVED_ICON.set_animation(ANIMATION_GROW, green, should_go_to_0=True)
-                self._is_saved = True
             self._refresh_file_text_label()
+        self._on_img_saved(error_str is None, _GRID_MANAGER.grid.version != version)
 
     def _finish_ask_open_file(self: Self, file_str: str) -> None:
         """
@@ -1036,16 +1801,49 @@ class _Dixel:
             file string
         """
 
+        doc: Document
+
         file_str = _ensure_valid_img_format(file_str)
-        new_file_img: Surface | None = _try_get_grid_img(file_str, ignored_exceptions=())
-        if new_file_img is None:
-            self._new_file_str = ""
-        else:
-            self._new_file_str = file_str
-            self._state_i = STATE_I_GRID
-            _GRID_UI.set_info(get_pixels(new_file_img), _GRID_MANAGER.grid)
+        self._sync_active_doc()
+        for doc in self._docs.docs:
+            if doc.file_str == file_str and doc is not self._docs.active:
+                self._activate_doc(doc, should_close_active=False)
+                return
+
+        # The grid UI shows the progress, the tiles are set when they're read
+        self._new_file_str = file_str
+        self._state_i = STATE_I_GRID
+        self._get_grid_editor().set_loading(_GRID_MANAGER.grid)
+        submit_io_job(
+            _IO_JOB_OPEN, file_str, _try_read_file_tiles, file_str,
+            lambda tiles, progress: _post_open_progress(file_str, tiles, progress)
+        )
+
+        self._change_state()
 
+    def _finish_open_file(
+            self: Self, file_str: str, tiles: NDArray[uint32] | None, error_str: str
+    ) -> None:
+        """
+        Loads the read tiles into the grid UI or leaves it if they couldn't be read.
+
+        Args:
+            file string, tiles (None on failure), error string
+        """
+
+        # The user may have left the grid UI while waiting
+        if file_str != self._new_file_str or not self._get_grid_editor().is_loading:
+            return
+
+        if tiles is None:
+            from tkinter import messagebox
+            messagebox.showerror("Image Load Failed", f"{Path(file_str).name}: {error_str}")
+            self._new_file_str = ""
+            self._state_i = STATE_I_MAIN
             self._change_state()
+        else:
+            self._opened_tiles = tiles
+            self._get_grid_editor().set_info(tiles, _GRID_MANAGER.grid)
 
     def _handle_file_event(self: Self, current_event: Event) -> None:
         """
@@ -1084,6 +1882,7 @@ class _Dixel:
             def _ask_crash_save_dir() -> None:
                 """Asks a directory to save uncreated files to on crash with tkinter."""
 
+                from tkinter import filedialog
                 dir_str: str = filedialog.askdirectory(
                     title="Choose Directory",
                 )
@@ -1098,34 +1897,76 @@ class _Dixel:
         elif current_event.type == SETTINGS_GRID_ZOOM_DIRECTION_CHANGE:
             _GRID_MANAGER.grid.zoom_direction = current_event.value
         elif current_event.type == SETTINGS_GRID_HISTORY_MAX_SIZE_CHANGE:
-            _GRID_MANAGER.grid.set_history_max_len(current_event.value)
+            _GRID_MANAGER.grid.canvas.set_history_max_len(current_event.value)
         elif current_event.type == SETTINGS_GRID_CENTER_ACTIVENESS_CHANGE:
             _GRID_MANAGER.grid.should_show_center = current_event.value
-            _GRID_UI.should_show_center           = current_event.value
             _GRID_MANAGER.grid.refresh_grid_img()
             _GRID_MANAGER.grid.refresh_minimap_img()
-            _GRID_UI.refresh_preview()
+            if self._grid_editor is not None:  # Else it's copied when built
+                self._grid_editor.should_show_center = current_event.value
+                self._grid_editor.refresh_preview()
         elif current_event.type == SETTINGS_GRID_TILE_MODE_SIZE_CHANGE:
             _GRID_MANAGER.grid.tile_mode_size = current_event.value
-            _GRID_UI.tile_mode_size           = current_event.value
             _GRID_MANAGER.grid.refresh_grid_img()
             _GRID_MANAGER.grid.refresh_minimap_img()
-            _GRID_UI.refresh_preview()
+            if self._grid_editor is not None:  # Else it's copied when built
+                self._grid_editor.tile_mode_size = current_event.value
+                self._grid_editor.refresh_preview()
+
+    def _mark_unsaved(self: Self) -> None:
+        """
+        Marks the image as unsaved after an edit, the background check can only mark it as saved.
+
+        It's set right away so edits are never lost if the check is outdated.
+        """
+
+        if self._is_saved:
+            _UNSAVED_ICON.set_animation(ANIMATION_GROW, WHITE, should_go_to_0=False)
+            self._is_saved = False
+        if self._file_str != "":
+            self._refresh_unsaved_icon(unsaved_color=WHITE)
 
     def _refresh_unsaved_icon(self: Self, unsaved_color: pg.Color) -> None:
         """
-        Checks if the image is unsaved and refreshes the unsaved icon.
+        Starts checking if the image is unsaved in the background.
 
         Args:
             unsaved color
         """
 
-        img: Surface | None = _try_get_grid_img(self._file_str, ignored_exceptions=None)
-        if img is None:
+        if self._is_checking_unsaved:
+            self._queued_unsaved_color = unsaved_color
+            return
+
+        submit_io_job(
+            _IO_JOB_UNSAVED_CHECK, (self._file_str, unsaved_color),
+            _try_read_file_tiles, self._file_str
+        )
+        self._is_checking_unsaved = True
+
+    def _finish_unsaved_check(
+            self: Self, file_str: str, unsaved_color: pg.Color, tiles: NDArray[uint32] | None
+    ) -> None:
+        """
+        Refreshes the unsaved icon with the tiles of the file and runs the queued check.
+
+        Args:
+            checked file string, unsaved color, tiles (None if unreadable)
+        """
+
+        self._is_checking_unsaved = False
+        if self._queued_unsaved_color is not None:
+            self._refresh_unsaved_icon(self._queued_unsaved_color)
+            self._queued_unsaved_color = None
+            return  # The result is already outdated
+        if file_str != self._file_str:
+            return
+
+        if tiles is None:
             if self._is_saved:
                 _UNSAVED_ICON.set_animation(ANIMATION_GROW  , YELLOW       , should_go_to_0=False)
                 self._is_saved = False
-        elif np.array_equal(_GRID_MANAGER.grid.tiles, get_pixels(img)):
+        elif np.array_equal(_GRID_MANAGER.grid.tiles, tiles):
             if not self._is_saved:
                 _UNSAVED_ICON.set_animation(ANIMATION_SHRINK, WHITE        , should_go_to_0=True)
                 self._is_saved = True
@@ -1133,6 +1974,100 @@ class _Dixel:
                 _UNSAVED_ICON.set_animation(ANIMATION_GROW  , unsaved_color, should_go_to_0=False)
                 self._is_saved = False
 
+    def _finish_quantization(
+            self: Self, canvas: Canvas, version: int, should_add_palette: bool,
+            tiles: NDArray[uint32], hex_colors: list[HexColor]
+    ) -> None:
+        """
+        Applies the quantized tiles in one history entry if the canvas didn't change meanwhile.
+
+        Args:
+            quantized canvas, its version, add palette flag, tiles, palette
+        """
+
+        self._is_quantizing = False
+        grid: Grid = _GRID_MANAGER.grid
+        if grid.canvas is not canvas or grid.version != version:
+            return
+
+        if grid.replace_tiles(tiles):
+            grid.canvas.add_to_history()
+            self._mark_unsaved()
+        if should_add_palette and hex_colors != []:
+            _PALETTES_MANAGER.add_palette(hex_colors, color_i=0, offset_y=0, dropdown_i=-1)
+            # Offsets by 1 because of placeholder option
+            _PALETTES_MANAGER.palette_dropdown.option_i = len(_PALETTES_MANAGER.palettes)
+
+    def _handle_io_event(self: Self, current_event: Event) -> None:
+        """
+        Handles the result of a file operation that ran in the background.
+
+        Args:
+            event
+        """
+
+        doc: Document
+        file_str: str
+        version: int
+        unsaved_color: pg.Color
+
+        if current_event.exception is not None:
+            print(f"File Operation Failed.\n{current_event.exception!r}", file=stderr)
+            if current_event.kind == _IO_JOB_UNSAVED_CHECK:
+                file_str, unsaved_color = current_event.info
+                self._finish_unsaved_check(file_str, unsaved_color, tiles=None)
+            elif current_event.kind == _IO_JOB_OPEN:
+                self._finish_open_file(current_event.info, None, "Invalid image.")
+            elif current_event.kind == _IO_JOB_QUANTIZE:
+                self._is_quantizing = False
+            elif current_event.kind == _IO_JOB_DOC_EVICT:
+                self._finish_doc_evict(*current_event.info, "Eviction failed.")
+            elif current_event.kind == _IO_JOB_DOC_READ:
+                self._finish_doc_read(current_event.info, None, "Invalid project.")
+            elif current_event.kind == _IO_JOB_BRUSH_READ:
+                self._finish_brush_read(current_event.info, None, "Invalid image.")
+            return
+
+        if current_event.kind == _IO_JOB_DATA_SAVE:
+            if current_event.result is not None:
+                from tkinter import messagebox
+                messagebox.showerror("Data Save Failed", current_event.result)
+        elif current_event.kind == _IO_JOB_PALETTES_SAVE:
+            if current_event.result is None:
+                self._on_palettes_saved(current_event.info)
+            else:
+                from tkinter import messagebox
+                messagebox.showerror("Palettes Save Failed", current_event.result)
+        elif current_event.kind == _IO_JOB_IMG_SAVE:
+            if current_event.result is not None:
+                from tkinter import messagebox
+                messagebox.showerror("Image Save Failed", current_event.result)
+
+            doc, file_str, version = current_event.info
+            # Results of files that aren't shown anymore are ignored, they stay unsaved
+            if doc is self._docs.active and file_str == self._file_str:
+                self._on_img_saved(
+                    current_event.result is None, _GRID_MANAGER.grid.version != version
+                )
+        elif current_event.kind == _IO_JOB_IMG_SAVE_AS:
+            self._finish_save_as(*current_event.info, current_event.result)
+        elif current_event.kind == _IO_JOB_UNSAVED_CHECK:
+            file_str, unsaved_color = current_event.info
+            self._finish_unsaved_check(file_str, unsaved_color, current_event.result[0])
+        elif current_event.kind == _IO_JOB_OPEN:
+            self._finish_open_file(current_event.info, *current_event.result)
+        elif current_event.kind == _IO_JOB_JOURNAL:
+            if current_event.result is not None:
+                print(f"{current_event.info}\n{current_event.result}", file=stderr)
+        elif current_event.kind == _IO_JOB_QUANTIZE:
+            self._finish_quantization(*current_event.info, *current_event.result)
+        elif current_event.kind == _IO_JOB_DOC_EVICT:
+            self._finish_doc_evict(*current_event.info, current_event.result)
+        elif current_event.kind == _IO_JOB_DOC_READ:
+            self._finish_doc_read(current_event.info, *current_event.result)
+        elif current_event.kind == _IO_JOB_BRUSH_READ:
+            self._finish_brush_read(current_event.info, *current_event.result)
+
     def _handle_events(self: Self) -> None:
         """
         Handles the events.
@@ -1165,7 +2100,20 @@ class _Dixel:
                 _FPS_TEXT_LABEL.set_text(f"FPS: {_CLOCK.get_fps():.2f}")
                 if self._file_str != "":
                     self._refresh_unsaved_icon(unsaved_color=YELLOW)
-
+            elif current_event.type == _KMEANS_NUM_COLORS_CHOICE:
+                self._quantize_tiles(current_event.num_colors, should_use_kmeans=True)
+            elif current_event.type == _BRUSH_FILE_CHOICE:
+                self._read_custom_brush(current_event.path_str)
+            elif current_event.type == IO_JOB_DONE:
+                self._handle_io_event(current_event)
+            elif current_event.type == IO_JOB_PROGRESS:
+                if current_event.info == self._new_file_str and self._get_grid_editor().is_loading:
+                    self._get_grid_editor().set_loading_progress(
+                        current_event.progress, *current_event.partial_result
+                    )
+
+        if did_win_resize:
+            self._resize_objs()
         if not (self._is_maximized or self._is_fullscreen):
             if did_win_move:
                 self._orig_win_xy = WIN.position
@@ -1190,91 +2138,90 @@ class _Dixel:
             # Triggers a WINDOWSIZECHANGED event
             WIN.size = (win_w, win_h)
 
-    def _save_palette(self: Self, palette_i: int, errors_list: list[str]) -> None:
+    def _save_palettes(self: Self, exit_type: int) -> None:
         """
-        Saves a palette to a separate file with retries.
+        Refreshes the palettes data and saves them to the palettes file if they changed.
 
         Args:
-            palette index, errors list
+            exit type (if it's _EXIT_NO they're saved in the background)
         """
 
         error_str: str | None
-        should_retry: bool
+        palette_i: int
 
+        _PALETTES_MANAGER.refresh_palettes_info(_PALETTES_MANAGER.palette_dropdown.option_i)
         data: dict[str, Any] = {
-            "color_i"    : _PALETTES_MANAGER.clicked_indexes[palette_i],
-            "offset_y"   : _PALETTES_MANAGER.offsets_y[palette_i],
-            "drop-down_i": _PALETTES_MANAGER.dropdown_indexes[palette_i],
-            "colors"     : _PALETTES_MANAGER.palettes[palette_i],
+            "palettes": [
+                {
+                    "color_i"    : _PALETTES_MANAGER.clicked_indexes[palette_i],
+                    "offset_y"   : _PALETTES_MANAGER.offsets_y[palette_i],
+                    "drop-down_i": _PALETTES_MANAGER.dropdown_indexes[palette_i],
+                    "colors"     : _PALETTES_MANAGER.palettes[palette_i],
+                }
+                for palette_i in range(len(_PALETTES_MANAGER.palettes))
+            ],
         }
 
-        palette_path: Path = Path("assets", "data", "palettes", f"palette_{palette_i}.dixel")
-        temp_palette_path: Path = palette_path.with_suffix(".tmp")
-        palette_bytes: bytes = json.dumps(
+        palettes_bytes: bytes = json.dumps(
             data, ensure_ascii=False, indent=4,
         ).encode("utf-8", errors="ignore")
+        if palettes_bytes == self._saved_palettes_bytes:
+            return
 
-        dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
-        system_attempt_i: int       = FILE_ATTEMPT_START_I
-        while (
-            dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
-            system_attempt_i       <= FILE_ATTEMPT_STOP_I
-        ):
-            try:
-                # If you open in write mode it will clear the file even if it's locked
-                with temp_palette_path.open("ab") as f:
-                    try_lock_file(f, should_be_shared=False)
-                    try_write_file(f, palette_bytes)
-                try_replace_file(temp_palette_path, palette_path)
-                break
-            except FileNotFoundError:
-                if errors_list != []:
-                    break
-
-                dir_creation_attempt_i += 1
-                error_str = try_create_dir(palette_path.parent, dir_creation_attempt_i)
-                if error_str is not None:
-                    errors_list.append(f"Directory {error_str}")
-                    break
-            except (PermissionError, LockError, FileError) as e:
-                error_str = {
-                    PermissionError: "Permission denied.",
-                    LockError: "File locked.",
-                    FileError: e.error_str if isinstance(e, FileError) else "",
-                }[type(e)]
+        if exit_type == _EXIT_NO:
+            submit_io_job(
+                _IO_JOB_PALETTES_SAVE, palettes_bytes,
+                _try_save_file, _PALETTES_PATH, palettes_bytes
+            )
+            return
 
-                errors_list.append(f"{palette_path}: {error_str}")
-                break
-            except OSError as e:
-                system_attempt_i += 1
-                error_str, should_retry = handle_file_os_error(e)
-                if should_retry and errors_list == [] and system_attempt_i != FILE_ATTEMPT_STOP_I:
-                    pg.time.wait(2 ** system_attempt_i)
-                    continue
+        error_str = _try_save_file(_PALETTES_PATH, palettes_bytes)
+        if error_str is not None:
+            from tkinter import messagebox
+            messagebox.showerror("Palettes Save Failed", error_str)
+            return
+        self._on_palettes_saved(palettes_bytes)
 
-                try_remove_file(temp_palette_path)
-                errors_list.append(f"{palette_path}: {error_str}")
-                break
+    def _on_palettes_saved(self: Self, palettes_bytes: bytes) -> None:
+        """
+        Stores the saved palettes and removes the files of older versions.
 
-    def _save_palettes(self: Self) -> None:
-        """Refreshes the palettes data and saves them to files in the palettes directory."""
+        Args:
+            saved palettes
+        """
 
-        palettes_paths: tuple[Path, ...]
+        legacy_palettes_paths: tuple[Path, ...]
         _error_str: str | None
         palette_path: Path
-        palette_i: int
 
-        _PALETTES_MANAGER.refresh_palettes_info(_PALETTES_MANAGER.palette_dropdown.option_i)
-        palettes_paths, _error_str = try_get_paths(Path("assets", "data", "palettes"), "*.dixel")
-        for palette_path in palettes_paths:
-            try_remove_file(palette_path)
+        self._saved_palettes_bytes = palettes_bytes
+        # Files of older versions are removed once they're in the palettes file
+        if self._has_legacy_palettes:
+            legacy_palettes_paths, _error_str = try_get_paths(_LEGACY_PALETTES_DIR_PATH, "*.dixel")
+            for palette_path in legacy_palettes_paths:
+                try_remove_file(palette_path)
+            self._has_legacy_palettes = False
 
-        errors_list: list[str] = []
-        for palette_i in range(len(_PALETTES_MANAGER.palettes)):
-            self._save_palette(palette_i, errors_list)
+    def _should_autosave(self: Self, exit_type: int) -> bool:
+        """
+        Checks if the images should be saved depending on the autosave mode.
 
-        if errors_list != []:
-            messagebox.showerror("Palettes Save Failed", "\n".join(errors_list))
+        Args:
+            exit type
+        Returns:
+            save flag
+        """
+
+        if exit_type == _EXIT_NO:
+            return True
+
+        autosave_dropdown: Dropdown = _SETTINGS_UI.general_settings_manager.autosave_dropdown
+        autosave_mode: int = autosave_dropdown.values[autosave_dropdown.option_i]
+        return not (
+             autosave_mode == AUTOSAVE_MODE_NEVER or
+            (autosave_mode == AUTOSAVE_MODE_CRASH     and exit_type != _EXIT_CRASH    ) or
+            (autosave_mode == AUTOSAVE_MODE_INTERRUPT and exit_type == _EXIT_INTERRUPT)
+        )
 
     def _save_img(self: Self, exit_type: int, should_ask_create_dir: bool) -> None:
         """
@@ -1284,45 +2231,116 @@ class _Dixel:
             exit type, ask create directory flag
         """
 
-        if exit_type != _EXIT_NO:
-            autosave_dropdown: Dropdown = _SETTINGS_UI.general_settings_manager.autosave_dropdown
-            autosave_mode: int = autosave_dropdown.values[autosave_dropdown.option_i]
-            if (
-                 autosave_mode == AUTOSAVE_MODE_NEVER or
-                (autosave_mode == AUTOSAVE_MODE_CRASH     and exit_type != _EXIT_CRASH    ) or
-                (autosave_mode == AUTOSAVE_MODE_INTERRUPT and exit_type == _EXIT_INTERRUPT)
-            ):
+        if not self._should_autosave(exit_type):
+            return
+
+        grid: Grid = _GRID_MANAGER.grid
+        if exit_type == _EXIT_NO and self._file_str != "":
+            if should_ask_create_dir and not ask_save_dir_creation(self._file_str):
+                self._on_img_saved(did_succeed=False, did_change=False)
                 return
 
-        img: Surface | None = _GRID_MANAGER.grid.try_save(self._file_str, should_ask_create_dir)
-        if img is None:
+            # Tiles are encoded now, the writing and its retries don't block the main loop
+            save_info: SaveInfo = grid.get_save_info(
+                self._file_str, _PALETTES_MANAGER.colors_grid.colors, SAVE_MODE_DEFAULT
+            )
+            submit_io_job(
+                _IO_JOB_IMG_SAVE, (self._docs.active, self._file_str, grid.version),
+                try_write_save, save_info
+            )
+            return
+
+        # Autosaves on exit should be quick
+        img: Surface | None = grid.try_save(
+            self._file_str, should_ask_create_dir,
+            palette=_PALETTES_MANAGER.colors_grid.colors, save_mode=SAVE_MODE_FAST
+        )
+        self._on_img_saved(img is not None, did_change=False)
+
+    def _on_img_saved(self: Self, did_succeed: bool, did_change: bool) -> None:
+        """
+        Refreshes the journal and the unsaved icon after saving the image.
+
+        Args:
+            succeeded flag, changed since the save flag
+        """
+
+        if not did_succeed:
             red: pg.Color = Color(255, 0, 0)
             _UNSAVED_ICON.set_animation(ANIMATION_GROW, red  , should_go_to_0=False)
             self._is_saved = False
+            return
+
+        self._reset_journal()
+        if did_change:
+            # The journal needs the edits made while writing, they already set the icon
+            grid: Grid = _GRID_MANAGER.grid
+            grid.canvas.unjournaled_box = (0, 0, grid.cols, grid.rows)
         elif not self._is_saved:
             green: pg.Color = Color(0, 255, 0)
             _UNSAVED_ICON.set_animation(ANIMATION_GROW, green, should_go_to_0=True)
             self._is_saved = True
 
+    def _save_inactive_docs(self: Self, exit_type: int) -> None:
+        """
+        Saves the unsaved inactive documents on exit if it should, new files only on crash.
+
+        Args:
+            exit type
+        """
+
+        doc: Document
+
+        if not self._should_autosave(exit_type):
+            return
+
+        self._sync_active_doc()
+        active_doc: Document = self._docs.active
+        grid: Grid = _GRID_MANAGER.grid
+        for doc in tuple(self._docs.docs):  # Changes mid-iteration
+            is_new_file: bool = doc.file_str == ""
+            if doc is active_doc or doc.is_saved or (is_new_file and exit_type != _EXIT_CRASH):
+                continue
+
+            error_str: str | None = self._docs.activate(self._docs.docs.index(doc))
+            if error_str is not None:
+                print(f"Image Load Failed.\n{error_str}", file=stderr)
+                continue
+
+            assert doc.canvas is not None
+            grid.set_canvas(
+                doc.canvas, doc.visible_cols, doc.visible_rows, doc.offset_x, doc.offset_y
+            )
+            if is_new_file:
+                doc.file_str = self._get_crash_file_str()
+            grid.try_save(
+                doc.file_str, should_ask_create_dir=False, should_use_gui=False,
+                palette=_PALETTES_MANAGER.colors_grid.colors, save_mode=SAVE_MODE_FAST
+            )
+
     def _save(self: Self, exit_type: int, should_ask_create_dir: bool) -> None:
         """
-        Saves the data, palettes and image with retries.
+        Saves the data, palettes and image with retries, clean exits remove the journals.
 
         Args:
             exit type, ask create image directory flag
         """
 
         error_str: str | None
-        should_retry: bool
+        doc: Document
+
+        if exit_type != _EXIT_NO:
+            wait_io_jobs()
 
         tool_i: int = (
             _TOOLS_MANAGER.tools_grid.clicked_i if _TOOLS_MANAGER.saved_clicked_i is None else
             _TOOLS_MANAGER.saved_clicked_i
         )
-        grid_ratio: tuple[float, float] | None = (
-            (_GRID_UI.w_ratio, _GRID_UI.h_ratio) if _GRID_UI.is_keeping_wh_ratio else
-            None
-        )
+        grid_ratio: tuple[float, float] | None = self._grid_ratio
+        if self._grid_editor is not None and self._grid_editor.is_keeping_wh_ratio:
+            grid_ratio = (self._grid_editor.w_ratio, self._grid_editor.h_ratio)
+        elif self._grid_editor is not None:
+            grid_ratio = None
 
         data: dict[str, Any] =  {
             "file": self._file_str,
@@ -1336,6 +2354,7 @@ class _Dixel:
 
             "is_x_mirror_on": _GRID_MANAGER.is_x_mirror_on,
             "is_y_mirror_on": _GRID_MANAGER.is_y_mirror_on,
+            "symmetry_i"    : _SYMMETRY.option_i,
 
             "brush_dim_i"     : _BRUSH_DIMS.clicked_i,
             "tool_i"          : tool_i,
@@ -1360,53 +2379,27 @@ class _Dixel:
             "sub_tools_states": _TOOLS_MANAGER.export_sub_tools_states()
         }
 
-        data_path: Path = Path("assets", "data", "data.json")
-        temp_data_path: Path = data_path.with_suffix(".tmp")
         data_bytes: bytes = json.dumps(
             data, ensure_ascii=False, indent=4,
         ).encode("utf-8", errors="ignore")
-
-        dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
-        system_attempt_i: int       = FILE_ATTEMPT_START_I
-        while (
-            dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
-            system_attempt_i       <= FILE_ATTEMPT_STOP_I
-        ):
-            try:
-                # If you open in write mode it will clear the file even if it's locked
-                with temp_data_path.open("ab") as f:
-                    try_lock_file(f, should_be_shared=False)
-                    try_write_file(f, data_bytes)
-                try_replace_file(temp_data_path, data_path)
-                break
-            except FileNotFoundError:
-                dir_creation_attempt_i += 1
-                error_str = try_create_dir(data_path.parent, dir_creation_attempt_i)
-                if error_str is not None:
-                    messagebox.showerror("Data Directory Creation Failed", error_str)
-                    break
-            except (PermissionError, LockError, FileError) as e:
-                error_str = {
-                    PermissionError: "Permission denied.",
-                    LockError: "File locked.",
-                    FileError: e.error_str if isinstance(e, FileError) else "",
-                }[type(e)]
-
-                messagebox.showerror("Data Save Failed", error_str)
-                break
-            except OSError as e:
-                system_attempt_i += 1
-                error_str, should_retry = handle_file_os_error(e)
-                if should_retry and system_attempt_i != FILE_ATTEMPT_STOP_I:
-                    pg.time.wait(2 ** system_attempt_i)
-                    continue
-
-                try_remove_file(temp_data_path)
+        if exit_type == _EXIT_NO:
+            submit_io_job(_IO_JOB_DATA_SAVE, None, _try_save_file, _DATA_PATH, data_bytes)
+        else:
+            error_str = _try_save_file(_DATA_PATH, data_bytes)
+            if error_str is not None:
+                from tkinter import messagebox
                 messagebox.showerror("Data Save Failed", error_str)
-                break
 
-        self._save_palettes()
+        self._save_palettes(exit_type)
         self._save_img(exit_type, should_ask_create_dir)
+        if exit_type != _EXIT_NO:
+            self._save_inactive_docs(exit_type)
+            self._docs.discard_all_evicted()
+        if exit_type in (_EXIT_OK, _EXIT_INTERRUPT):
+            # Only crashes and hard kills are recovered, else it has edits that weren't saved
+            wait_io_jobs()  # A reset can be pending
+            for doc in self._docs.docs:
+                try_remove_file(doc.journal_path)
 
     def _upt_file_saving(self: Self) -> None:
         """Updates the save and save as button."""
@@ -1428,16 +2421,18 @@ class _Dixel:
             def _ask_save_as() -> None:
                 """Asks a file to save to with tkinter."""
 
+                from tkinter import filedialog
                 file_str: str = filedialog.asksaveasfilename(
                     defaultextension=".png",
                     filetypes=(
-                        ("PNG Files"   , "*.png"),
-                        ("WebP Files"  , "*.webp"),
-                        ("Bitmap Files", "*.bmp"),
-                        ("TIFF Files"  , "*.tiff"),
-                        ("DDS Files"   , "*.dds"),
-                        ("TGA Files"   , "*.tga"),
-                        ("Icon Files"  , "*.ico"),
+                        ("PNG Files"     , "*.png"),
+                        ("Dixel Projects", "*.dixel"),
+                        ("WebP Files"    , "*.webp"),
+                        ("Bitmap Files"  , "*.bmp"),
+                        ("TIFF Files"    , "*.tiff"),
+                        ("DDS Files"     , "*.dds"),
+                        ("TGA Files"     , "*.tga"),
+                        ("Icon Files"    , "*.ico"),
                     ),
                     title="Save As",
                 )
@@ -1459,16 +2454,18 @@ class _Dixel:
             def _ask_open_file() -> None:
                 """Asks a file to open with tkinter."""
 
+                from tkinter import filedialog
                 file_str: str = filedialog.askopenfilename(
                     defaultextension=".png",
                     filetypes=(
-                        ("PNG Files"   , "*.png"),
-                        ("WebP Files"  , "*.webp"),
-                        ("Bitmap Files", "*.bmp"),
-                        ("TIFF Files"  , "*.tiff"),
-                        ("DDS Files"   , "*.dds"),
-                        ("TGA Files"   , "*.tga"),
-                        ("Icon Files"  , "*.ico"),
+                        ("PNG Files"     , "*.png"),
+                        ("Dixel Projects", "*.dixel"),
+                        ("WebP Files"    , "*.webp"),
+                        ("Bitmap Files"  , "*.bmp"),
+                        ("TIFF Files"    , "*.tiff"),
+                        ("DDS Files"     , "*.dds"),
+                        ("TGA Files"     , "*.tga"),
+                        ("Icon Files"    , "*.ico"),
                     ),
                     title="Open",
                 )
@@ -1485,15 +2482,32 @@ class _Dixel:
         """Updates the close file button."""
 
         is_close_clicked: bool = _CLOSE.upt()
-        is_ctrl_w_pressed: bool = KEYBOARD.is_ctrl_on and K_w in KEYBOARD.pressed
-        if (is_close_clicked or is_ctrl_w_pressed) and self._file_str != "":
-            _GRID_MANAGER.grid.try_save(self._file_str, should_ask_create_dir=True)
+        # Timed to not close multiple files with one press
+        is_ctrl_w_pressed: bool = KEYBOARD.is_ctrl_on and K_w in KEYBOARD.timed
+        if not (is_close_clicked or is_ctrl_w_pressed):
+            return
 
-            self._file_str = ""
-            self._is_saved = False
-            _GRID_MANAGER.grid.set_tiles(None)
-            _UNSAVED_ICON.set_animation(ANIMATION_GROW, WHITE, should_go_to_0=False)
-            self._refresh_file_text_label()
+        if self._file_str == "":
+            from tkinter import messagebox
+            if len(self._docs.docs) == 1 or not messagebox.askyesno(
+                "Close File", "The new file isn't saved.\nDo you wanna close it?",
+                icon="warning",
+            ):
+                return
+
+        self._close_active_doc()
+
+    def _upt_file_switching(self: Self) -> None:
+        """Activates the next file on ctrl+tab and the previous one on ctrl+shift+tab."""
+
+        if not (KEYBOARD.is_ctrl_on and K_TAB in KEYBOARD.timed and len(self._docs.docs) > 1):
+            return
+
+        step: int = -1 if KEYBOARD.is_shift_on else 1
+        self._activate_doc(
+            self._docs.docs[(self._docs.active_i + step) % len(self._docs.docs)],
+            should_close_active=False
+        )
 
     def _upt_ui_openers(self: Self) -> None:
         """Updates the buttons that open UIs."""
@@ -1502,13 +2516,13 @@ class _Dixel:
         is_ctrl_a_pressed: bool = KEYBOARD.is_ctrl_on and K_a in KEYBOARD.pressed
         if is_add_color_clicked or is_ctrl_a_pressed:
             self._state_i = STATE_I_COLOR
-            _COLOR_PICKER.set_color(HEX_BLACK, is_external_update=True)
+            self._get_color_picker().set_color(HEX_BLACK, is_external_update=True)
 
         is_edit_grid_clicked: bool = _EDIT_GRID.upt()
         is_ctrl_g_pressed: bool = KEYBOARD.is_ctrl_on and K_g in KEYBOARD.pressed
         if is_edit_grid_clicked or is_ctrl_g_pressed:
             self._state_i = STATE_I_GRID
-            _GRID_UI.set_info(_GRID_MANAGER.grid.tiles, _GRID_MANAGER.grid)
+            self._get_grid_editor().set_info(_GRID_MANAGER.grid.tiles, _GRID_MANAGER.grid)
 
         is_open_settings_clicked: bool = _OPEN_SETTINGS.upt()
         is_ctrl_comma_pressed: bool = KEYBOARD.is_ctrl_on and K_COMMA in KEYBOARD.pressed
@@ -1526,6 +2540,140 @@ class _Dixel:
                 _BRUSH_DIMS.clicked_i        = k - K_1
                 _GRID_MANAGER.grid.brush_dim = k - K_1 + 1
 
+    def _upt_palette_from_img(self: Self) -> None:
+        """Adds a palette with the colors of the image and selects it."""
+
+        is_ctrl_shift_i_pressed: bool = K_i in KEYBOARD.timed
+        is_ctrl_shift_u_pressed: bool = K_u in KEYBOARD.timed
+        if not (is_ctrl_shift_i_pressed or is_ctrl_shift_u_pressed):
+            return
+
+        hex_colors: list[HexColor] = get_tiles_palette(
+            _GRID_MANAGER.grid.tiles, _IMG_PALETTE_MAX_SIZE,
+            should_sort_by_hue=is_ctrl_shift_u_pressed
+        )
+        if hex_colors != []:
+            _PALETTES_MANAGER.add_palette(hex_colors, color_i=0, offset_y=0, dropdown_i=-1)
+            # Offsets by 1 because of placeholder option
+            _PALETTES_MANAGER.palette_dropdown.option_i = len(_PALETTES_MANAGER.palettes)
+
+    def _upt_tiles_quantization(self: Self) -> None:
+        """
+        Reduces the image colors in the background.
+
+        ctrl+shift+q uses the palette,
+        ctrl+shift+k asks how many colors to find with k-means and adds them.
+        """
+
+        if self._is_quantizing:
+            return
+
+        hex_colors: list[HexColor] = _PALETTES_MANAGER.colors_grid.colors
+        if K_q in KEYBOARD.timed and hex_colors != []:
+            self._quantize_tiles(len(hex_colors), should_use_kmeans=False)
+        elif K_k in KEYBOARD.timed:
+            initial_num_colors: int = min(len(hex_colors), _KMEANS_MAX_COLORS) or 16
+
+            def _ask_kmeans_num_colors() -> None:
+                """Asks the number of colors to find with k-means with tkinter."""
+
+                from tkinter import simpledialog
+                num_colors: int | None = simpledialog.askinteger(
+                    "Reduce Colors", "Number of colors:",
+                    initialvalue=initial_num_colors, minvalue=1, maxvalue=_KMEANS_MAX_COLORS,
+                )
+
+                event.post(Event(_KMEANS_NUM_COLORS_CHOICE, {"num_colors": num_colors or 0}))
+
+            Thread(target=_ask_kmeans_num_colors, daemon=True).start()
+            self._is_quantizing = True  # Until the dialog is closed
+
+    def _quantize_tiles(self: Self, num_colors: int, should_use_kmeans: bool) -> None:
+        """
+        Reduces the image colors to the palette or with k-means in the compute thread.
+
+        Args:
+            number of colors (0 = cancel), use k-means flag
+        """
+
+        if num_colors == 0:
+            self._is_quantizing = False
+            return
+
+        grid: Grid = _GRID_MANAGER.grid
+        # The result is discarded if the tiles change while it runs
+        submit_compute_job(
+            _IO_JOB_QUANTIZE, (grid.canvas, grid.version, should_use_kmeans),
+            _get_quantized_tiles, grid.tiles.copy(),
+            None if should_use_kmeans else _PALETTES_MANAGER.colors_grid.colors.copy(),
+            num_colors
+        )
+        self._is_quantizing = True
+
+    def _upt_custom_brush_loading(self: Self) -> None:
+        """Asks an image to use as brush with tkinter, its visible pixels are the brush."""
+
+        if K_b not in KEYBOARD.timed or self._is_loading_brush:
+            return
+
+        def _ask_brush_file() -> None:
+            """Asks a brush image with tkinter."""
+
+            from tkinter import filedialog
+            file_str: str = filedialog.askopenfilename(
+                filetypes=(
+                    ("Image Files", "*.png *.webp *.bmp *.tiff *.dds *.tga *.ico"),
+                    ("Dixel Projects", "*.dixel"),
+                ),
+                title="Load Brush",
+            )
+            # On some explorers closing doesn't return a string
+            if not isinstance(file_str, str):
+                file_str = ""
+
+            event.post(Event(_BRUSH_FILE_CHOICE, {"path_str": file_str}))
+
+        Thread(target=_ask_brush_file, daemon=True).start()
+        self._is_loading_brush = True  # Until the image is read
+
+    def _read_custom_brush(self: Self, file_str: str) -> None:
+        """
+        Reads a brush image in the background.
+
+        Args:
+            file string (empty = cancel)
+        """
+
+        if file_str == "":
+            self._is_loading_brush = False
+            return
+
+        submit_io_job(_IO_JOB_BRUSH_READ, file_str, _try_read_file_tiles, file_str)
+
+    def _finish_brush_read(
+            self: Self, file_str: str, tiles: NDArray[uint32] | None, error_str: str
+    ) -> None:
+        """
+        Sets the custom brush from the visible pixels of the read image.
+
+        Args:
+            file string, tiles (None on failure), error string
+        """
+
+        self._is_loading_brush = False
+        if tiles is not None:
+            brush_kernel: NDArray[uint8] = get_img_brush_kernel(tiles)
+            if not brush_kernel.any():
+                error_str = "Image is transparent."
+            elif max(brush_kernel.shape) > _CUSTOM_BRUSH_MAX_DIM:
+                error_str = f"Brush bigger than {_CUSTOM_BRUSH_MAX_DIM}x{_CUSTOM_BRUSH_MAX_DIM}."
+            else:
+                _GRID_MANAGER.set_custom_brush_kernel(brush_kernel)
+                return
+
+        from tkinter import messagebox
+        messagebox.showerror("Brush Load Failed", f"{Path(file_str).name}: {error_str}")
+
     def _main_interface(self: Self) -> None:
         """Handles the main interface."""
 
@@ -1536,6 +2684,7 @@ class _Dixel:
         self._upt_file_saving()
         self._upt_file_opening()
         self._upt_file_closing()
+        self._upt_file_switching()
         self._upt_ui_openers()
 
         if KEYBOARD.is_ctrl_on and K_b in KEYBOARD.pressed:
@@ -1554,6 +2703,13 @@ class _Dixel:
         _Y_MIRROR.upt(is_shift_v_pressed)
         _GRID_MANAGER.is_y_mirror_on = _Y_MIRROR.is_checked
 
+        _SYMMETRY.upt()
+        _GRID_MANAGER.symmetry_mode = _SYMMETRY.values[_SYMMETRY.option_i]
+
+        if KEYBOARD.is_ctrl_on and KEYBOARD.is_shift_on:
+            self._upt_palette_from_img()
+            self._upt_tiles_quantization()
+            self._upt_custom_brush_loading()
         hex_color, did_palette_change, hex_color_to_edit = _PALETTES_MANAGER.upt()
         if did_palette_change:
             # Refreshes the hovered checkbox immediately
@@ -1562,7 +2718,8 @@ class _Dixel:
             _PALETTES_MANAGER.colors_grid.upt_checkboxes()
         if hex_color_to_edit is not None:
             self._state_i = STATE_I_COLOR
-            _COLOR_PICKER.set_color(hex_color_to_edit, is_external_update=True)
+            self._hex_color_to_edit = hex_color_to_edit
+            self._get_color_picker().set_color(hex_color_to_edit, is_external_update=True)
         _PALETTES_MANAGER.refresh()
 
         tool_info: ToolInfo = _TOOLS_MANAGER.upt()
@@ -1571,8 +2728,8 @@ class _Dixel:
             _GRID_MANAGER.saved_col = _GRID_MANAGER.saved_row = None
 
         did_grid_change: bool = _GRID_MANAGER.upt(hex_color, tool_info)
-        if did_grid_change and self._file_str != "":
-            self._refresh_unsaved_icon(unsaved_color=WHITE)
+        if did_grid_change:
+            self._mark_unsaved()
         if _GRID_MANAGER.rgb_eye_dropped_color is not None:
             r: int = _GRID_MANAGER.rgb_eye_dropped_color[0]
             g: int = _GRID_MANAGER.rgb_eye_dropped_color[1]
@@ -1590,9 +2747,10 @@ class _Dixel:
         did_confirm: bool
         hex_color: HexColor
 
-        did_exit, did_confirm, hex_color = _COLOR_PICKER.upt()
+        did_exit, did_confirm, hex_color = self._get_color_picker().upt()
         if did_exit:
             self._state_i = STATE_I_MAIN
+            self._hex_color_to_edit = None
         elif did_confirm:
             self._state_i = STATE_I_MAIN
 
@@ -1600,12 +2758,22 @@ class _Dixel:
             if did_palette_change:
                 self._refresh_current_state_objs()
 
+            # Editing a palette color edits every tile of that color
+            if self._hex_color_to_edit is not None:
+                did_grid_change: bool = _GRID_MANAGER.grid.replace_color(
+                    self._hex_color_to_edit, hex_color
+                )
+                if did_grid_change:
+                    _GRID_MANAGER.grid.canvas.add_to_history()
+                    self._mark_unsaved()
+                self._hex_color_to_edit = None
+
     def _grid_ui(self: Self) -> None:
         """Handles the grid UI."""
 
         did_exit: bool
         did_confirm: bool
-        tiles: NDArray[uint8]
+        tiles: NDArray[uint32]
         visible_cols: int
         visible_rows: int
         offset_x: int
@@ -1615,7 +2783,7 @@ class _Dixel:
             did_exit, did_confirm, tiles,
             visible_cols, visible_rows,
             offset_x, offset_y
-        ) = _GRID_UI.upt()
+        ) = self._get_grid_editor().upt()
 
         if did_exit:
             self._new_file_str = ""
@@ -1625,23 +2793,56 @@ class _Dixel:
 
             is_opening_new_img: bool = self._new_file_str != ""
             if is_opening_new_img:
-                _GRID_MANAGER.grid.try_save(self._file_str, should_ask_create_dir=True)
-                self._file_str = self._new_file_str
-                self._new_file_str = ""
-                self._refresh_file_text_label()
+                self._open_new_doc()
 
-            _GRID_MANAGER.grid.set_info(
+            grid: Grid = _GRID_MANAGER.grid
+            prev_snapshot: HistorySnapshot = grid.history[grid.history_i]
+            grid.set_info(
                 tiles,
                 visible_cols, visible_rows,
                 offset_x, offset_y,
                 should_reset_history=is_opening_new_img
             )
-            _GRID_MANAGER.grid.refresh_full()
-            if not is_opening_new_img:
-                _GRID_MANAGER.grid.add_to_history()
 
-            if self._file_str != "":
-                self._refresh_unsaved_icon(unsaved_color=WHITE)
+            did_edit: bool
+            if is_opening_new_img:
+                # Only edited if the grid UI changed the tiles of the file
+                did_edit = (
+                    self._opened_tiles is None or
+                    not np.array_equal(grid.tiles, self._opened_tiles)
+                )
+                self._load_project_info(should_set_view=False)
+            else:
+                grid.canvas.add_to_history()
+                did_edit = grid.history[grid.history_i] is not prev_snapshot
+            grid.refresh_full()
+
+            if did_edit:
+                self._mark_unsaved()
+        if did_exit or did_confirm:
+            self._opened_tiles = None
+
+    def _open_new_doc(self: Self) -> None:
+        """Adds a document for the opened file, it replaces the active one if it's unused."""
+
+        grid: Grid = _GRID_MANAGER.grid
+        is_active_doc_unused: bool = (
+            self._file_str == self._new_file_str or
+            (self._file_str == "" and len(grid.history) == 1 and not grid.tiles.any())
+        )
+        if not is_active_doc_unused:
+            self._sync_active_doc()
+            canvas: Canvas = Canvas(1, 1)
+            canvas.set_history_max_len(grid.history.maxlen)
+            self._docs.add(Document(self._new_file_str, canvas))
+            self._evict_unused_docs()
+            grid.set_canvas(canvas, 1, 1, 0, 0)  # The view is set by set_info
+
+        self._file_str = self._new_file_str
+        self._new_file_str = ""
+        self._is_saved = True  # Refreshed after the tiles are set
+        _UNSAVED_ICON.set_scale(0)
+        self._refresh_file_text_label()
 
     def _settings_ui(self: Self) -> None:
         """Handles the settings UI."""
@@ -1658,18 +2859,28 @@ class _Dixel:
             MOUSE.refresh_hovered_obj()
             _SETTINGS_UI.selected_manager.upt()
 
+    def _get_crash_file_str(self: Self) -> str:
+        """
+        Gets an unused file in the crash save directory.
+
+        Returns:
+            file string
+        """
+
+        crash_save_dir_path: Path = Path(_SETTINGS_UI.general_settings_manager.crash_save_dir_str)
+        file_path: Path = crash_save_dir_path / "new_file.png"
+        duplicate_name_counter: int = 0
+        while file_path.exists():
+            duplicate_name_counter += 1
+            file_path = crash_save_dir_path / f"new_file_{duplicate_name_counter}.png"
+
+        return str(file_path)
+
     def _handle_crash(self: Self) -> None:
         """Saves before crashing."""
 
         if self._file_str == "":
-            crash_save_dir_path: Path = Path(_SETTINGS_UI.general_settings_manager.crash_save_dir_str)
-            file_path: Path = crash_save_dir_path / "new_file.png"
-            duplicate_name_counter: int = 0
-            while file_path.exists():
-                duplicate_name_counter += 1
-                file_path = crash_save_dir_path / f"new_file_{duplicate_name_counter}.png"
-
-            self._file_str = str(file_path)
+            self._file_str = self._get_crash_file_str()
 
         self._save(_EXIT_CRASH, should_ask_create_dir=False)
 
@@ -1680,6 +2891,7 @@ class _Dixel:
 
         MOUSE.set_pos(mouse.get_pos())
         MOUSE.prev_x, MOUSE.prev_y = MOUSE.x, MOUSE.y
+        should_print_startup_profile: bool = _SHOULD_PROFILE_STARTUP
         try:
             while True:
                 fps_dropdown: Dropdown = _SETTINGS_UI.general_settings_manager.fps_dropdown
@@ -1702,6 +2914,7 @@ class _Dixel:
                 self._states_funcs[self._state_i]()
                 if self._state_i != prev_state_i:
                     self._change_state()
+                self._upt_journal()
 
                 dt: float = (last_frame_elapsed_time / 1_000) * 60
                 for obj in tuple(objs.animating_objs):  # Changes mid-iteration
@@ -1709,6 +2922,11 @@ class _Dixel:
 
                 MOUSE.refresh_type()
                 self._handle_draw()
+                if should_print_startup_profile:
+                    _STARTUP_TIMES.append(("First frame", perf_counter()))
+                    _print_startup_profile()
+                    should_print_startup_profile = False
+                self._prewarm_state_uis()
 
                 MOUSE.prev_x, MOUSE.prev_y = MOUSE.x, MOUSE.y
         except KeyboardInterrupt:
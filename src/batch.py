@@ -0,0 +1,347 @@
+"""
+Headless batch mode, applies operations to many files without creating a window.
+
+Files are processed in parallel by a pool of processes, every file is
+loaded, cropped, rotated, resized, reduced to a number of colors,
+quantized to a palette and exported in this order.
+
+Usage: main.py --batch <optional flags> <file paths>
+"""
+
+import os
+import json
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from time import perf_counter
+from sys import argv, stderr
+from typing import TypeAlias, Final, Any
+
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+from numpy import uint32
+from numpy.typing import NDArray
+from PIL import UnidentifiedImageError
+from PIL.Image import DecompressionBombError
+
+from src.tiles_utils import (
+    SAVE_MODE_FAST, SAVE_MODE_DEFAULT, SAVE_MODE_ARCHIVAL,
+    get_img_bytes, crop_tiles, rotate_tiles, resize_tiles, get_kmeans_palette, quantize_tiles,
+)
+from src.project_utils import PROJECT_SUFFIX, read_tiles
+from src.file_utils import (
+    FileError, handle_file_os_error,
+    try_read_file, try_write_file, try_replace_file, try_remove_file,
+)
+from src.lock_utils import LockError, try_lock_file
+from src.type_utils import HexColor
+
+# Export file string, size, seconds, error string
+_FileResult: TypeAlias = tuple[str, tuple[int, int], float, str | None]
+
+_USAGE: Final[str] = (
+    "Usage: main.py --batch <optional flags> <file paths>\n"
+    "Example: main.py --batch --crop --format=webp --out-dir=out a.png b.png\n"
+
+    "FLAGS:\n"
+    "    --crop: remove transparent padding\n"
+    "    --rotate=<turns>: rotate clockwise by 90 degrees\n"
+    "    --resize=<width>x<height>: resize canvas from the top left\n"
+    "    --colors=<number>: reduce to a number of colors with k-means\n"
+    "    --palette=<palette file>: change every color to the nearest one of a palette\n"
+    "    --format=<extension>: export format (default = same, png for projects)\n"
+    "    --out-dir=<directory>: export directory (default = same)\n"
+    "    --fast, --archival: lower or optimize the compression\n"
+    "    --jobs=<number>: number of processes (default = number of CPUs)"
+)
+
+
+@dataclass(slots=True)
+class BatchOptions:
+    """
+    Dataclass for representing the operations applied to every file.
+
+    Args:
+        crop flag, clockwise turns, canvas size (None = unchanged),
+        number of colors (None = unchanged), palette (None = unchanged),
+        export format (None = same), export directory (None = same), save mode
+    """
+
+    should_crop: bool
+    num_turns: int
+    canvas_wh: tuple[int, int] | None
+    num_colors: int | None
+    hex_colors: list[HexColor] | None
+    img_format: str | None
+    out_dir_path: Path | None
+    save_mode: int
+
+
+def _read_palette(file_str: str) -> list[HexColor]:
+    """
+    Reads the colors of a palette file.
+
+    Args:
+        file string
+    Returns:
+        colors
+    Raises:
+        OSError, LockError, FileError: on failure
+    """
+
+    hex_color: Any
+
+    with Path(file_str).open("rb") as f:
+        try_lock_file(f, should_be_shared=True)
+        palette_bytes: bytes = try_read_file(f)
+
+    try:
+        palette_data: Any = json.loads(palette_bytes)
+        hex_colors: Any = palette_data["colors"] if isinstance(palette_data, dict) else palette_data
+        if not all([
+            isinstance(hex_color, str) and len(bytes.fromhex(hex_color[:6])) == 3
+            for hex_color in hex_colors
+        ]):
+            raise FileError("Invalid palette.")
+    except (ValueError, KeyError, TypeError) as e:  # JSONDecodeError is a ValueError
+        raise FileError("Invalid palette.") from e
+
+    return hex_colors
+
+
+def _parse_options(args: list[str]) -> tuple[BatchOptions, list[str], int | None]:
+    """
+    Gets the options, files and number of processes from the batch args.
+
+    Args:
+        args
+    Returns:
+        options, file strings, number of processes (None = number of CPUs)
+    Raises:
+        ValueError: on invalid args
+        OSError, LockError, FileError: if the palette can't be read
+    """
+
+    arg: str
+    flag: str
+    value: str
+    w_str: str
+    h_str: str
+
+    options: BatchOptions = BatchOptions(
+        should_crop=False, num_turns=0, canvas_wh=None, num_colors=None, hex_colors=None,
+        img_format=None, out_dir_path=None, save_mode=SAVE_MODE_DEFAULT
+    )
+    files_strs: list[str] = []
+    num_jobs: int | None = None
+
+    should_parse_flags: bool = True
+    for arg in args:
+        if arg == "--":
+            should_parse_flags = False
+        elif not (should_parse_flags and arg.startswith("--")):
+            files_strs.append(arg)
+        else:
+            flag, _sep, value = arg.partition("=")
+            flag = flag.lower()
+
+            if   flag == "--batch":
+                pass
+            elif flag == "--crop":
+                options.should_crop = True
+            elif flag == "--rotate":
+                options.num_turns = int(value) % 4
+            elif flag == "--resize":
+                w_str, _sep, h_str = value.lower().partition("x")
+                options.canvas_wh = (int(w_str), int(h_str))
+                if options.canvas_wh[0] <= 0 or options.canvas_wh[1] <= 0:
+                    raise ValueError(f"Invalid size: {value}")
+            elif flag == "--colors":
+                options.num_colors = int(value)
+                if options.num_colors <= 0:
+                    raise ValueError(f"Invalid number of colors: {value}")
+            elif flag == "--palette":
+                options.hex_colors = _read_palette(value)
+            elif flag == "--format":
+                options.img_format = value.lower().removeprefix(".")
+            elif flag == "--out-dir":
+                options.out_dir_path = Path(value)
+            elif flag == "--fast":
+                options.save_mode = SAVE_MODE_FAST
+            elif flag == "--archival":
+                options.save_mode = SAVE_MODE_ARCHIVAL
+            elif flag == "--jobs":
+                num_jobs = int(value)
+                if num_jobs <= 0:
+                    raise ValueError(f"Invalid number of processes: {value}")
+            else:
+                raise ValueError(f"Unknown flag: {flag}")
+
+    return options, files_strs, num_jobs
+
+
+def _write_tiles(file_path: Path, tiles: NDArray[uint32], save_mode: int) -> None:
+    """
+    Exports tiles as an image.
+
+    Args:
+        path, tiles, save mode
+    Raises:
+        OSError, LockError, FileError, ValueError, KeyError: on failure
+    """
+
+    img_bytes: bytes = get_img_bytes(tiles, file_path.suffix[1:], save_mode)
+
+    temp_file_path: Path = Path(str(file_path) + ".tmp")
+    try:
+        # If you open in write mode it will empty the file even if it's locked
+        with temp_file_path.open("ab") as f:
+            try_lock_file(f, should_be_shared=False)
+            try_write_file(f, img_bytes)
+        try_replace_file(temp_file_path, file_path)
+    except (OSError, LockError, FileError):
+        try_remove_file(temp_file_path)
+        raise
+
+
+def _process_file(file_str: str, options: BatchOptions) -> _FileResult:
+    """
+    Applies the operations to a file and exports it, runs in a worker process.
+
+    Args:
+        file string, options
+    Returns:
+        export file string, size, seconds, error string (can be None)
+    """
+
+    error_str: str
+    _should_retry: bool
+
+    start: float = perf_counter()
+    file_path: Path = Path(file_str)
+    img_format: str = options.img_format or (
+        "png" if file_path.suffix in ("", PROJECT_SUFFIX) else file_path.suffix[1:]
+    )
+    out_dir_path: Path = options.out_dir_path or file_path.parent
+    out_file_path: Path = out_dir_path / f"{file_path.stem}.{img_format}"
+
+    try:
+        tiles: NDArray[uint32] = read_tiles(file_path)
+        if options.should_crop:
+            tiles = crop_tiles(tiles)
+        if options.num_turns != 0:
+            tiles = rotate_tiles(tiles, options.num_turns)
+        if options.canvas_wh is not None:
+            tiles = resize_tiles(tiles, *options.canvas_wh)
+        if options.num_colors is not None:
+            tiles = quantize_tiles(tiles, get_kmeans_palette(tiles, options.num_colors))
+        if options.hex_colors is not None:
+            tiles = quantize_tiles(tiles, options.hex_colors)
+
+        _write_tiles(out_file_path, tiles, options.save_mode)
+    except (
+        FileNotFoundError, PermissionError, LockError, FileError,
+        UnidentifiedImageError, DecompressionBombError, ValueError, KeyError, MemoryError
+    ) as e:
+        # Checks subclasses too, JSONDecodeError is a ValueError
+        if   isinstance(e, FileNotFoundError):
+            error_str = "File missing."
+        elif isinstance(e, PermissionError):
+            error_str = "Permission denied."
+        elif isinstance(e, LockError):
+            error_str = "File locked."
+        elif isinstance(e, FileError):
+            error_str = e.error_str
+        elif isinstance(e, UnidentifiedImageError):
+            error_str = "Invalid image."
+        elif isinstance(e, (DecompressionBombError, MemoryError)):
+            error_str = "Image too big."
+        else:
+            error_str = "Unsupported format."
+        return str(out_file_path), (0, 0), perf_counter() - start, error_str
+    except OSError as e:
+        error_str, _should_retry = handle_file_os_error(e)
+        return str(out_file_path), (0, 0), perf_counter() - start, error_str
+
+    return str(out_file_path), (tiles.shape[0], tiles.shape[1]), perf_counter() - start, None
+
+
+def run_batch(args: list[str]) -> int:
+    """
+    Processes files in parallel and prints the throughput of every one.
+
+    Args:
+        args
+    Returns:
+        exit code
+    """
+
+    options: BatchOptions
+    files_strs: list[str]
+    num_jobs: int | None
+    future: Future[_FileResult]
+    out_file_str: str
+    w: int
+    h: int
+    secs: float
+    error_str: str | None
+
+    if "--help" in [arg.lower() for arg in args]:
+        print(_USAGE)
+        return 0
+
+    try:
+        options, files_strs, num_jobs = _parse_options(args)
+    except (ValueError, LockError, FileError) as e:
+        print(f"{e.error_str if isinstance(e, FileError) else e}\n{_USAGE}", file=stderr)
+        return 1
+    except OSError as e:
+        print(f"Palette read failed: {handle_file_os_error(e)[0]}", file=stderr)
+        return 1
+    if files_strs == []:
+        print(_USAGE, file=stderr)
+        return 1
+
+    if options.out_dir_path is not None:
+        try:
+            options.out_dir_path.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Directory creation failed: {handle_file_os_error(e)[0]}", file=stderr)
+            return 1
+
+    start: float = perf_counter()
+    num_failed: int = 0
+    num_pixels: int = 0
+    with ProcessPoolExecutor(num_jobs) as executor:
+        futures: dict[Future[_FileResult], str] = {
+            executor.submit(_process_file, file_str, options): file_str
+            for file_str in files_strs
+        }
+
+        for future in as_completed(futures):
+            try:
+                out_file_str, (w, h), secs, error_str = future.result()
+            except BrokenProcessPool:  # A worker was killed, like by the system on low memory
+                out_file_str, (w, h), secs, error_str = "", (0, 0), 0, "Process stopped."
+            if error_str is not None:
+                print(f"{futures[future]}: {error_str}", file=stderr)
+                num_failed += 1
+                continue
+
+            num_pixels += w * h
+            print(
+                f"{futures[future]} -> {out_file_str}: {w}x{h}, {secs * 1_000:.1f}ms, "
+                f"{(w * h) / max(secs, 1e-9):,.0f} px/s"
+            )
+
+    tot_secs: float = max(perf_counter() - start, 1e-9)
+    print(
+        f"{len(files_strs) - num_failed}/{len(files_strs)} files in {tot_secs:.2f}s, "
+        f"{len(files_strs) / tot_secs:.1f} files/s, {num_pixels / tot_secs:,.0f} px/s"
+    )
+    return 0 if num_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(run_batch(argv[1:]))
@@ -0,0 +1,749 @@
+"""
+Pure numpy core of the grid, it has the tiles, selection, history and tools.
+
+It doesn't import pygame or tkinter and cv2 is only imported by the functions that need it,
+the grid and grid manager are views over it so it can be scripted and profiled without a display.
+"""
+
+from zlib import compress, decompress
+from collections import deque
+from functools import cache
+from itertools import islice
+from typing import Literal, Self, TypeAlias, Final
+
+import numpy as np
+from numpy import uint8, uint32, int32, intp, float64, bool_, newaxis
+from numpy.typing import NDArray
+
+from src.tiles_utils import (
+    get_rgba_view, get_indexes_dtype, get_indexed_tiles, get_img_bytes, crop_tiles,
+)
+from src.type_utils import XY
+
+# Columns, rows, compressed palette, compressed indexes
+HistorySnapshot: TypeAlias = tuple[int, int, bytes, bytes]
+# x, y, width, height
+Box: TypeAlias = tuple[int, int, int, int]
+_SymmetryMaps: TypeAlias = tuple[NDArray[intp], NDArray[intp], NDArray[intp], NDArray[intp]]
+# Horizontal mirror flag, vertical mirror flag, symmetry mode
+Symmetry: TypeAlias = tuple[bool, bool, int]
+
+SYMMETRY_NONE: Final[int]     = 0
+SYMMETRY_DIAGONAL: Final[int] = 1
+SYMMETRY_RADIAL_4: Final[int] = 2
+SYMMETRY_RADIAL_8: Final[int] = 3
+
+_REGIONS_LABELS_CACHE_MAX_LEN: Final[int] = 8
+
+
+def get_snapshot(tiles: NDArray[uint32]) -> HistorySnapshot:
+    """
+    Gets a history snapshot with the tiles stored as indexes in their palette.
+
+    Args:
+        tiles
+    Returns:
+        snapshot
+    """
+
+    return _get_indexed_snapshot(*get_indexed_tiles(tiles))
+
+
+def _get_indexed_snapshot(palette: NDArray[uint32], indexes: NDArray[uint8]) -> HistorySnapshot:
+    """
+    Gets a history snapshot from tiles stored as indexes, the palette can have unused colors.
+
+    Args:
+        palette, indexes
+    Returns:
+        snapshot
+    """
+
+    return (
+        indexes.shape[0], indexes.shape[1],
+        compress(palette.tobytes()), compress(indexes.tobytes()),
+    )
+
+
+def _get_snapshot_indexes(snapshot: HistorySnapshot) -> tuple[NDArray[uint32], NDArray[uint8]]:
+    """
+    Gets the palette and indexes of a history snapshot, they're read only.
+
+    Args:
+        snapshot
+    Returns:
+        palette, indexes
+    """
+
+    cols: int
+    rows: int
+    compressed_palette: bytes
+    compressed_indexes: bytes
+
+    cols, rows, compressed_palette, compressed_indexes = snapshot
+    palette: NDArray[uint32] = np.frombuffer(decompress(compressed_palette), uint32)
+    indexes: NDArray[uint8] = np.frombuffer(
+        decompress(compressed_indexes), get_indexes_dtype(palette.size)
+    )
+
+    return palette, indexes.reshape((cols, rows))
+
+
+def get_snapshot_tiles(snapshot: HistorySnapshot) -> NDArray[uint32]:
+    """
+    Gets the tiles of a history snapshot.
+
+    Args:
+        snapshot
+    Returns:
+        tiles
+    """
+
+    palette: NDArray[uint32]
+    indexes: NDArray[uint8]
+
+    palette, indexes = _get_snapshot_indexes(snapshot)
+    # Gathering from the palette also makes it writable
+    return palette[indexes]
+
+
+def _union_boxes(box: Box | None, other_box: Box) -> Box:
+    """
+    Gets the smallest box that contains two boxes.
+
+    Args:
+        box (can be None), other box
+    Returns:
+        box
+    """
+
+    if box is None:
+        return other_box
+
+    left: int   = min(box[0], other_box[0])
+    top: int    = min(box[1], other_box[1])
+    right: int  = max(box[0] + box[2], other_box[0] + other_box[2])
+    bottom: int = max(box[1] + box[3], other_box[1] + other_box[3])
+    return left, top, right - left, bottom - top
+
+
+def get_tiles_in_line(x_1: int, y_1: int, x_2: int, y_2: int) -> NDArray[int32]:
+    """
+    Gets the tiles that touch a line using Bresenham's Line Algorithm.
+
+    Args:
+        line start x, line start y, line end x, line end y
+    Returns:
+        tiles
+    """
+
+    delta_x: int = abs(x_2 - x_1)
+    delta_y: int = abs(y_2 - y_1)
+    step_x: Literal[-1, 1] = 1 if x_1 < x_2 else -1
+    step_y: Literal[-1, 1] = 1 if y_1 < y_2 else -1
+    err: int = delta_x - delta_y
+
+    tiles: list[XY] = []
+    while True:
+        tiles.append((x_1, y_1))
+        if x_1 == x_2 and y_1 == y_2:
+            break
+
+        err_2: int = err * 2
+        if err_2 > -delta_y:
+            err -= delta_y
+            x_1 += step_x
+        if err_2 <  delta_x:
+            err += delta_x
+            y_1 += step_y
+
+    return np.array(tiles, int32)
+
+
+@cache
+def get_brush_kernel(brush_dim: int, is_round: bool) -> NDArray[uint8]:
+    """
+    Gets the mask of the tiles covered by a brush.
+
+    Args:
+        brush dimension, round flag
+    Returns:
+        kernel
+    """
+
+    if not is_round:
+        return np.ones((brush_dim, brush_dim), uint8)
+
+    # Shrunk radius gives rounder small brushes
+    coords: NDArray[float64] = np.arange(brush_dim) - ((brush_dim - 1) / 2)
+    squared_dists: NDArray[float64] = coords[:, newaxis] ** 2 + coords[newaxis, :] ** 2
+    return (squared_dists <= ((brush_dim / 2) - 0.25) ** 2).astype(uint8)
+
+
+def get_img_brush_kernel(tiles: NDArray[uint32]) -> NDArray[uint8]:
+    """
+    Gets the mask of the visible pixels of an image without its transparent padding.
+
+    Args:
+        tiles
+    Returns:
+        kernel (all 0 if the image is transparent)
+    """
+
+    return (get_rgba_view(crop_tiles(tiles))[..., 3] != 0).astype(uint8)
+
+
+def stamp_brush(
+        selected_tiles: NDArray[bool_], xs: NDArray[int32], ys: NDArray[int32],
+        brush_kernel: NDArray[uint8]
+) -> tuple[int, int, int, int]:
+    """
+    Selects the tiles covered by a brush centered on every point.
+
+    The points are dilated with the kernel inside their bounding box,
+    kernels of any shape are supported.
+
+    Args:
+        selected tiles, xs, ys, brush kernel
+    Returns:
+        start x, start y, end x, end y of the stamped section
+    """
+
+    brush_w: int = brush_kernel.shape[0]
+    brush_h: int = brush_kernel.shape[1]
+    anchor_x: int = brush_w // 2
+    anchor_y: int = brush_h // 2
+    min_x: int = int(xs.min())
+    min_y: int = int(ys.min())
+
+    # Padded by the brush so it's never cut by the bounding box
+    box: NDArray[uint8] = np.zeros(
+        (int(xs.max()) - min_x + brush_w, int(ys.max()) - min_y + brush_h),
+        uint8
+    )
+    box[xs - min_x + anchor_x, ys - min_y + anchor_y] = 1
+    import cv2  # Lazy, only needed by tools
+    # cv2 reflects the kernel around the anchor (x is the second axis for cv2)
+    box = cv2.dilate(
+        box, brush_kernel[::-1, ::-1],
+        anchor=(brush_h - 1 - anchor_y, brush_w - 1 - anchor_x),
+        borderType=cv2.BORDER_CONSTANT, borderValue=0
+    )
+
+    box_x: int = min_x - anchor_x
+    box_y: int = min_y - anchor_y
+    start_x: int = max(box_x, 0)
+    start_y: int = max(box_y, 0)
+    end_x: int = min(box_x + box.shape[0], selected_tiles.shape[0])
+    end_y: int = min(box_y + box.shape[1], selected_tiles.shape[1])
+    target_tiles: NDArray[bool_] = selected_tiles[start_x:end_x, start_y:end_y]
+    target_tiles |= box[
+        start_x - box_x:end_x - box_x,
+        start_y - box_y:end_y - box_y,
+    ].view(bool_)
+
+    return start_x, start_y, end_x, end_y
+
+
+@cache
+def get_symmetry_maps(cols: int, rows: int) -> _SymmetryMaps:
+    """
+    Gets the maps to get symmetric coordinates, an invalid coordinate is -1.
+
+    Diagonal maps go through the center, if the grid isn't square some tiles have no diagonal.
+
+    Args:
+        columns, rows
+    Returns:
+        flipped xs, flipped ys, diagonal xs (from ys), diagonal ys (from xs)
+    """
+
+    flipped_xs: NDArray[intp] = np.arange(cols - 1, -1, -1, dtype=intp)
+    flipped_ys: NDArray[intp] = np.arange(rows - 1, -1, -1, dtype=intp)
+
+    diagonal_offset: int = (cols - rows) // 2
+    diagonal_xs: NDArray[intp] = np.arange(rows, dtype=intp) + diagonal_offset
+    diagonal_xs[(diagonal_xs < 0) | (diagonal_xs >= cols)] = -1
+    diagonal_ys: NDArray[intp] = np.arange(cols, dtype=intp) - diagonal_offset
+    diagonal_ys[(diagonal_ys < 0) | (diagonal_ys >= rows)] = -1
+
+    return flipped_xs, flipped_ys, diagonal_xs, diagonal_ys
+
+
+def get_symmetric_tiles(
+        xs: NDArray[intp], ys: NDArray[intp], symmetry_maps: _SymmetryMaps,
+        is_x_mirror_on: bool, is_y_mirror_on: bool, symmetry_mode: int
+) -> tuple[NDArray[intp], NDArray[intp]]:
+    """
+    Gets tiles and their symmetric ones.
+
+    Args:
+        xs, ys, symmetry maps,
+        horizontal mirror flag, vertical mirror flag, symmetry mode
+    Returns:
+        xs, ys
+    """
+
+    valid_mask: NDArray[bool_]
+
+    flipped_xs: NDArray[intp]  = symmetry_maps[0]
+    flipped_ys: NDArray[intp]  = symmetry_maps[1]
+    diagonal_xs: NDArray[intp] = symmetry_maps[2]
+    diagonal_ys: NDArray[intp] = symmetry_maps[3]
+
+    if is_x_mirror_on:
+        xs, ys = np.concatenate((xs, flipped_xs[xs])), np.concatenate((ys, ys))
+    if is_y_mirror_on:
+        xs, ys = np.concatenate((xs, xs)), np.concatenate((ys, flipped_ys[ys]))
+
+    if symmetry_mode == SYMMETRY_DIAGONAL or symmetry_mode == SYMMETRY_RADIAL_8:
+        transposed_xs: NDArray[intp] = diagonal_xs[ys]
+        transposed_ys: NDArray[intp] = diagonal_ys[xs]
+        valid_mask = (transposed_xs != -1) & (transposed_ys != -1)
+        xs = np.concatenate((xs, transposed_xs[valid_mask]))
+        ys = np.concatenate((ys, transposed_ys[valid_mask]))
+    if symmetry_mode == SYMMETRY_RADIAL_4 or symmetry_mode == SYMMETRY_RADIAL_8:
+        # Rotations are a transpose followed by a flip
+        rotated_xs: NDArray[intp] = diagonal_xs[ys]
+        rotated_ys: NDArray[intp] = diagonal_ys[xs]
+        valid_mask = (rotated_xs != -1) & (rotated_ys != -1)
+        rotated_xs = rotated_xs[valid_mask]
+        rotated_ys = rotated_ys[valid_mask]
+        xs, ys = (
+            np.concatenate((xs, flipped_xs[rotated_xs], flipped_xs[xs], rotated_xs)),
+            np.concatenate((ys, rotated_ys, flipped_ys[ys], flipped_ys[rotated_ys])),
+        )
+
+    return xs, ys
+
+
+class Canvas:
+    """Class to store and edit tiles with their selection and history."""
+
+    __slots__ = (
+        "tiles", "version", "selected_tiles", "selection", "_dirty_box", "unjournaled_box",
+        "_regions_labels", "_regions_labels_version",
+        "history", "history_i", "_indexed_palette", "_indexed_tiles", "_indexed_snapshot",
+    )
+
+    def __init__(self: Self, cols: int, rows: int) -> None:
+        """
+        Creates an empty canvas.
+
+        Args:
+            columns, rows
+        """
+
+        # Packed rgba values, use get_rgba_view to get the channels
+        self.tiles: NDArray[uint32] = np.zeros((cols, rows), uint32)
+        # Incremented every time tiles change, used to invalidate caches
+        self.version: int = 0
+        self.selected_tiles: NDArray[bool_] = np.zeros((cols, rows), bool_)
+        # Tiles drawing is limited to
+        self.selection: NDArray[bool_] | None = None
+        # Changed tiles that aren't in the history yet
+        self._dirty_box: Box | None = None
+        # Changed tiles in the history that aren't in the journal yet
+        self.unjournaled_box: Box | None = None
+        # Connected regions of a packed color
+        self._regions_labels: dict[int, NDArray[int32]] = {}
+        self._regions_labels_version: int = self.version
+
+        # Tiles of the last snapshot as indexes, updated only in the changed tiles
+        self._indexed_palette: NDArray[uint32]
+        self._indexed_tiles: NDArray[uint8]
+        self._indexed_palette, self._indexed_tiles = get_indexed_tiles(self.tiles)
+        self._indexed_snapshot: HistorySnapshot = _get_indexed_snapshot(
+            self._indexed_palette, self._indexed_tiles
+        )
+
+        self.history: deque[HistorySnapshot] = deque((self._indexed_snapshot,))
+        self.history_i: int = 0
+
+    def set_tiles(self: Self, tiles: NDArray[uint32], should_reset_history: bool) -> None:
+        """
+        Sets the tiles and clears the selected ones.
+
+        Args:
+            tiles, reset history flag
+        """
+
+        self.tiles = tiles
+        self.selected_tiles = np.zeros(self.tiles.shape, bool_)
+        if (
+            self.selection is not None and
+            (should_reset_history or self.selection.shape != self.selected_tiles.shape)
+        ):
+            self.selection = None
+        self.version += 1
+
+        if should_reset_history:
+            self._indexed_palette, self._indexed_tiles = get_indexed_tiles(self.tiles)
+            self._indexed_snapshot = _get_indexed_snapshot(
+                self._indexed_palette, self._indexed_tiles
+            )
+            self.history.clear()
+            self.history.append(self._indexed_snapshot)
+            self.history_i = 0
+            self._dirty_box = self.unjournaled_box = None
+        else:
+            self._dirty_box = (0, 0, self.tiles.shape[0], self.tiles.shape[1])
+            self.unjournaled_box = self._dirty_box
+
+    def set_history_max_len(self: Self, n: int | None) -> None:
+        """
+        Sets the maximum history length and refresh the history index.
+
+        Args:
+            length (None = unlimited)
+        """
+
+        self.history = deque(self.history, n)
+        self.history_i = min(self.history_i, len(self.history) - 1)
+
+    def set_history(self: Self, history: list[HistorySnapshot], history_i: int) -> None:
+        """
+        Replaces the history keeping its maximum length.
+
+        Args:
+            history, history index
+        """
+
+        self.history = deque(history, self.history.maxlen)
+        self.history_i = min(max(history_i, 0), len(self.history) - 1)
+
+    def _select_symmetric_tiles(
+            self: Self, start_x: int, start_y: int, end_x: int, end_y: int, symmetry: Symmetry
+    ) -> None:
+        """
+        Selects the symmetric tiles of the selected ones in a section.
+
+        Args:
+            section start x, section start y, section end x, section end y, symmetry
+        """
+
+        xs: NDArray[intp]
+        ys: NDArray[intp]
+
+        if symmetry == (False, False, SYMMETRY_NONE):
+            return
+
+        start_x, start_y = max(start_x, 0), max(start_y, 0)
+        xs, ys = np.nonzero(self.selected_tiles[start_x:end_x, start_y:end_y])
+        xs += start_x
+        ys += start_y
+
+        xs, ys = get_symmetric_tiles(
+            xs, ys, get_symmetry_maps(self.tiles.shape[0], self.tiles.shape[1]), *symmetry
+        )
+        self.selected_tiles[xs, ys] = True
+
+    def select_brush_line(
+            self: Self, x_1: int, y_1: int, x_2: int, y_2: int,
+            brush_kernel: NDArray[uint8], symmetry: Symmetry
+    ) -> None:
+        """
+        Selects the tiles covered by a brush moved along a line, used by pencil, eraser and line.
+
+        The ends are moved inside the tiles.
+
+        Args:
+            line start x, line start y, line end x, line end y,
+            brush kernel, symmetry
+        """
+
+        max_x: int = self.tiles.shape[0] - 1
+        max_y: int = self.tiles.shape[1] - 1
+        line_tiles: NDArray[int32] = get_tiles_in_line(
+            min(max(x_1, 0), max_x), min(max(y_1, 0), max_y),
+            min(max(x_2, 0), max_x), min(max(y_2, 0), max_y),
+        )
+        stamped_section: tuple[int, int, int, int] = stamp_brush(
+            self.selected_tiles, line_tiles[:, 0], line_tiles[:, 1], brush_kernel
+        )
+        self._select_symmetric_tiles(*stamped_section, symmetry)
+
+    def select_rect(
+            self: Self, x_1: int, y_1: int, x_2: int, y_2: int,
+            brush_dim: int, should_fill: bool, symmetry: Symmetry
+    ) -> None:
+        """
+        Selects the rect between two corners, borders are as thick as the brush.
+
+        The rect can't be smaller than the brush, corners can be outside the tiles.
+
+        Args:
+            first corner x, first corner y, second corner x, second corner y,
+            brush dimension, fill flag, symmetry
+        """
+
+        start_x: int = min(x_1, x_2)
+        start_y: int = min(y_1, y_2)
+        end_x: int   = max(max(x_1, x_2) + 1, start_x + brush_dim)
+        end_y: int   = max(max(y_1, y_2) + 1, start_y + brush_dim)
+
+        # Negative starts would index from the end
+        if should_fill:
+            self.selected_tiles[max(start_x, 0):end_x, max(start_y, 0):end_y] = True
+        else:
+            self.selected_tiles[
+                max(start_x, 0):start_x + brush_dim,
+                max(start_y, 0):end_y,
+            ] = True
+            self.selected_tiles[
+                max(start_x, 0):end_x,
+                max(start_y, 0):start_y + brush_dim,
+            ] = True
+            self.selected_tiles[
+                max(end_x - brush_dim, 0):end_x,
+                max(start_y, 0):end_y,
+            ] = True
+            self.selected_tiles[
+                max(start_x, 0):end_x,
+                max(end_y - brush_dim, 0):end_y,
+            ] = True
+        self._select_symmetric_tiles(start_x, start_y, end_x, end_y, symmetry)
+
+    def select_region(
+            self: Self, x: int, y: int, should_get_all_matching: bool
+    ) -> NDArray[bool_]:
+        """
+        Selects the connected tiles with the same color of a tile, used by bucket and magic wand.
+
+        Args:
+            x, y, select all tiles with the same color flag
+        Returns:
+            region mask
+        """
+
+        region: NDArray[bool_] = self.get_region(x, y, should_get_all_matching)
+        self.selected_tiles |= region
+
+        return region
+
+    def add_to_selection(self: Self, mask: NDArray[bool_]) -> None:
+        """
+        Adds tiles to the selection drawing is limited to.
+
+        Args:
+            mask
+        """
+
+        self.selection = mask.copy() if self.selection is None else self.selection | mask
+
+    def limit_to_selection(self: Self) -> None:
+        """Deselects the selected tiles outside the selection."""
+
+        if self.selection is not None:
+            self.selected_tiles &= self.selection
+
+    def draw(self: Self, packed_color: uint32) -> tuple[NDArray[intp], NDArray[intp]] | None:
+        """
+        Sets the selected tiles to a color.
+
+        Args:
+            packed color
+        Returns:
+            xs, ys of the selected tiles (None if nothing changed)
+        """
+
+        selected_xs: NDArray[intp]
+        selected_ys: NDArray[intp]
+
+        if not (self.tiles[self.selected_tiles] != packed_color).any():
+            return None
+
+        self.tiles[self.selected_tiles] = packed_color
+        self.version += 1
+        selected_tiles_indexes: NDArray[intp] = np.flatnonzero(self.selected_tiles)
+        selected_xs, selected_ys = np.divmod(selected_tiles_indexes, self.tiles.shape[1])
+        left: int = int(selected_xs.min())
+        top: int  = int(selected_ys.min())
+        self._dirty_box = _union_boxes(self._dirty_box, (
+            left, top,
+            int(selected_xs.max()) - left + 1, int(selected_ys.max()) - top + 1
+        ))
+
+        return selected_xs, selected_ys
+
+    def replace_color(self: Self, prev_packed_color: uint32, packed_color: uint32) -> bool:
+        """
+        Replaces every tile of a color with another one.
+
+        Args:
+            previous packed color, packed color
+        Returns:
+            changed flag
+        """
+
+        prev_color_mask: NDArray[bool_] = self.tiles == prev_packed_color
+        did_change: bool = prev_packed_color != packed_color and prev_color_mask.any()
+        if did_change:
+            self.tiles[prev_color_mask] = packed_color
+            self.version += 1
+            self._dirty_box = (0, 0, self.tiles.shape[0], self.tiles.shape[1])
+
+        return did_change
+
+    def replace_tiles(self: Self, tiles: NDArray[uint32]) -> bool:
+        """
+        Replaces the tiles with others of the same size, keeps the selected ones.
+
+        Args:
+            tiles
+        Returns:
+            changed flag
+        """
+
+        did_change: bool = not np.array_equal(self.tiles, tiles)
+        if did_change:
+            self.tiles[...] = tiles
+            self.version += 1
+            self._dirty_box = (0, 0, self.tiles.shape[0], self.tiles.shape[1])
+
+        return did_change
+
+    def get_region(self: Self, col: int, row: int, should_get_all_matching: bool) -> NDArray[bool_]:
+        """
+        Gets the tiles with the same color of a tile that are connected to it.
+
+        Connected regions come from a label map of the tile color that's cached until tiles change.
+
+        Args:
+            column, row, get all tiles with the same color flag
+        Returns:
+            region mask
+        """
+
+        _num_labels: int
+
+        if self._regions_labels_version != self.version:
+            self._regions_labels.clear()
+            self._regions_labels_version = self.version
+
+        packed_color: int = int(self.tiles[col, row])
+        labels: NDArray[int32] | None = self._regions_labels.get(packed_color)
+        if labels is None:
+            if len(self._regions_labels) == _REGIONS_LABELS_CACHE_MAX_LEN:
+                del self._regions_labels[next(iter(self._regions_labels))]
+
+            import cv2  # Lazy, only needed by tools
+            color_mask: NDArray[uint8] = (self.tiles == packed_color).view(uint8)
+            _num_labels, labels = cv2.connectedComponents(
+                color_mask,
+                connectivity=4, ltype=cv2.CV_32S
+            )
+            self._regions_labels[packed_color] = labels
+
+        if should_get_all_matching:
+            return labels != 0
+        return labels == labels[col, row]
+
+    def _upt_indexed_tiles(self: Self, box: Box) -> bool:
+        """
+        Updates the indexed tiles in a box, only the colors of the box are searched.
+
+        New colors are appended to the palette,
+        unused ones are dropped only when the indexes would need a bigger type.
+
+        Args:
+            box
+        Returns:
+            changed flag
+        """
+
+        x: int
+        y: int
+        w: int
+        h: int
+
+        if self._indexed_tiles.shape != self.tiles.shape:
+            self._indexed_palette, self._indexed_tiles = get_indexed_tiles(self.tiles)
+            return True
+
+        x, y, w, h = box
+        section_tiles: NDArray[uint32] = self.tiles[x:x + w, y:y + h]
+        section_indexes: NDArray[uint8] = self._indexed_tiles[x:x + w, y:y + h]
+        if np.array_equal(self._indexed_palette[section_indexes], section_tiles):
+            return False
+
+        new_colors: NDArray[uint32] = np.setdiff1d(
+            np.unique(section_tiles), self._indexed_palette, assume_unique=True
+        )
+        if new_colors.size != 0:
+            num_colors: int = self._indexed_palette.size + new_colors.size
+            if get_indexes_dtype(num_colors) != self._indexed_tiles.dtype:
+                self._indexed_palette, self._indexed_tiles = get_indexed_tiles(self.tiles)
+                return True
+            self._indexed_palette = np.concatenate((self._indexed_palette, new_colors))
+
+        sorted_palette_indexes: NDArray[intp] = np.argsort(self._indexed_palette)
+        section_indexes[...] = sorted_palette_indexes[np.searchsorted(
+            self._indexed_palette, section_tiles, sorter=sorted_palette_indexes
+        )]
+
+        return True
+
+    def add_to_history(self: Self) -> None:
+        """
+        Adds the current tiles to the history if different from the viewed snapshot.
+
+        Only the changed tiles are indexed, tiles must be changed with the canvas methods.
+        Changed tiles become unjournaled.
+        """
+
+        if self.history[self.history_i] is not self._indexed_snapshot:
+            # The viewed snapshot changed (e.g. undo), every tile is compared with it
+            self._indexed_snapshot = self.history[self.history_i]
+            self._indexed_palette, self._indexed_tiles = _get_snapshot_indexes(
+                self._indexed_snapshot
+            )
+            self._indexed_tiles = self._indexed_tiles.copy()
+            self._dirty_box = (0, 0, self.tiles.shape[0], self.tiles.shape[1])
+        if self._dirty_box is None:
+            return
+
+        if self._upt_indexed_tiles(self._dirty_box):
+            if self.history_i != (len(self.history) - 1):
+                # Clearing the history while slicing it fails
+                end_i: int = self.history_i + 1
+                self.history = deque(islice(self.history, end_i), self.history.maxlen)
+            self._indexed_snapshot = _get_indexed_snapshot(
+                self._indexed_palette, self._indexed_tiles
+            )
+            self.history.append(self._indexed_snapshot)
+            self.history_i = min(self.history_i + 1, len(self.history) - 1)
+
+            self.unjournaled_box = _union_boxes(self.unjournaled_box, self._dirty_box)
+        self._dirty_box = None
+
+    def pop_unjournaled_box(self: Self) -> Box | None:
+        """
+        Gets the changed tiles that aren't in the journal yet and clears them.
+
+        Returns:
+            box inside the tiles (None if there are none)
+        """
+
+        if self.unjournaled_box is None:
+            return None
+
+        x: int = min(self.unjournaled_box[0], self.tiles.shape[0])
+        y: int = min(self.unjournaled_box[1], self.tiles.shape[1])
+        w: int = min(x + self.unjournaled_box[2], self.tiles.shape[0]) - x
+        h: int = min(y + self.unjournaled_box[3], self.tiles.shape[1]) - y
+        self.unjournaled_box = None
+
+        return x, y, w, h
+
+    def get_img_bytes(self: Self, img_format: str, save_mode: int) -> bytes:
+        """
+        Encodes the tiles as an image.
+
+        Args:
+            format (e.g. png), save mode
+        Returns:
+            image bytes
+        """
+
+        return get_img_bytes(self.tiles, img_format, save_mode)
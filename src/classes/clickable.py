@@ -12,6 +12,7 @@ from src.classes.devices import MOUSE
 import src.obj_utils as objs
 import src.vars as my_vars
 from src.obj_utils import UIElement, resize_obj
+from src.utils import get_scaled_img
 from src.type_utils import XY, CoordType, RectPos
 from src.consts import (
     BLACK,
@@ -34,6 +35,8 @@ class _Clickable(UIElement):
     )
 
     scale: float = 1
+    # Subclasses with images created often don't cache them, they would evict the shared ones
+    should_cache_imgs: bool = True
 
     def __init__(
             self: Self, pos: RectPos, imgs: tuple[Surface, ...],
@@ -129,10 +132,13 @@ class _Clickable(UIElement):
         """
 
         img_i: int = self._imgs.index(self.blit_sequence[0][0])
-        self._imgs = tuple([
-            transform.scale(img, self._frame_rect.size).convert()
-            for img in imgs
-        ])
+        if self.should_cache_imgs:
+            self._imgs = tuple([get_scaled_img(img, self._frame_rect.size) for img in imgs])
+        else:
+            self._imgs = tuple([
+                transform.scale(img, self._frame_rect.size).convert()
+                for img in imgs
+            ])
         self.blit_sequence[0] = (self._imgs[img_i], self._frame_rect, self.layer)
 
     def set_layer(self: Self, layer: int) -> None:
@@ -1,4 +1,8 @@
-"""Class to create a grid of connected checkboxes for unique colors."""
+"""
+Class to create a grid of connected checkboxes for unique colors.
+
+Only the visible colors have a checkbox, they're recycled when scrolling.
+"""
 
 from math import ceil
 from typing import Self, Final
@@ -26,10 +30,14 @@ _COLOR_IMG: Final[Surface] = Surface((32, 32))
 NUM_COLS: Final[int] = 5
 NUM_VISIBLE_ROWS: Final[int] = 10
 
+# Least recently used first, scrolling back reuses the images of the colors
+_COLOR_CHECKBOX_INFO_CACHE: Final[dict[HexColor, tuple[tuple[Surface, ...], str]]] = {}
+_COLOR_CHECKBOX_INFO_CACHE_MAX_SIZE: Final[int] = 256
+
 
 def _get_color_checkbox_info(hex_color: HexColor) -> tuple[tuple[Surface, ...], str]:
     """
-    Creates the checkbox info for a color.
+    Gets the checkbox info for a color from the cache, the images shouldn't be modified.
 
     Args:
         hexadecimal color
@@ -37,14 +45,29 @@ def _get_color_checkbox_info(hex_color: HexColor) -> tuple[tuple[Surface, ...],
         checkbox images and hovering text
     """
 
-    hex_color = "#" + hex_color
-    color: Color = Color(hex_color)
+    if hex_color in _COLOR_CHECKBOX_INFO_CACHE:
+        # Moves it to the end
+        _COLOR_CHECKBOX_INFO_CACHE[hex_color] = _COLOR_CHECKBOX_INFO_CACHE.pop(hex_color)
+        return _COLOR_CHECKBOX_INFO_CACHE[hex_color]
+
+    color: Color = Color("#" + hex_color)
     _COLOR_IMG.fill(color)
 
-    return (
+    if len(_COLOR_CHECKBOX_INFO_CACHE) == _COLOR_CHECKBOX_INFO_CACHE_MAX_SIZE:
+        del _COLOR_CHECKBOX_INFO_CACHE[next(iter(_COLOR_CHECKBOX_INFO_CACHE))]
+    _COLOR_CHECKBOX_INFO_CACHE[hex_color] = (
         (add_border(_COLOR_IMG, DARKER_GRAY), add_border(_COLOR_IMG, WHITE)),
-        f"{color[:3]}\n{hex_color}"
+        f"{color[:3]}\n#{hex_color}"
     )
+    return _COLOR_CHECKBOX_INFO_CACHE[hex_color]
+
+
+class _ColorCheckbox(LockedCheckbox):
+    """Class to create a checkbox for a color, its images change when scrolling."""
+
+    __slots__ = ()
+
+    should_cache_imgs: bool = False
 
 
 class ColorsGrid(UIElement):
@@ -52,8 +75,8 @@ class ColorsGrid(UIElement):
 
     __slots__ = (
         "_init_pos",
-        "colors", "visible_checkboxes", "hovered_checkbox", "rect",
-        "clicked_i", "offset_y", "prev_clicked_i",
+        "colors", "colors_indexes", "_checkboxes_pool", "visible_checkboxes", "hovered_checkbox",
+        "rect", "clicked_i", "offset_y", "prev_clicked_i",
     )
 
     def __init__(self: Self, pos: RectPos, base_layer: int = BG_LAYER) -> None:
@@ -69,6 +92,9 @@ class ColorsGrid(UIElement):
         self._init_pos: RectPos = pos
 
         self.colors: list[HexColor] = []
+        self.colors_indexes: dict[HexColor, int] = {}
+        # The first ones are the visible checkboxes
+        self._checkboxes_pool: list[LockedCheckbox] = []
         self.visible_checkboxes: tuple[LockedCheckbox, ...] = ()
         self.hovered_checkbox: LockedCheckbox | None = None
         self.rect: Rect = Rect(self._init_pos.x, self._init_pos.y, 0, 0)
@@ -110,6 +136,33 @@ class ColorsGrid(UIElement):
             self.visible_checkboxes[i].rec_move_to(init_x, init_y)
             self.visible_checkboxes[i].rec_resize()
 
+    def _get_checkbox(self: Self, rel_i: int, hex_color: HexColor) -> LockedCheckbox:
+        """
+        Gets an unchecked checkbox for a color from the pool, creates it if it's missing.
+
+        Args:
+            relative index, hexadecimal color
+        Returns:
+            checkbox (its images and text are refreshed when it's resized)
+        """
+
+        imgs: tuple[Surface, ...]
+        hovering_text: str
+
+        imgs, hovering_text = _get_color_checkbox_info(hex_color)
+        if rel_i == len(self._checkboxes_pool):
+            self._checkboxes_pool.append(_ColorCheckbox(
+                RectPos(0, 0, self._init_pos.coord_type), imgs, hovering_text, self.layer
+            ))
+            return self._checkboxes_pool[rel_i]
+
+        checkbox: LockedCheckbox = self._checkboxes_pool[rel_i]
+        checkbox.init_imgs = imgs
+        checkbox.hovering_text_label.text = hovering_text  # Rendered when it's resized
+        checkbox.is_checked = False
+        checkbox.leave()
+        return checkbox
+
     def set_offset_y(self: Self, offset_y: int) -> None:
         """
         Sets the row offset, and refreshes the visible checkboxes.
@@ -123,11 +176,8 @@ class ColorsGrid(UIElement):
         visible_start_i: int =  self.offset_y                     * NUM_COLS
         visible_end_i: int   = (self.offset_y + NUM_VISIBLE_ROWS) * NUM_COLS
         self.visible_checkboxes = tuple([
-            LockedCheckbox(
-                RectPos(0, 0, self._init_pos.coord_type),
-                *_get_color_checkbox_info(color), self.layer
-            )
-            for color in self.colors[visible_start_i:visible_end_i]
+            self._get_checkbox(rel_i, hex_color)
+            for rel_i, hex_color in enumerate(self.colors[visible_start_i:visible_end_i])
         ])
         self.sub_objs = self.visible_checkboxes
 
@@ -146,7 +196,11 @@ class ColorsGrid(UIElement):
             hexadecimal colors, clicked index, y offset
         """
 
+        i: int
+        hex_color: HexColor
+
         self.colors = hex_colors
+        self.colors_indexes = {hex_color: i for i, hex_color in enumerate(self.colors)}
         self.clicked_i = self.prev_clicked_i = clicked_i
         self.set_offset_y(offset_y)
         checkbox_grid_get_rect(self.visible_checkboxes, self.rect)
@@ -186,16 +240,16 @@ class ColorsGrid(UIElement):
             hexadecimal color
         """
 
-        if hex_color not in self.colors:
+        if hex_color not in self.colors_indexes:
+            self.colors_indexes[hex_color] = len(self.colors)
             self.colors.append(hex_color)
 
             visible_start_i: int =  self.offset_y                     * NUM_COLS
             visible_end_i: int   = (self.offset_y + NUM_VISIBLE_ROWS) * NUM_COLS
             if visible_start_i <= (len(self.colors) - 1) < visible_end_i:
-                self.visible_checkboxes += (LockedCheckbox(
-                    RectPos(0, 0, self._init_pos.coord_type),
-                    *_get_color_checkbox_info(hex_color), self.layer
-                ),)
+                self.visible_checkboxes += (
+                    self._get_checkbox(len(self.visible_checkboxes), hex_color),
+                )
                 self.sub_objs = self.visible_checkboxes
 
                 self._move_section_to_last(start_i=len(self.visible_checkboxes) - 1)
@@ -212,7 +266,9 @@ class ColorsGrid(UIElement):
         imgs: tuple[Surface, ...]
         hovering_text: str
 
-        if hex_color not in self.colors:
+        if hex_color not in self.colors_indexes:
+            del self.colors_indexes[self.colors[edit_i]]
+            self.colors_indexes[hex_color] = edit_i
             self.colors[edit_i] = hex_color
 
             visible_start_i: int = self.offset_y * NUM_COLS
@@ -234,10 +290,14 @@ class ColorsGrid(UIElement):
             index
         """
 
+        i: int
+
         if len(self.colors) == 1:
             self.edit(0, HEX_BLACK)
         else:
-            self.colors.pop(remove_i)
+            del self.colors_indexes[self.colors.pop(remove_i)]
+            for i in range(remove_i, len(self.colors)):
+                self.colors_indexes[self.colors[i]] = i
             if self.clicked_i > remove_i:
                 self.clicked_i = self.prev_clicked_i = self.clicked_i - 1
             elif self.clicked_i == remove_i:
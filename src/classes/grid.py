@@ -1,40 +1,39 @@
-"""Class to create a pixel grid with a minimap."""
+"""
+Class to create a pixel grid with a minimap.
+
+The grid is a view over a canvas, it renders the tiles and handles the view and file saving.
+"""
 
-from tkinter import messagebox
 from pathlib import Path
-from zlib import compress
 from collections import deque
-from collections.abc import Callable
-from itertools import islice
 from math import ceil
 from sys import stderr
-from io import BytesIO
 from typing import Literal, Self, TypeAlias, Final
 
 import pygame as pg
 import numpy as np
-import cv2
 from pygame import (
     Color, Surface, Rect, surfarray, draw, transform, mouse,
     K_TAB, K_LEFT, K_RIGHT, K_DOWN, K_UP,
     K_MINUS, K_PLUS,
-    SRCALPHA, SYSTEM_CURSOR_CROSSHAIR,
+    SYSTEM_CURSOR_CROSSHAIR,
 )
 from numpy import uint8, uint16, uint32, intp, bool_, newaxis
 from numpy.typing import NDArray
-from cv2 import INTER_AREA
-from PIL import Image
 
 from src.classes.devices import MOUSE, KEYBOARD
 
 import src.vars as my_vars
-from src.utils import get_pixels
+from src.utils import get_packed_pixels, get_img, pack_color
 from src.obj_utils import UIElement, resize_obj
 from src.file_utils import (
     FileError, handle_file_os_error,
     try_write_file, try_replace_file, try_remove_file, try_create_dir,
 )
 from src.lock_utils import LockError, try_lock_file
+from src.canvas import HistorySnapshot, Canvas
+from src.tiles_utils import SAVE_MODE_DEFAULT, get_rgba_view
+from src.project_utils import PROJECT_SUFFIX, get_project_info_bytes, save_project
 from src.type_utils import XY, WH, HexColor, RectPos
 from src.consts import (
     YELLOW,
@@ -42,7 +41,8 @@ from src.consts import (
     FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I,
 )
 
-_HistorySnapshot: TypeAlias = tuple[int, int, bytes]
+# Path, tiles, image or project info, project flag
+SaveInfo: TypeAlias = tuple[Path, NDArray[uint32], bytes, bool]
 
 _GRID_DIM_CAP: Final[int] = 600
 _MINIMAP_DIM_CAP: Final[int] = 256
@@ -127,10 +127,12 @@ def grid_resize(
     elif max_dim > transition_end:
         small_img = transform.smoothscale(small_img, (w, h))
     elif transition_start <= max_dim <= transition_end:
+        import cv2  # Lazy, only needed for some sizes
+
         # Gradual transition
         small_img = surfarray.make_surface(cv2.resize(
             surfarray.pixels3d(small_img), (h, w),
-            interpolation=INTER_AREA
+            interpolation=cv2.INTER_AREA
         ).astype(uint8))
 
     rect.size = (w, h)
@@ -175,16 +177,103 @@ def grid_draw_tile_lines(
         draw.line(img, YELLOW, (0, y), (img_w, y))
 
 
+def ask_save_dir_creation(file_str: str) -> bool:
+    """
+    Asks the user if the missing directory of a save should be created, uses the GUI.
+
+    Args:
+        file string
+    Returns:
+        continue flag
+    """
+
+    file_path: Path = Path(file_str)
+    if file_path.parent.exists():
+        return True
+
+    from tkinter import messagebox  # Lazy, only needed on missing directories
+    return messagebox.askyesno(
+        "Image Save Failed",
+        f"Directory missing: {file_path.parent.name}\nDo you wanna create it?",
+        icon="warning",
+    )
+
+def try_write_save(save_info: SaveInfo) -> str | None:
+    """
+    Writes the image or project of a save info with retries, it doesn't use the grid or the GUI.
+
+    Missing directories are created, ask_save_dir_creation asks first.
+
+    Args:
+        save info
+    Returns:
+        error string (can be None)
+    """
+
+    file_path: Path
+    tiles: NDArray[uint32]
+    content: bytes
+    is_project: bool
+    should_retry: bool
+
+    file_path, tiles, content, is_project = save_info
+    temp_file_path: Path = Path(str(file_path) + ".tmp")
+
+    error_str: str | None = None
+    dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
+    system_attempt_i: int       = FILE_ATTEMPT_START_I
+    while (
+        dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
+        system_attempt_i       <= FILE_ATTEMPT_STOP_I
+    ):
+        try:
+            if is_project:
+                save_project(file_path, tiles, content)
+            else:
+                # If you open in write mode it will empty the file even if it's locked
+                with temp_file_path.open("ab") as f:
+                    try_lock_file(f, should_be_shared=False)
+                    try_write_file(f, content)
+                try_replace_file(temp_file_path, file_path)
+            error_str = None
+            break
+        except FileNotFoundError:
+            dir_creation_attempt_i += 1
+            error_str = try_create_dir(file_path.parent, dir_creation_attempt_i)
+            if error_str is not None:
+                break
+        except (PermissionError, LockError, FileError) as e:
+            error_str = {
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+
+            error_str = f"{file_path.name}: {error_str}"
+            break
+        except OSError as e:
+            system_attempt_i += 1
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and system_attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** system_attempt_i)
+                continue
+
+            try_remove_file(temp_file_path)
+            error_str = f"{file_path.name}: {error_str}"
+            break
+
+    return error_str
+
+
 class Grid(UIElement):
     """Class to create a pixel grid with a minimap."""
 
     __slots__ = (
         "_grid_init_pos",
-        "cols", "rows", "visible_cols", "visible_rows", "offset_x", "offset_y", "grid_tile_dim",
+        "visible_cols", "visible_rows", "offset_x", "offset_y", "grid_tile_dim",
         "grid_rect",
-        "tiles", "selected_tiles",
+        "canvas",
         "brush_dim", "zoom_direction", "should_show_center", "tile_mode_size",
-        "history", "history_i",
         "_minimap_init_pos", "minimap_rect", "_unscaled_minimap_img",
     )
 
@@ -202,8 +291,8 @@ class Grid(UIElement):
 
         self._grid_init_pos: RectPos = grid_pos
 
-        self.cols: int = 1
-        self.rows: int = 1
+        self.canvas: Canvas = Canvas(1, 1)
+
         self.visible_cols: int = 1
         self.visible_rows: int = 1
         self.offset_x: int = 0
@@ -217,18 +306,11 @@ class Grid(UIElement):
             (self._grid_init_pos.x, self._grid_init_pos.y)
         )
 
-        self.tiles: NDArray[uint8] = np.zeros((self.cols, self.rows, 4), uint8)
-        self.selected_tiles: NDArray[bool_] = np.zeros((self.cols, self.rows), bool_)
-
         self.brush_dim: int = 1
         self.zoom_direction: Literal[-1, 1] = 1
         self.should_show_center: bool = False
         self.tile_mode_size: WH | None = None
 
-        compressed_tiles: bytes = compress(self.tiles.tobytes())
-        self.history: deque[_HistorySnapshot] = deque(((self.cols, self.rows, compressed_tiles),))
-        self.history_i: int = 0
-
         self._minimap_init_pos: RectPos = minimap_pos
 
         minimap_img: Surface = Surface((_MINIMAP_DIM_CAP, _MINIMAP_DIM_CAP))
@@ -251,6 +333,87 @@ class Grid(UIElement):
             (minimap_img, self.minimap_rect, self.layer),
         ]
 
+    @property
+    def cols(self: Self) -> int:
+        """Gets the number of columns of the canvas."""
+
+        return self.canvas.tiles.shape[0]
+
+    @property
+    def rows(self: Self) -> int:
+        """Gets the number of rows of the canvas."""
+
+        return self.canvas.tiles.shape[1]
+
+    @property
+    def tiles(self: Self) -> NDArray[uint32]:
+        """Gets the tiles of the canvas."""
+
+        return self.canvas.tiles
+
+    @property
+    def selected_tiles(self: Self) -> NDArray[bool_]:
+        """Gets the selected tiles of the canvas."""
+
+        return self.canvas.selected_tiles
+
+    @selected_tiles.setter
+    def selected_tiles(self: Self, selected_tiles: NDArray[bool_]) -> None:
+        """
+        Sets the selected tiles of the canvas.
+
+        Args:
+            selected tiles
+        """
+
+        self.canvas.selected_tiles = selected_tiles
+
+    @property
+    def selection(self: Self) -> NDArray[bool_] | None:
+        """Gets the tiles drawing is limited to."""
+
+        return self.canvas.selection
+
+    @selection.setter
+    def selection(self: Self, selection: NDArray[bool_] | None) -> None:
+        """
+        Sets the tiles drawing is limited to.
+
+        Args:
+            selection
+        """
+
+        self.canvas.selection = selection
+
+    @property
+    def version(self: Self) -> int:
+        """Gets the version of the canvas, incremented every time tiles change."""
+
+        return self.canvas.version
+
+    @property
+    def history(self: Self) -> deque[HistorySnapshot]:
+        """Gets the history of the canvas."""
+
+        return self.canvas.history
+
+    @property
+    def history_i(self: Self) -> int:
+        """Gets the index of the viewed history snapshot."""
+
+        return self.canvas.history_i
+
+    @history_i.setter
+    def history_i(self: Self, history_i: int) -> None:
+        """
+        Sets the index of the viewed history snapshot.
+
+        Args:
+            history index
+        """
+
+        self.canvas.history_i = history_i
+
     def leave(self: Self) -> None:
         """Clears the relevant data when the object state is leaved."""
 
@@ -263,19 +426,8 @@ class Grid(UIElement):
         self.refresh_grid_img()
         self.refresh_minimap_img()
 
-    def set_history_max_len(self: Self, n: int) -> None:
-        """
-        Sets the maximum history length and refresh the history index.
-
-        Args:
-            length
-        """
-
-        self.history = deque(self.history, n)
-        self.history_i = min(self.history_i, len(self.history) - 1)
-
     def set_info(
-            self: Self, tiles: NDArray[uint8],
+            self: Self, tiles: NDArray[uint32],
             visible_cols: int, visible_rows: int, offset_x: int, offset_y: int,
             should_reset_history: bool
     ) -> None:
@@ -286,18 +438,28 @@ class Grid(UIElement):
             tiles, visible columns, visible rows, x offset, y offset, reset history flag
         """
 
-        self.tiles = tiles
-        self.cols, self.rows = self.tiles.shape[0], self.tiles.shape[1]
+        self.canvas.set_tiles(tiles, should_reset_history)
         self.visible_cols = min(visible_cols, self.cols)
         self.visible_rows = min(visible_rows, self.rows)
         self.offset_x = min(offset_x, self.cols - self.visible_cols)
         self.offset_y = min(offset_y, self.rows - self.visible_rows)
 
-        self.selected_tiles = np.zeros((self.cols, self.rows), bool_)
-        if should_reset_history:
-            self.history.clear()
-            self.history.append((self.cols, self.rows, compress(self.tiles.tobytes())))
-            self.history_i = 0
+    def set_canvas(
+            self: Self, canvas: Canvas,
+            visible_cols: int, visible_rows: int, offset_x: int, offset_y: int
+    ) -> None:
+        """
+        Sets the canvas of another document, visible area and offset without refreshing.
+
+        Args:
+            canvas, visible columns, visible rows, x offset, y offset
+        """
+
+        self.canvas = canvas
+        self.visible_cols = min(max(visible_cols, 1), self.cols)
+        self.visible_rows = min(max(visible_rows, 1), self.rows)
+        self.offset_x = min(max(offset_x, 0), self.cols - self.visible_cols)
+        self.offset_y = min(max(offset_y, 0), self.rows - self.visible_rows)
 
     def refresh_grid_img(self: Self) -> None:
         """Refreshes the grid image from the unscaled minimap and draws the selected tiles."""
@@ -432,7 +594,8 @@ class Grid(UIElement):
         """Refreshes the grid, minimap and minimap rect."""
 
         # Repeats tiles so an empty tile image takes 1 normal-sized tile
-        repeated_tiles: NDArray[uint8] = self.tiles.repeat(TILE_W, 0).repeat(TILE_H, 1)
+        rgba_tiles: NDArray[uint8] = get_rgba_view(self.tiles)
+        repeated_tiles: NDArray[uint8] = rgba_tiles.repeat(TILE_W, 0).repeat(TILE_H, 1)
         empty_tiles_mask: NDArray[bool_] = (repeated_tiles[..., 3] == 0)[..., newaxis]
 
         empty_img_arr: NDArray[uint8] = np.tile(EMPTY_TILE_ARR, (self.cols, self.rows, 1))
@@ -451,35 +614,68 @@ class Grid(UIElement):
             image (if None it creates an empty grid)
         """
 
+        tiles: NDArray[uint32]
+
         if img is None:
-            self.tiles = np.zeros((self.cols, self.rows, 4), uint8)
+            tiles = np.zeros((self.cols, self.rows), uint32)
         else:
-            self.tiles = get_pixels(img)
+            tiles = get_packed_pixels(img)
 
-            extra_w: int = self.cols - self.tiles.shape[0]
+            extra_w: int = self.cols - tiles.shape[0]
             if   extra_w < 0:
-                self.tiles = self.tiles[:self.cols, ...]
+                tiles = tiles[:self.cols]
             elif extra_w > 0:
-                self.tiles = np.pad(
-                    self.tiles, ((0, extra_w), (0, 0), (0, 0)),
+                tiles = np.pad(
+                    tiles, ((0, extra_w), (0, 0)),
                     constant_values=0
                 )
 
-            extra_h: int = self.rows - self.tiles.shape[1]
+            extra_h: int = self.rows - tiles.shape[1]
             if   extra_h < 0:
-                self.tiles = self.tiles[:, :self.rows, ...]
+                tiles = tiles[:, :self.rows]
             elif extra_h > 0:
-                self.tiles = np.pad(
-                    self.tiles, ((0, 0), (0, extra_h), (0, 0)),
+                tiles = np.pad(
+                    tiles, ((0, 0), (0, extra_h)),
                     constant_values=0
                 )
 
-        self.history.clear()
-        self.history.append((self.cols, self.rows, compress(self.tiles.tobytes())))
-        self.history_i = 0
-
+        self.canvas.set_tiles(tiles, should_reset_history=True)
         self.refresh_full()
 
+    def replace_color(self: Self, prev_hex_color: HexColor, hex_color: HexColor) -> bool:
+        """
+        Replaces every tile of a color with another one and refreshes.
+
+        Args:
+            previous hexadecimal color, hexadecimal color
+        Returns:
+            changed flag
+        """
+
+        did_change: bool = self.canvas.replace_color(
+            pack_color(Color("#" + prev_hex_color)), pack_color(Color("#" + hex_color))
+        )
+        if did_change:
+            self.refresh_full()
+
+        return did_change
+
+    def replace_tiles(self: Self, tiles: NDArray[uint32]) -> bool:
+        """
+        Replaces the tiles with others of the same size and refreshes.
+
+        Args:
+            tiles
+        Returns:
+            changed flag
+        """
+
+        did_change: bool = self.canvas.replace_tiles(tiles)
+        if did_change:
+            self.refresh_full()
+
+        return did_change
+
     def handle_move_with_keys(self: Self, rel_mouse_col: int, rel_mouse_row: int) -> XY:
         """
         Handles moving the mouse tile with the keyboard.
@@ -663,19 +859,14 @@ class Grid(UIElement):
         selected_xs: NDArray[intp]
         selected_ys: NDArray[intp]
 
-        rgba_color: NDArray[uint8] = np.array(
-            (0, 0, 0, 0) if is_erasing else Color("#" + hex_color),
-            uint8
+        color: Color = Color(0, 0, 0, 0) if is_erasing else Color("#" + hex_color)
+        selected_xys: tuple[NDArray[intp], NDArray[intp]] | None = self.canvas.draw(
+            pack_color(color)
         )
 
-        # Packs a color as a uint32 and compares
-        tiles_view: NDArray[uint32] = self.tiles[self.selected_tiles].view(uint32)
-        rgba_color_view: NDArray[uint32] = rgba_color.view(uint32)
-        did_draw: bool = (tiles_view[..., 0] != rgba_color_view[0]).any()
-        if did_draw:
-            self.tiles[self.selected_tiles] = rgba_color
-            selected_tiles_indexes: NDArray[intp] = np.flatnonzero(self.selected_tiles)
-            selected_xs, selected_ys = np.divmod(selected_tiles_indexes, self.rows)
+        did_draw: bool = selected_xys is not None
+        if selected_xys is not None:
+            selected_xs, selected_ys = selected_xys
             selected_xs *= TILE_W
             selected_ys *= TILE_H
 
@@ -702,123 +893,63 @@ class Grid(UIElement):
                 empty_tile_arr_1d: NDArray[uint8] = EMPTY_TILE_ARR.reshape(-1, 3, order="F")
                 unscaled_img_arr[selected_1d_indexes] = empty_tile_arr_1d[empty_tile_arr_1d_indexes]
             else:
-                unscaled_img_arr[selected_1d_indexes] = rgba_color[:3]
+                unscaled_img_arr[selected_1d_indexes] = (color.r, color.g, color.b)
 
         return did_draw
 
-    def add_to_history(self: Self) -> None:
-        """Adds the current info to the history if different from the last snapshot."""
-
-        snapshot: _HistorySnapshot = (self.cols, self.rows, compress(self.tiles.tobytes()))
-        if snapshot != self.history[self.history_i]:
-            if self.history_i != (len(self.history) - 1):
-                end_i: int = self.history_i + 1
-                history_sl: islice[_HistorySnapshot] = islice(self.history, end_i)
-                self.history.clear()
-                self.history.extend(history_sl)
-            self.history.append(snapshot)
-            self.history_i = min(self.history_i + 1, len(self.history) - 1)
-
-    def try_save(
+    def get_save_info(
             self: Self, file_str: str,
-            should_ask_create_dir: bool, should_use_gui: bool = True
-    ) -> Surface | None:
+            palette: list[HexColor] | None = None, save_mode: int = SAVE_MODE_DEFAULT
+    ) -> SaveInfo:
         """
-        Saves the image to a file with retries.
+        Encodes the image or the project info, tiles of projects are copied.
 
         Args:
-            file string, ask directory creation flag, use GUI for errors flag (default = True)
+            file string, palette saved in projects (default = None), save mode (default = default)
         Returns:
-            image (can be None)
+            save info
         """
 
-        error_str: str
-        should_retry: bool
-
-        if file_str == "":
-            return None
-
-        pg_img: Surface = Surface((self.cols, self.rows), SRCALPHA)
-        surfarray.blit_array(pg_img, self.tiles[..., :3])
-        surfarray.pixels_alpha(pg_img)[...] = self.tiles[..., 3]
-        pg_img_bytes: bytes = pg.image.tobytes(pg_img, "RGBA")
-        img: Image.Image = Image.frombytes("RGBA", pg_img.get_size(), pg_img_bytes)
-
         file_path: Path = Path(file_str)
-        temp_file_path: Path = Path(file_str + ".tmp")
+        if file_path.suffix == PROJECT_SUFFIX:
+            # Chunks are compressed only if changed
+            project_info_bytes: bytes = get_project_info_bytes(
+                self.visible_cols, self.visible_rows, self.offset_x, self.offset_y,
+                [] if palette is None else palette, list(self.history), self.history_i
+            )
+            return file_path, self.tiles.copy(), project_info_bytes, True
 
-        dummy_file: BytesIO = BytesIO()
         suffix: str = file_path.suffix if file_path.suffix != "" else file_path.name  # Dotfiles
-        img.save(dummy_file, suffix[1:], lossless=True)
-        img_bytes: bytes = dummy_file.getvalue()
+        return file_path, self.tiles, self.canvas.get_img_bytes(suffix[1:], save_mode), False
 
-        display_error: Callable[[str, str], None] = (
-            (lambda title, error_str: (messagebox.showerror(title, error_str), None)[1])
-            if should_use_gui else
-            (lambda title, error_str: print(f"{title}\n{error_str}", file=stderr))
-        )
-        def _handle_dir_not_found() -> bool:
-            """
-            Creates the directory, asks the user if it should.
-
-            Returns:
-                failed flag
-            """
-
-            if should_ask_create_dir and dir_creation_attempt_i == FILE_ATTEMPT_START_I + 1:
-                should_create: bool = messagebox.askyesno(
-                    "Image Save Failed",
-                    f"Directory missing: {file_path.parent.name}\nDo you wanna create it?",
-                    icon="warning",
-                )
+    def try_save(
+            self: Self, file_str: str,
+            should_ask_create_dir: bool, should_use_gui: bool = True,
+            palette: list[HexColor] | None = None, save_mode: int = SAVE_MODE_DEFAULT
+    ) -> Surface | None:
+        """
+        Saves the image or project to a file with retries, it blocks until it's written.
 
-                if not should_create:
-                    return True
+        PNGs with at most 256 colors are palette indexed,
+        fast mode lowers the compression and archival mode optimizes it.
 
-            error_str: str | None = try_create_dir(file_path.parent, dir_creation_attempt_i)
-            if error_str is not None:
-                display_error("Image Save Failed", error_str)
+        Args:
+            file string, ask directory creation flag, use GUI for errors flag (default = True),
+            palette saved in projects (default = None), save mode (default = default)
+        Returns:
+            image (can be None)
+        """
 
-            return error_str is not None
+        if file_str == "" or (should_ask_create_dir and not ask_save_dir_creation(file_str)):
+            return None
 
-        dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
-        system_attempt_i: int       = FILE_ATTEMPT_START_I
-        did_succeed: bool = False
-        while (
-            dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
-            system_attempt_i       <= FILE_ATTEMPT_STOP_I
-        ):
-            try:
-                # If you open in write mode it will empty the file even if it's locked
-                with temp_file_path.open("ab") as f:
-                    try_lock_file(f, should_be_shared=False)
-                    try_write_file(f, img_bytes)
-                try_replace_file(temp_file_path, file_path)
-                did_succeed = True
-                break
-            except FileNotFoundError:
-                dir_creation_attempt_i += 1
-                did_fail: bool = _handle_dir_not_found()
-                if did_fail:
-                    break
-            except (PermissionError, LockError, FileError) as e:
-                error_str = {
-                    PermissionError: "Permission denied.",
-                    LockError: "File locked.",
-                    FileError: e.error_str if isinstance(e, FileError) else "",
-                }[type(e)]
-
-                display_error("Image Save Failed", f"{file_path.name}: {error_str}")
-                break
-            except OSError as e:
-                system_attempt_i += 1
-                error_str, should_retry = handle_file_os_error(e)
-                if should_retry and system_attempt_i != FILE_ATTEMPT_STOP_I:
-                    pg.time.wait(2 ** system_attempt_i)
-                    continue
-
-                try_remove_file(temp_file_path)
-                display_error("Image Save Failed", f"{file_path.name}: {error_str}")
-                break
+        pg_img: Surface = get_img(self.tiles)
+        error_str: str | None = try_write_save(self.get_save_info(file_str, palette, save_mode))
+        if error_str is not None:
+            if should_use_gui:
+                from tkinter import messagebox  # Lazy, only needed on errors
+                messagebox.showerror("Image Save Failed", error_str)
+            else:
+                print(f"Image Save Failed\n{error_str}", file=stderr)
 
-        return pg_img if did_succeed else None
+        return pg_img if error_str is None else None
@@ -4,13 +4,12 @@ Class to edit a grid of pixels with a minimap.
 Grid and minimap are refreshed automatically when offset or visible area changes.
 """
 
-from zlib import decompress
 from collections.abc import Callable
-from typing import Literal, Never, Self, TypeAlias, Any
+from typing import Literal, Self, TypeAlias, Any
 
 import numpy as np
 from pygame import Rect, K_BACKSPACE, K_RETURN, K_DELETE, K_r, K_y, K_z
-from numpy import uint8, uint16, uint32, int32, intp, bool_, newaxis
+from numpy import uint8, bool_
 from numpy.typing import NDArray
 
 from src.classes.tools_manager import ToolName, ToolInfo
@@ -19,8 +18,10 @@ from src.classes.text_label import TextLabel
 from src.classes.devices import MOUSE, KEYBOARD
 
 import src.vars as my_vars
+from src.canvas import SYMMETRY_NONE, Symmetry, get_snapshot_tiles, get_brush_kernel
+from src.tiles_utils import get_rgba_view
 from src.obj_utils import UIElement
-from src.type_utils import XY, HexColor, BlitInfo, RectPos
+from src.type_utils import HexColor, BlitInfo, RectPos
 from src.consts import (
     BLACK,
     MOUSE_LEFT, MOUSE_WHEEL, MOUSE_RIGHT,
@@ -29,38 +30,6 @@ from src.consts import (
 
 _ToolsFuncs: TypeAlias = dict[ToolName, Callable[[dict[str, Any]], None]]
 
-def _get_tiles_in_line(x_1: int, y_1: int, x_2: int, y_2: int) -> NDArray[int32]:
-    """
-    Gets the tiles that touch a line using Bresenham's Line Algorithm.
-
-    Args:
-        line start x, line start y, line end x, line end y
-    Returns:
-        tiles
-    """
-
-    delta_x: int = abs(x_2 - x_1)
-    delta_y: int = abs(y_2 - y_1)
-    step_x: Literal[-1, 1] = 1 if x_1 < x_2 else -1
-    step_y: Literal[-1, 1] = 1 if y_1 < y_2 else -1
-    err: int = delta_x - delta_y
-
-    tiles: list[XY] = []
-    while True:
-        tiles.append((x_1, y_1))
-        if x_1 == x_2 and y_1 == y_2:
-            break
-
-        err_2: int = err * 2
-        if err_2 > -delta_y:
-            err -= delta_y
-            x_1 += step_x
-        if err_2 <  delta_x:
-            err += delta_x
-            y_1 += step_y
-
-    return np.array(tiles, int32)
-
 
 class GridManager(UIElement):
     """Class to edit a grid of pixels with a minimap."""
@@ -70,9 +39,9 @@ class GridManager(UIElement):
         "_prev_mouse_col", "_prev_mouse_row", "_mouse_col", "_mouse_row",
         "_traveled_x", "_traveled_y",
         "_is_erasing", "_is_coloring", "_did_stop_erasing", "_did_stop_coloring",
-        "is_x_mirror_on", "is_y_mirror_on", "_can_leave", "_can_add_to_history",
-        "_tools_funcs", "rgb_eye_dropped_color", "saved_col", "saved_row",
-        "grid", "_hovering_text_label",
+        "is_x_mirror_on", "is_y_mirror_on", "symmetry_mode", "_can_leave", "_can_add_to_history",
+        "_tools_funcs", "_preview_key", "rgb_eye_dropped_color", "saved_col", "saved_row",
+        "_custom_brush_kernel", "grid", "_hovering_text_label",
         "_prev_hovered_obj",
     )
 
@@ -105,6 +74,7 @@ class GridManager(UIElement):
         self._did_stop_coloring: bool = False
         self.is_x_mirror_on: bool = False
         self.is_y_mirror_on: bool = False
+        self.symmetry_mode: int = SYMMETRY_NONE
 
         self._can_leave: bool = False
         self._can_add_to_history: bool = False
@@ -116,11 +86,16 @@ class GridManager(UIElement):
             "eye_dropper": self._eye_dropper,
             "line": self._line,
             "rect": self._rect,
+            "magic_wand": self._magic_wand,
         }
+        # Inputs of the last preview, a preview with the same ones doesn't need to be recomputed
+        self._preview_key: tuple[Any, ...] | None = None
         self.rgb_eye_dropped_color: tuple[int, int, int] | None = None
         # Used for line, rect, etc.
         self.saved_col: int | None = None
         self.saved_row: int | None = None
+        # Loaded from an image, used by the tools with the custom sub tool on
+        self._custom_brush_kernel: NDArray[uint8] | None = None
 
         self.grid: Grid = Grid(grid_pos, minimap_pos)
 
@@ -145,11 +120,12 @@ class GridManager(UIElement):
         """Clears the relevant data when the object state is leaved."""
 
         self._prev_hovered_obj = None
+        self._preview_key = None
         self._traveled_x = self._traveled_y = 0
         self.rgb_eye_dropped_color = self.saved_col = self.saved_row = None
 
         if self._can_add_to_history:
-            self.grid.add_to_history()
+            self.grid.canvas.add_to_history()
             self._can_add_to_history = False
 
         self._hovering_text_label.rec_set_active(False)
@@ -205,14 +181,8 @@ class GridManager(UIElement):
             self.grid.history_i = min(self.grid.history_i + 1, len(self.grid.history) - 1)
 
         if self.grid.history_i != prev_history_i:
-            grid_w: int             = self.grid.history[self.grid.history_i][0]
-            grid_h: int             = self.grid.history[self.grid.history_i][1]
-            compressed_tiles: bytes = self.grid.history[self.grid.history_i][2]
-
-            # copying makes it writable
-            tiles_1d: NDArray[uint8] = np.frombuffer(decompress(compressed_tiles), uint8).copy()
             self.grid.set_info(
-                tiles_1d.reshape((grid_w, grid_h, 4)),
+                get_snapshot_tiles(self.grid.history[self.grid.history_i]),
                 self.grid.visible_cols, self.grid.visible_rows,
                 self.grid.offset_x, self.grid.offset_y,
                 should_reset_history=False
@@ -241,146 +211,81 @@ class GridManager(UIElement):
         self._mouse_col      = rel_mouse_col      + self.grid.offset_x
         self._mouse_row      = rel_mouse_row      + self.grid.offset_y
 
-    def _pencil(self: Self, _sub_tools_data: dict[str, Any]) -> None:
+    def _get_symmetry(self: Self) -> Symmetry:
         """
-        Handles the pencil tool.
+        Gets the symmetry to pass to the canvas.
 
-        Args:
-            sub tools data
+        Returns:
+            symmetry
         """
 
-        # Centers tiles to the cursor
-        selected_tiles_coords: NDArray[int32] = _get_tiles_in_line(
-            min(max(self._prev_mouse_col, 0), self.grid.cols - 1) - (self.grid.brush_dim // 2),
-            min(max(self._prev_mouse_row, 0), self.grid.rows - 1) - (self.grid.brush_dim // 2),
-            min(max(self._mouse_col     , 0), self.grid.cols - 1) - (self.grid.brush_dim // 2),
-            min(max(self._mouse_row     , 0), self.grid.rows - 1) - (self.grid.brush_dim // 2),
-        )
-        selected_xs: NDArray[int32] = selected_tiles_coords[:, 0]
-        selected_ys: NDArray[int32] = selected_tiles_coords[:, 1]
-
-        # For every position get indexes of the brush_dimXbrush_dim section as a 1D array
-        brush_dim_range: NDArray[uint8] = np.arange(self.grid.brush_dim, dtype=uint8)
-        repeated_cols: NDArray[uint8] = np.repeat(brush_dim_range, self.grid.brush_dim)
-        repeated_rows: NDArray[uint8] = np.tile(  brush_dim_range, self.grid.brush_dim)
-
-        xs: NDArray[int32] = (selected_xs[:, newaxis] + repeated_cols[newaxis, :]).ravel()
-        ys: NDArray[int32] = (selected_ys[:, newaxis] + repeated_rows[newaxis, :]).ravel()
-        np.clip(xs, 0, self.grid.cols - 1, out=xs, dtype=int32)
-        np.clip(ys, 0, self.grid.rows - 1, out=ys, dtype=int32)
-
-        # Faster
-        selected_1d_indexes: NDArray[intp] = xs.astype(intp)
-        selected_1d_indexes *= self.grid.rows
-        selected_1d_indexes += ys
-        self.grid.selected_tiles.reshape(-1)[selected_1d_indexes] = True
-
-        if self.is_x_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[::-1, :]
-        if self.is_y_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[:, ::-1]
+        return self.is_x_mirror_on, self.is_y_mirror_on, self.symmetry_mode
 
-    def _eraser(self: Self, sub_tools_data: dict[str, Any]) -> None:
+    def set_custom_brush_kernel(self: Self, brush_kernel: NDArray[uint8]) -> None:
         """
-        Handles the eraser tool.
+        Sets the brush used by the tools with the custom sub tool on.
 
         Args:
-            sub tools data
+            brush kernel
         """
 
-        self._pencil(sub_tools_data)
-        self._is_erasing = self._is_erasing or self._is_coloring
-        self._is_coloring = False
+        self._custom_brush_kernel = brush_kernel
+        self._preview_key = None
 
-    def _init_bucket_stack(self: Self, mask: NDArray[bool_]) -> list[tuple[intp, uint16, uint16]]:
+    def _get_brush_kernel(self: Self, sub_tools_data: dict[str, Any]) -> NDArray[uint8]:
         """
-        Initializes the stack for the bucket tool.
+        Gets the brush kernel of a tool, the custom one is used only if it was loaded.
 
         Args:
-            tiles mask
+            sub tools data (round, custom)
         Returns:
-            stack
+            brush kernel
         """
 
-        up_tiles: NDArray[bool_] = mask[self._mouse_col, :self._mouse_row + 1]
-        up_stop: intp | int = up_tiles[::-1].argmin() or up_tiles.size
-        first_y: uint16 = uint16(self._mouse_row - up_stop   + 1)
+        if sub_tools_data["custom"] and self._custom_brush_kernel is not None:
+            return self._custom_brush_kernel
+        return get_brush_kernel(self.grid.brush_dim, sub_tools_data["round"])
 
-        down_tiles: NDArray[bool_] = mask[self._mouse_col, self._mouse_row:]
-        down_stop: intp | int = down_tiles.argmin() or down_tiles.size
-        last_y: uint16  = uint16(self._mouse_row + down_stop - 1)
+    def _pencil(self: Self, sub_tools_data: dict[str, Any]) -> None:
+        """
+        Handles the pencil tool.
 
-        return [(intp(self._mouse_col), first_y, last_y)]
+        Args:
+            sub tools data (round, custom)
+        """
+
+        self.grid.canvas.select_brush_line(
+            self._prev_mouse_col, self._prev_mouse_row, self._mouse_col, self._mouse_row,
+            self._get_brush_kernel(sub_tools_data), self._get_symmetry()
+        )
+
+    def _eraser(self: Self, sub_tools_data: dict[str, Any]) -> None:
+        """
+        Handles the eraser tool.
+
+        Args:
+            sub tools data
+        """
+
+        self._pencil(sub_tools_data)
+        self._is_erasing = self._is_erasing or self._is_coloring
+        self._is_coloring = False
 
     def _bucket(self: Self, sub_tools_data: dict[str, Any]) -> None:
         """
-        Handles the bucket tool using the scan-line algorithm, includes a color fill.
+        Handles the bucket tool using the cached connected regions, includes a color fill.
 
         Args:
             sub tools data (color fill)
         """
 
-        x: intp
-        start_y: uint16
-        end_y: uint16
-        span_starts: NDArray[uint16]
-        span_ends: NDArray[uint16]
-        valid_spans_mask: NDArray[bool_]
-        xs: tuple[intp, ...]
-
         if not self._is_hovering:
             return
 
-        # Packs a color as a uint32 and compares
-        color: NDArray[uint8] = self.grid.tiles[self._mouse_col, self._mouse_row]
-        mask: NDArray[bool_] = self.grid.tiles.view(uint32)[..., 0] == color.view(uint32)[0]
-        if sub_tools_data["color_fill"]:
-            self.grid.selected_tiles[mask] = True
-            return
-
-        stack: list[tuple[intp, uint16, uint16]] = self._init_bucket_stack(mask)
-        empty_list: list[Never] = []
-
-        # Padded to avoid boundary checks
-        visitable_tiles: NDArray[bool_] = np.ones((self.grid.cols + 2, self.grid.rows), bool_)
-        visitable_tiles[0] = visitable_tiles[-1] = False
-
-        left_shifted_cols_mask: NDArray[bool_] = np.empty((self.grid.cols, self.grid.rows), bool_)
-        left_shifted_cols_mask[:, :-1] = mask[:, 1:]
-        left_shifted_cols_mask[:, -1] = False
-        right_shifted_cols_mask: NDArray[bool_] = np.empty((self.grid.cols, self.grid.rows), bool_)
-        right_shifted_cols_mask[:, 1:] = mask[:, :-1]
-        right_shifted_cols_mask[:, 0] = False
-
-        temp_mask: NDArray[bool_] = np.empty(self.grid.rows, bool_)
-        indexes: NDArray[uint16] = np.arange(0, self.grid.rows, dtype=uint16)
-
-        selected_tiles: NDArray[bool_] = self.grid.selected_tiles
-        np_logical_and = np.logical_and
-        stack_pop, stack_extend = stack.pop, stack.extend
-        local_zip = zip
-
-        while stack != empty_list:
-            x, start_y, end_y = stack_pop()
-            selected_tiles[ x    , start_y:end_y + 1] = True
-            visitable_tiles[x + 1, start_y:end_y + 1] = False
-
-            if visitable_tiles[x, start_y] or visitable_tiles[x, end_y]:
-                np_logical_and(mask[x - 1], visitable_tiles[x], out=temp_mask)
-                span_starts = indexes[temp_mask & ~right_shifted_cols_mask[x - 1]]
-                span_ends   = indexes[temp_mask & ~left_shifted_cols_mask[ x - 1]]
-                valid_spans_mask = (span_ends >= start_y) & (span_starts <= end_y)
-
-                xs = (x - 1,) * valid_spans_mask.size
-                stack_extend(local_zip(xs, span_starts[valid_spans_mask], span_ends[valid_spans_mask]))
-            if visitable_tiles[x + 2, start_y] or visitable_tiles[x + 2, end_y]:
-                np_logical_and(mask[x + 1], visitable_tiles[x + 2], out=temp_mask)
-                span_starts = indexes[temp_mask & ~right_shifted_cols_mask[x + 1]]
-                span_ends   = indexes[temp_mask & ~left_shifted_cols_mask[ x + 1]]
-                valid_spans_mask = (span_ends >= start_y) & (span_starts <= end_y)
-
-                xs = (x + 1,) * valid_spans_mask.size
-                stack_extend(local_zip(xs, span_starts[valid_spans_mask], span_ends[valid_spans_mask]))
+        self.grid.canvas.select_region(
+            self._mouse_col, self._mouse_row,
+            should_get_all_matching=sub_tools_data["color_fill"]
+        )
 
     def _eye_dropper(self: Self, _sub_tools_data: dict[str, Any]) -> None:
         """
@@ -395,29 +300,27 @@ class GridManager(UIElement):
 
         self.grid.selected_tiles[self._mouse_col, self._mouse_row] = True
         if self._is_coloring:
-            self.rgb_eye_dropped_color = self.grid.tiles[self._mouse_col, self._mouse_row][:3]
+            self.rgb_eye_dropped_color = get_rgba_view(self.grid.tiles)[
+                self._mouse_col, self._mouse_row, :3
+            ]
         self._is_erasing = self._is_coloring = False
 
-    def _line(self: Self, _sub_tools_data: dict[str, Any]) -> None:
+    def _line(self: Self, sub_tools_data: dict[str, Any]) -> None:
         """
         Handles the line tool.
 
         Args:
-            sub tools data
+            sub tools data (round, custom)
         """
 
         if not self._is_hovering:
             return
 
         self._is_erasing = self._is_coloring = False
-        selected_tiles_coords: NDArray[int32] = np.empty((0, 2), int32)
-        # Centers tiles to the cursor
         if self.saved_col is not None and self.saved_row is not None:
-            selected_tiles_coords = _get_tiles_in_line(
-                min(max(self.saved_col, 0) , self.grid.cols - 1) - (self.grid.brush_dim // 2),
-                min(max(self.saved_row, 0) , self.grid.rows - 1) - (self.grid.brush_dim // 2),
-                min(max(self._mouse_col, 0), self.grid.cols - 1) - (self.grid.brush_dim // 2),
-                min(max(self._mouse_row, 0), self.grid.rows - 1) - (self.grid.brush_dim // 2),
+            self.grid.canvas.select_brush_line(
+                self.saved_col, self.saved_row, self._mouse_col, self._mouse_row,
+                self._get_brush_kernel(sub_tools_data), self._get_symmetry()
             )
 
             if self._did_stop_erasing or self._did_stop_coloring:
@@ -425,43 +328,14 @@ class GridManager(UIElement):
                 self._is_erasing = self._did_stop_erasing
                 self._is_coloring = self._did_stop_coloring
         else:
-            selected_tiles_coords = np.array(
-                ((
-                    self._mouse_col - (self.grid.brush_dim // 2),
-                    self._mouse_row - (self.grid.brush_dim // 2),
-                ),),
-                int32
+            self.grid.canvas.select_brush_line(
+                self._mouse_col, self._mouse_row, self._mouse_col, self._mouse_row,
+                self._get_brush_kernel(sub_tools_data), self._get_symmetry()
             )
 
             if self._did_stop_erasing or self._did_stop_coloring:
                 self.saved_col, self.saved_row = self._mouse_col, self._mouse_row
 
-        selected_xs: NDArray[int32] = selected_tiles_coords[:, 0]
-        selected_ys: NDArray[int32] = selected_tiles_coords[:, 1]
-
-        # For every position get indexes of the brush_dimXbrush_dim section as a 1D array
-        brush_dim_range: NDArray[uint8] = np.arange(self.grid.brush_dim, dtype=uint8)
-        repeated_cols: NDArray[uint8] = np.repeat(brush_dim_range, self.grid.brush_dim)
-        repeated_rows: NDArray[uint8] = np.tile(  brush_dim_range, self.grid.brush_dim)
-
-        xs: NDArray[int32] = selected_xs[:, newaxis] + repeated_cols[newaxis, :]
-        ys: NDArray[int32] = selected_ys[:, newaxis] + repeated_rows[newaxis, :]
-        xs = xs.ravel()
-        ys = ys.ravel()
-        np.clip(xs, 0, self.grid.cols - 1, out=xs, dtype=int32)
-        np.clip(ys, 0, self.grid.rows - 1, out=ys, dtype=int32)
-
-        # Faster
-        selected_1d_indexes: NDArray[intp] = xs.astype(intp)
-        selected_1d_indexes *= self.grid.rows
-        selected_1d_indexes += ys
-        self.grid.selected_tiles.reshape(-1)[selected_1d_indexes] = True
-
-        if self.is_x_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[::-1, :]
-        if self.is_y_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[:, ::-1]
-
     def _rect(self: Self, sub_tools_data: dict[str, Any]) -> None:
         """
         Handles the rect tool.
@@ -478,52 +352,46 @@ class GridManager(UIElement):
             # Centers tiles to the cursor
             x: int = self._mouse_col - (self.grid.brush_dim // 2)
             y: int = self._mouse_row - (self.grid.brush_dim // 2)
-            self.grid.selected_tiles[
-                max(x, 0):x + self.grid.brush_dim,
-                max(y, 0):y + self.grid.brush_dim,
-            ] = True
+            self.grid.canvas.select_rect(
+                x, y, x, y, self.grid.brush_dim, True, self._get_symmetry()
+            )
 
             if self._did_stop_erasing or self._did_stop_coloring:
                 self.saved_col, self.saved_row = x, y
         else:
-            start_x: int = min(self.saved_col, self._mouse_col)
-            start_y: int = min(self.saved_row, self._mouse_row)
-            end_x: int   = max(self.saved_col, self._mouse_col) + 1
-            end_y: int   = max(self.saved_row, self._mouse_row) + 1
-
-            # Rect can't be smaller than brush_dim
-            end_x = max(end_x, start_x + self.grid.brush_dim)
-            end_y = max(end_y, start_y + self.grid.brush_dim)
-
-            if sub_tools_data["fill"]:
-                self.grid.selected_tiles[start_x:end_x, start_y:end_y] = True
-            else:
-                self.grid.selected_tiles[
-                    start_x:start_x + self.grid.brush_dim,
-                    start_y:end_y,
-                ] = True
-                self.grid.selected_tiles[
-                    start_x:end_x,
-                    start_y:start_y + self.grid.brush_dim,
-                ] = True
-                self.grid.selected_tiles[
-                    end_x - self.grid.brush_dim:end_x,
-                    start_y:end_y,
-                ] = True
-                self.grid.selected_tiles[
-                    start_x:end_x,
-                    end_y - self.grid.brush_dim:end_y,
-                ] = True
+            self.grid.canvas.select_rect(
+                self.saved_col, self.saved_row, self._mouse_col, self._mouse_row,
+                self.grid.brush_dim, sub_tools_data["fill"], self._get_symmetry()
+            )
 
             if self._did_stop_erasing or self._did_stop_coloring:
                 self.saved_col = self.saved_row = None
                 self._is_erasing = self._did_stop_erasing
                 self._is_coloring = self._did_stop_coloring
 
-        if self.is_x_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[::-1, :]
-        if self.is_y_mirror_on:
-            self.grid.selected_tiles |= self.grid.selected_tiles[:, ::-1]
+    def _magic_wand(self: Self, sub_tools_data: dict[str, Any]) -> None:
+        """
+        Handles the magic wand tool, left click adds to the selection and right click clears it.
+
+        Args:
+            sub tools data (color select)
+        """
+
+        if self.grid.selection is not None:
+            self.grid.selected_tiles |= self.grid.selection
+
+        if self._is_hovering:
+            region: NDArray[bool_] = self.grid.canvas.select_region(
+                self._mouse_col, self._mouse_row,
+                should_get_all_matching=sub_tools_data["color_select"]
+            )
+
+            if self._did_stop_coloring:
+                self.grid.canvas.add_to_selection(region)
+        if self._did_stop_erasing:
+            self.grid.selection = None
+
+        self._is_erasing = self._is_coloring = False
 
     def _handle_draw(self: Self, hex_color: HexColor, tool_info: ToolInfo) -> tuple[bool, bool]:
         """
@@ -539,20 +407,39 @@ class GridManager(UIElement):
 
         self._handle_tile_info()
 
-        prev_selected_tiles_bytes: bytes = np.packbits(self.grid.selected_tiles).tobytes()
-        self.grid.selected_tiles.fill(False)
         self._is_erasing  = MOUSE.pressed[MOUSE_RIGHT] or K_BACKSPACE in KEYBOARD.pressed
         self._is_coloring = MOUSE.pressed[MOUSE_LEFT ] or K_RETURN    in KEYBOARD.pressed
-
         tool_name: ToolName             = tool_info[0]
         sub_tools_data: dict[str, Any] = tool_info[1]
+
+        # Only previews are memoized, drawing has side effects
+        preview_key: tuple[Any, ...] | None = None
+        if not (
+            self._is_erasing or self._is_coloring or
+            self._did_stop_erasing or self._did_stop_coloring
+        ):
+            preview_key = (
+                tool_name, tuple(sub_tools_data.items()), self._is_hovering,
+                self._prev_mouse_col, self._prev_mouse_row, self._mouse_col, self._mouse_row,
+                self.saved_col, self.saved_row,
+                self.grid.brush_dim, self.is_x_mirror_on, self.is_y_mirror_on, self.symmetry_mode,
+                self.grid.version,
+            )
+            if preview_key == self._preview_key:
+                return False, False
+
+        prev_selected_tiles_bytes: bytes = np.packbits(self.grid.selected_tiles).tobytes()
+        self.grid.selected_tiles.fill(False)
         self._tools_funcs[tool_name](sub_tools_data)
+        if tool_name not in ("eye_dropper", "magic_wand"):
+            self.grid.canvas.limit_to_selection()
 
         selected_tiles_bytes: bytes = np.packbits(self.grid.selected_tiles).tobytes()
         if self._is_erasing or self._is_coloring:
             did_draw = self.grid.upt_section(self._is_erasing, hex_color)
         else:
             did_draw = False
+        self._preview_key = preview_key
 
         # Comparing bytes in this situation is faster
         return did_draw, selected_tiles_bytes != prev_selected_tiles_bytes
@@ -643,6 +530,7 @@ class GridManager(UIElement):
                 self._can_add_to_history = True
         elif self._can_leave:
             self.grid.leave()
+            self._preview_key = None
             self._can_leave = False
 
         if K_DELETE in KEYBOARD.pressed:
@@ -652,7 +540,7 @@ class GridManager(UIElement):
             self._can_add_to_history and
             (self._did_stop_erasing or self._did_stop_coloring or not self._is_hovering)
         ):
-            self.grid.add_to_history()
+            self.grid.canvas.add_to_history()
             self._can_add_to_history = False
 
         self._refresh(
@@ -1,10 +1,11 @@
 """Interface to edit the grid, preview is refreshed automatically."""
 
+from math import ceil
 from typing import Literal, Self, Final
 
 import numpy as np
 from pygame import Surface, Rect, surfarray, K_TAB, K_DOWN, K_UP, K_c, K_k, K_r
-from numpy import uint8, uint16, intp, bool_, newaxis
+from numpy import uint8, uint16, uint32, bool_, newaxis
 from numpy.typing import NDArray
 
 from src.classes.ui import UI
@@ -15,6 +16,7 @@ from src.classes.text_label import TextLabel
 from src.classes.devices import KEYBOARD
 
 import src.vars as my_vars
+from src.tiles_utils import get_rgba_view, crop_tiles
 from src.obj_utils import UIElement
 from src.type_utils import WH, RectPos
 from src.consts import EMPTY_TILE_ARR, TILE_H, TILE_W
@@ -36,6 +38,7 @@ class GridUI(UI):
         "_objs", "_selection_x", "_selection_y",
         "_preview_init_pos", "_preview_rect", "should_show_center", "tile_mode_size",
         "_rotate_left", "_rotate_right", "checkbox", "_crop",
+        "is_loading", "_loading_text_label",
     )
 
     def __init__(self: Self) -> None:
@@ -50,8 +53,8 @@ class GridUI(UI):
         self._temp_h_ratio: float = self.h_ratio
         self.is_keeping_wh_ratio: bool = False
 
-        self._orig_tiles: NDArray[uint8] = np.zeros((1, 1, 4), uint8)
-        self._tiles: NDArray[uint8] = self._orig_tiles
+        self._orig_tiles: NDArray[uint32] = np.zeros((1, 1), uint32)
+        self._tiles: NDArray[uint32] = self._orig_tiles
 
         first_x: int  = self._rect.x + round(self._rect.w / 4 * 1)
         second_x: int = self._rect.x + round(self._rect.w / 4 * 2)
@@ -119,6 +122,13 @@ class GridUI(UI):
         self.should_show_center: bool = False
         self.tile_mode_size: WH | None = None
 
+        # Tiles of opened files are read in the background
+        self.is_loading: bool = False
+        self._loading_text_label: TextLabel = TextLabel(
+            RectPos(self._preview_init_pos.x, self._preview_init_pos.y, "center"),
+            "", self.layer
+        )
+
         self._rotate_left: SpammableButton = SpammableButton(
             RectPos(first_x - 4, self._preview_rect.bottom + 32, "topright"),
             (ROTATE_LEFT_OFF_IMG , ROTATE_LEFT_ON_IMG ), "(CTRL+SHIFT+R)", self.layer
@@ -142,6 +152,7 @@ class GridUI(UI):
             visible_wh_text_label, self._visible_w_box, self._visible_h_box,
             offset_text_label, self._offset_x_box, self._offset_y_box,
             self._rotate_left, self._rotate_right, self.checkbox, self._crop,
+            self._loading_text_label,
         )
 
     def enter(self: Self) -> None:
@@ -163,7 +174,7 @@ class GridUI(UI):
         super().resize()
         self.refresh_preview()
 
-    def set_info(self: Self, tiles: NDArray[uint8], grid: Grid) -> None:
+    def set_info(self: Self, tiles: NDArray[uint32], grid: Grid) -> None:
         """
         Sets the area and tiles.
 
@@ -171,6 +182,9 @@ class GridUI(UI):
             tiles, grid
         """
 
+        self.is_loading = False
+        self._loading_text_label.set_text("")
+
         self._orig_tiles = tiles
         self._w_box.set_value(grid.cols)
         self._h_box.set_value(grid.rows)
@@ -188,6 +202,34 @@ class GridUI(UI):
         self._offset_x_box.refresh()
         self._offset_y_box.refresh()
 
+    def set_loading(self: Self, grid: Grid) -> None:
+        """
+        Sets the area with empty tiles until the ones of the opened file are read.
+
+        Args:
+            grid
+        """
+
+        self.set_info(np.zeros((1, 1), uint32), grid)
+        self.is_loading = True
+        self._loading_text_label.set_text("Loading...")
+
+    def set_loading_progress(
+            self: Self, progress: float, tiles: NDArray[uint32], step: int
+    ) -> None:
+        """
+        Shows the partially read tiles of the opened file, they're downsampled by a step.
+
+        Args:
+            progress (0-1), tiles, step
+        """
+
+        # Only the part inside the area is scaled back
+        tiles = tiles[:ceil(self._w_box.value / step), :ceil(self._h_box.value / step)]
+        self._orig_tiles = tiles.repeat(step, 0).repeat(step, 1)
+        self._loading_text_label.set_text(f"Loading {progress:.0%}")
+        self.refresh_preview()
+
     def refresh_preview(self: Self) -> None:
         """Refreshes the preview by using orig_tiles."""
 
@@ -195,18 +237,19 @@ class GridUI(UI):
 
         extra_w: int = self._w_box.value - self._tiles.shape[0]
         if   extra_w < 0:
-            self._tiles = self._tiles[:self._w_box.value, ...]
+            self._tiles = self._tiles[:self._w_box.value]
         elif extra_w > 0:
-            self._tiles = np.pad(self._tiles, ((0, extra_w), (0, 0), (0, 0)), constant_values=0)
+            self._tiles = np.pad(self._tiles, ((0, extra_w), (0, 0)), constant_values=0)
 
         extra_h: int = self._h_box.value - self._tiles.shape[1]
         if   extra_h < 0:
-            self._tiles = self._tiles[:, :self._h_box.value, ...]
+            self._tiles = self._tiles[:, :self._h_box.value]
         elif extra_h > 0:
-            self._tiles = np.pad(self._tiles, ((0, 0), (0, extra_h), (0, 0)), constant_values=0)
+            self._tiles = np.pad(self._tiles, ((0, 0), (0, extra_h)), constant_values=0)
 
         # Repeats tiles so an empty tile image takes 1 normal-sized tile
-        repeated_tiles: NDArray[uint8] = self._tiles.repeat(TILE_W, 0).repeat(TILE_H, 1)
+        rgba_tiles: NDArray[uint8] = get_rgba_view(self._tiles)
+        repeated_tiles: NDArray[uint8] = rgba_tiles.repeat(TILE_W, 0).repeat(TILE_H, 1)
         empty_tiles_mask: NDArray[bool_] = (repeated_tiles[..., 3] == 0)[..., newaxis]
 
         empty_img_arr_reps: tuple[int, int, int] = (self._w_box.value, self._h_box.value, 1)
@@ -348,20 +391,8 @@ class GridUI(UI):
     def _crop_tiles(self: Self) -> None:
         """Removes unnecessary padding from the image, sets sliders and ratios."""
 
-        left: intp
-        right: intp
-        top: intp
-        bottom: intp
-
-        colored_tiles_indexes: NDArray[intp] = np.argwhere(self._orig_tiles[..., 3] != 0)
-        if colored_tiles_indexes.size == 0:
-            left  = top    = intp(0)
-            right = bottom = intp(1)
-        else:
-            left , top    = colored_tiles_indexes.min(0)
-            right, bottom = colored_tiles_indexes.max(0) + 1
         # Copying is unnecessary
-        self._orig_tiles = self._tiles = self._orig_tiles[left:right, top:bottom]
+        self._orig_tiles = self._tiles = crop_tiles(self._orig_tiles)
 
         self._w_box.set_value(min(max(
             self._tiles.shape[0],
@@ -376,7 +407,7 @@ class GridUI(UI):
 
         self.refresh_preview()
 
-    def upt(self: Self) -> tuple[bool, bool, NDArray[uint8], int, int, int, int]:
+    def upt(self: Self) -> tuple[bool, bool, NDArray[uint32], int, int, int, int]:
         """
         Allows selecting an area with 2 sliders and view its preview.
 
@@ -387,6 +418,10 @@ class GridUI(UI):
         is_exiting: bool
         is_confirming: bool
 
+        if self.is_loading:
+            is_exiting, _is_confirming = self._base_upt()
+            return is_exiting, False, self._tiles, 1, 1, 0, 0
+
         if KEYBOARD.timed != ():
             self._handle_move_with_keys()
 
@@ -411,7 +411,7 @@ class PalettesManager(UIElement):
             self.colors_grid.try_add(hex_color)
         else:
             self.colors_grid.edit(self._edit_i, hex_color)
-        self.colors_grid.check(self.colors_grid.colors.index(hex_color))
+        self.colors_grid.check(self.colors_grid.colors_indexes[hex_color])
 
         self._scrollbar.set_info(
             num_values=ceil(len(self.colors_grid.colors) / NUM_COLS),
@@ -1,12 +1,17 @@
-"""Class to simplify multi-line text rendering, renderers are cached."""
+"""
+Class to simplify multi-line text rendering, the font is read once and renderers are cached.
+
+Every renderer has a cache of white glyph images and advances,
+lines are composed by blitting them so changing text doesn't rasterize the font again.
+"""
 
-from tkinter import messagebox
 from pathlib import Path
+from bisect import bisect_left
 from io import BytesIO
-from typing import Self, Final
+from typing import Self, TypeAlias, Final
 
 import pygame as pg
-from pygame import Color, Surface, Rect, Font
+from pygame import Color, Surface, Rect, Font, SRCALPHA
 
 from src.classes.devices import MOUSE
 
@@ -22,65 +27,164 @@ from src.consts import (
     BG_LAYER, TEXT_LAYER, TOP_LAYER,
 )
 
+# Character: image, minimum x, maximum x, advance
+_Glyphs: TypeAlias = dict[str, tuple[Surface, int, int, int]]
+
+_FONT_PATH: Final[Path] = Path("assets", "fonts", "fredoka.ttf")
+
+# Least recently used first, labels keep their renderer so evicted ones stay valid
 _RENDERERS_CACHE: Final[dict[int, Font]] = {}
-_is_first_font_load_error: bool = True
+_GLYPHS_CACHE: Final[dict[int, _Glyphs]] = {}
+_RENDERERS_CACHE_MAX_SIZE: Final[int] = 32
 
+# Read once and shared by every renderer, None if it couldn't be read
+_font_bytes: bytes | None = None
+_is_font_loaded: bool = False
 
-def _try_add_renderer(h: int) -> None:
-    """
-    Adds a render to the cache with retries.
 
-    Args:
-        height
-    """
+def _load_font_bytes() -> None:
+    """Reads the font with retries, shows an error if it fails."""
 
-    global _is_first_font_load_error
+    global _font_bytes, _is_font_loaded
     attempt_i: int
     should_retry: bool
 
-    font_path: Path = Path("assets", "fonts", "fredoka.ttf")
-    renderer: Font | None = None
     error_str: str = ""
     for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
         try:
-            with font_path.open("rb") as f:
+            with _FONT_PATH.open("rb") as f:
                 try_lock_file(f, should_be_shared=True)
-                font_bytes_io: BytesIO = BytesIO(try_read_file(f))
-                renderer = Font(font_bytes_io, h)
+                _font_bytes = try_read_file(f)
             break
-        except (FileNotFoundError, PermissionError, LockError, FileError, pg.error) as e:
+        except (FileNotFoundError, PermissionError, LockError, FileError) as e:
             error_str = {
                 FileNotFoundError: "File missing.",
                 PermissionError: "Permission denied.",
                 LockError: "File locked.",
                 FileError: e.error_str if isinstance(e, FileError) else "",
-                pg.error: str(e),
             }[type(e)]
 
             break
         except OSError as e:
             error_str, should_retry = handle_file_os_error(e)
-            if should_retry and _is_first_font_load_error and attempt_i != FILE_ATTEMPT_STOP_I:
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
                 pg.time.wait(2 ** attempt_i)
                 continue
 
             break
 
+    _is_font_loaded = True
+    if _font_bytes is None:
+        _show_font_error(error_str)
+
+
+def _show_font_error(error_str: str) -> None:
+    """
+    Shows a font error.
+
+    Args:
+        error string
+    """
+
+    from tkinter import messagebox  # Lazy, only needed on errors
+
+    messagebox.showerror("Font Load Failed", f"{_FONT_PATH.name}: {error_str}")
+
+
+def _get_renderer(h: int) -> tuple[Font, _Glyphs]:
+    """
+    Gets a renderer and its glyphs from the cache or creates them from the font bytes.
+
+    Args:
+        height
+    Returns:
+        renderer, glyphs
+    """
+
+    global _font_bytes
+
+    if h in _RENDERERS_CACHE:
+        _RENDERERS_CACHE[h] = _RENDERERS_CACHE.pop(h)  # Moves it to the end
+        return _RENDERERS_CACHE[h], _GLYPHS_CACHE[h]
+
+    if not _is_font_loaded:
+        _load_font_bytes()
+
+    renderer: Font | None = None
+    if _font_bytes is not None:
+        try:
+            renderer = Font(BytesIO(_font_bytes), h)
+        except pg.error as e:
+            _show_font_error(str(e))
+            _font_bytes = None
     if renderer is None:
-        if _is_first_font_load_error:
-            messagebox.showerror("Font Load Failed", f"{font_path.name}: {error_str}")
-            _is_first_font_load_error = False
         renderer = Font(size=round(h * 1.3))
+
+    if len(_RENDERERS_CACHE) == _RENDERERS_CACHE_MAX_SIZE:
+        lru_h: int = next(iter(_RENDERERS_CACHE))
+        del _RENDERERS_CACHE[lru_h], _GLYPHS_CACHE[lru_h]
     _RENDERERS_CACHE[h] = renderer
+    _GLYPHS_CACHE[h] = {}
+    return renderer, _GLYPHS_CACHE[h]
+
+
+def _render_line(
+        line: str, renderer: Font, glyphs: _Glyphs, bg_color: Color | None
+) -> tuple[Surface, list[int]]:
+    """
+    Renders a line by blitting the glyphs, missing ones are rendered and added.
+
+    Args:
+        line, renderer, glyphs, background color
+    Returns:
+        image, width of every prefix (from 0 to all characters)
+    """
+
+    char: str
+    glyph_img: Surface
+    min_x: int
+    max_x: int
+    advance: int
+
+    # Glyph images start at their minimum x if it's negative, like the ones of a full line
+    glyphs_xs: list[tuple[Surface, int]] = []
+    prefixes_ws: list[int] = [0]
+    x: int = 0
+    line_min_x: int = 0
+    line_max_x: int = 0
+    for char in line:
+        if char not in glyphs:
+            glyph_img = renderer.render(char, antialias=True, color=WHITE).convert_alpha()
+            # Metrics are None for characters that aren't in the font
+            char_metrics: tuple[int, int, int, int, int] | None = renderer.metrics(char)[0]
+            glyphs[char] = (
+                (glyph_img, 0, glyph_img.get_width(), glyph_img.get_width())
+                if char_metrics is None else
+                (glyph_img, char_metrics[0], char_metrics[1], char_metrics[4])
+            )
+
+        glyph_img, min_x, max_x, advance = glyphs[char]
+        glyphs_xs.append((glyph_img, x + min(min_x, 0)))
+        line_min_x = min(line_min_x, x + min_x)
+        line_max_x = max(line_max_x, x + max_x)
+        x += advance
+        prefixes_ws.append(max(line_max_x, x) - line_min_x)
+
+    line_max_x = max(line_max_x, x)
+    img: Surface = Surface((line_max_x - line_min_x, renderer.get_height()), SRCALPHA)
+    if bg_color is not None:
+        img.fill(bg_color)
+    img.fblits([(glyph_img, (glyph_x - line_min_x, 0)) for glyph_img, glyph_x in glyphs_xs])
+    return img, prefixes_ws
 
 
 class TextLabel(UIElement):
     """Class to simplify multi-line text rendering."""
 
     __slots__ = (
-        "init_pos", "init_h", "_renderer",
+        "init_pos", "init_h", "_renderer", "_glyphs",
         "text", "_bg_color",
-        "_imgs", "rect", "_rects",
+        "_imgs", "_prefixes_ws", "rect", "_rects",
     )
 
     def __init__(
@@ -102,20 +206,17 @@ class TextLabel(UIElement):
         self.init_pos: RectPos = pos
         self.init_h: int = h
 
-        if self.init_h not in _RENDERERS_CACHE:
-            _try_add_renderer(self.init_h)
-        self._renderer: Font = _RENDERERS_CACHE[self.init_h]
+        self._renderer: Font
+        self._glyphs: _Glyphs
+        self._renderer, self._glyphs = _get_renderer(self.init_h)
 
         self.text: str = text
         self._bg_color: Color | None = bg_color
 
-        self._imgs: tuple[Surface, ...] = tuple([
-            self._renderer.render(
-                line,
-                antialias=True, color=WHITE, bgcolor=self._bg_color
-            ).convert_alpha()
-            for line in self.text.split("\n")
-        ])
+        self._imgs: tuple[Surface, ...] = ()
+        # Of the first line, used to position the cursor of single line text
+        self._prefixes_ws: list[int] = [0]
+        self._refresh_imgs()
         self.rect: Rect = Rect()
         self._rects: tuple[Rect, ...] = ()
 
@@ -134,19 +235,23 @@ class TextLabel(UIElement):
             self.init_pos, init_w=0, init_h=self.init_h,
             should_keep_wh_ratio=True
         )
-        if h not in _RENDERERS_CACHE:
-            _try_add_renderer(h)
-        self._renderer = _RENDERERS_CACHE[h]
-
-        self._imgs = tuple([
-            self._renderer.render(
-                line,
-                antialias=True, color=WHITE, bgcolor=self._bg_color
-            ).convert_alpha()
-            for line in self.text.split("\n")
-        ])
+        self._renderer, self._glyphs = _get_renderer(h)
+
+        self._refresh_imgs()
         self.refresh_rects(xy)
 
+    def _refresh_imgs(self: Self) -> None:
+        """Renders the images of the lines and the widths of the first line prefixes."""
+
+        line: str
+
+        lines_info: list[tuple[Surface, list[int]]] = [
+            _render_line(line, self._renderer, self._glyphs, self._bg_color)
+            for line in self.text.split("\n")
+        ]
+        self._imgs = tuple([img for img, _prefixes_ws in lines_info])
+        self._prefixes_ws = lines_info[0][1]
+
     def move_to(self: Self, init_x: int, init_y: int, should_scale: bool) -> None:
         """
         Moves the object to a specific coordinate.
@@ -222,13 +327,7 @@ class TextLabel(UIElement):
         """
 
         self.text = text
-        self._imgs = tuple([
-            self._renderer.render(
-                line,
-                antialias=True, color=WHITE, bgcolor=self._bg_color
-            ).convert_alpha()
-            for line in self.text.split("\n")
-        ])
+        self._refresh_imgs()
 
         xy: XY = getattr(self.rect, self.init_pos.coord_type)
         self.refresh_rects(xy)
@@ -254,7 +353,7 @@ class TextLabel(UIElement):
             character x coordinate
         """
 
-        return self.rect.x + self._renderer.size(self.text[:char_i])[0]
+        return self.rect.x + self._prefixes_ws[char_i]
 
     def get_closest_to(self: Self, x: int) -> int:
         """
@@ -266,19 +365,16 @@ class TextLabel(UIElement):
             index (0 - len(text))
         """
 
-        char: str
-
-        i: int = 0
-        prev_x: int = self.rect.x
-        current_x: int = prev_x
-        for i, char in enumerate(self.text):
-            current_x = prev_x + self._renderer.size(char)[0]
-            if x < current_x:
-                break
-
-            prev_x = current_x
+        rel_x: int = x - self.rect.x
+        # Index of the first prefix as wide or wider than x
+        i: int = bisect_left(self._prefixes_ws, rel_x)
+        if i == 0:
+            return 0
+        if i == len(self._prefixes_ws):
+            return i - 1
 
-        return i if abs(x - prev_x) < abs(x - current_x) else i + 1
+        prev_w: int = self._prefixes_ws[i - 1]
+        return i - 1 if rel_x - prev_w < self._prefixes_ws[i] - rel_x else i
 
     def start_animation(self: Self) -> None:
         """Resets the alpha value and starts the fade-in animation."""
@@ -22,7 +22,7 @@ Sub tools need:
 
 from typing import Self, Literal, TypeAlias, Final, Any
 
-from pygame import Surface, Rect, K_b, K_e, K_l, K_i, K_p, K_r
+from pygame import Surface, Rect, K_b, K_e, K_l, K_i, K_p, K_r, K_w
 
 from src.classes.checkbox_grid import CheckboxGrid
 from src.classes.clickable import Checkbox
@@ -33,11 +33,13 @@ from src.type_utils import RectPos
 from src.consts import SPECIAL_LAYER
 from src.imgs import (
     CHECKBOX_OFF_IMG, CHECKBOX_ON_IMG,
-    PENCIL_IMG, ERASER_IMG, BUCKET_IMG, EYE_DROPPER_IMG, LINE_IMG, RECT_IMG,
+    PENCIL_IMG, ERASER_IMG, BUCKET_IMG, EYE_DROPPER_IMG, LINE_IMG, RECT_IMG, MAGIC_WAND_IMG,
 )
 
 
-ToolName: TypeAlias = Literal["pencil", "eraser", "bucket", "eye_dropper", "line", "rect"]
+ToolName: TypeAlias = Literal[
+    "pencil", "eraser", "bucket", "eye_dropper", "line", "rect", "magic_wand",
+]
 ToolInfo: TypeAlias = tuple[ToolName, dict[str, Any]]
 _ToolsInfo: TypeAlias = dict[ToolName, dict[str, Any]]
 _SubToolsInfo: TypeAlias = tuple[dict[str, Any], ...]
@@ -47,13 +49,39 @@ _TOOLS_INFO: Final[_ToolsInfo] = {
     "pencil": {
         "info": (PENCIL_IMG, "Pencil\n(SHIFT+P)"),
         "shortcut_k": K_p,
-        "sub_info": (),
+        "sub_info": (
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Round", "Use a round brush"),
+                "upt_args": (),
+                "out_format": {"round": "is_checked"},
+            },
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Custom", "Use the brush image\n(CTRL+SHIFT+B)"),
+                "upt_args": (),
+                "out_format": {"custom": "is_checked"},
+            },
+        ),
     },
 
     "eraser": {
         "info": (ERASER_IMG, "Eraser\n(SHIFT+E)"),
         "shortcut_k": K_e,
-        "sub_info": (),
+        "sub_info": (
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Round", "Use a round brush"),
+                "upt_args": (),
+                "out_format": {"round": "is_checked"},
+            },
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Custom", "Use the brush image\n(CTRL+SHIFT+B)"),
+                "upt_args": (),
+                "out_format": {"custom": "is_checked"},
+            },
+        ),
     },
 
     "bucket": {
@@ -78,7 +106,20 @@ _TOOLS_INFO: Final[_ToolsInfo] = {
     "line": {
         "info": (LINE_IMG, "Line\n(SHIFT+L)"),
         "shortcut_k": K_l,
-        "sub_info": (),
+        "sub_info": (
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Round", "Use a round brush"),
+                "upt_args": (),
+                "out_format": {"round": "is_checked"},
+            },
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Custom", "Use the brush image\n(CTRL+SHIFT+B)"),
+                "upt_args": (),
+                "out_format": {"custom": "is_checked"},
+            },
+        ),
     },
 
     "rect": {
@@ -93,6 +134,19 @@ _TOOLS_INFO: Final[_ToolsInfo] = {
             },
         ),
     },
+
+    "magic_wand": {
+        "info": (MAGIC_WAND_IMG, "Magic Wand\n(SHIFT+W)"),
+        "shortcut_k": K_w,
+        "sub_info": (
+            {
+                "type": Checkbox,
+                "init_args": (_CHECKBOX_IMGS, "Color Select", "Select pixels with\nthe same color"),
+                "upt_args": (),
+                "out_format": {"color_select": "is_checked"},
+            },
+        ),
+    },
 }
 del _CHECKBOX_IMGS
 
@@ -216,6 +270,13 @@ class ToolsManager(UIElement):
         sub_tools_info: _SubToolsInfo
         sub_tool_info: dict[str, Any]
 
+        num_sub_tools: int = sum([
+            len(sub_tools_info)
+            for sub_tools_info in self._all_sub_tools_info
+        ])
+        if len(all_info) != num_sub_tools:  # Data from a version with different sub tools
+            return
+
         i: int = 0
         for sub_tools_info in self._all_sub_tools_info:
             for sub_tool_info in sub_tools_info:
@@ -302,5 +363,7 @@ class ToolsManager(UIElement):
             self.tools_grid.clicked_i = self.saved_clicked_i
             self.saved_clicked_i = None
 
+        # The sub tools are of the clicked tool even if it wasn't checked yet
+        self._tool_name = tuple(_TOOLS_INFO.keys())[self.tools_grid.clicked_i]
         out_dict: dict[str, Any] = self._upt_sub_tools(locals())
         return self._tool_name, out_dict
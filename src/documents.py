@@ -0,0 +1,477 @@
+"""
+Classes to keep multiple files open, only the active one has decompressed tiles.
+
+Inactive documents keep the tiles as a compressed snapshot next to their compressed history,
+when they take more memory than a budget the least recently used ones are moved to
+temporary projects and they're loaded back when activated.
+
+Temporary projects are written by try_write_evicted and read by try_read_evicted,
+they don't use the documents so they can run in the background between start and finish methods.
+"""
+
+import os
+from pathlib import Path
+from tempfile import gettempdir
+from itertools import count
+from typing import Self, TypeAlias, Final, Any
+
+import pygame as pg
+from numpy import uint32
+from numpy.typing import NDArray
+
+from src.canvas import HistorySnapshot, Canvas, get_snapshot, get_snapshot_tiles
+from src.project_utils import (
+    get_project_info_bytes, save_project, read_project_tiles, read_project_info,
+)
+from src.journal_utils import get_new_journal_path
+from src.file_utils import FileError, handle_file_os_error, try_remove_file
+from src.lock_utils import LockError, try_lock_file
+from src.consts import FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I
+
+# Tiles snapshot, history, history index
+ParkedCanvas: TypeAlias = tuple[HistorySnapshot, list[HistorySnapshot], int]
+# Temporary project path, parked canvas, project info
+EvictInfo: TypeAlias = tuple[Path, ParkedCanvas, bytes]
+
+_PARKED_MAX_SIZE: Final[int] = 64 * 1_024 * 1_024
+
+_EVICTED_IDS: Final[count[int]] = count()
+
+
+def _get_parked_size(parked_canvas: ParkedCanvas) -> int:
+    """
+    Gets the bytes taken by a parked canvas.
+
+    Args:
+        parked canvas
+    Returns:
+        size
+    """
+
+    snapshot: HistorySnapshot
+
+    tiles_snapshot: HistorySnapshot = parked_canvas[0]
+    history: list[HistorySnapshot] = parked_canvas[1]
+    size: int = sum([len(snapshot[2]) + len(snapshot[3]) for snapshot in history])
+    if tiles_snapshot is not history[parked_canvas[2]]:
+        size += len(tiles_snapshot[2]) + len(tiles_snapshot[3])
+
+    return size
+
+
+def try_write_evicted(evict_info: EvictInfo) -> str | None:
+    """
+    Writes a parked canvas to its temporary project with retries.
+
+    Args:
+        evict info
+    Returns:
+        error string (can be None)
+    """
+
+    should_retry: bool
+
+    evicted_path: Path = evict_info[0]
+    tiles_snapshot: HistorySnapshot = evict_info[1][0]
+
+    error_str: str | None = None
+    attempt_i: int = FILE_ATTEMPT_START_I
+    while attempt_i <= FILE_ATTEMPT_STOP_I:
+        try:
+            save_project(evicted_path, get_snapshot_tiles(tiles_snapshot), evict_info[2])
+            error_str = None
+            break
+        except (PermissionError, LockError, FileError) as e:
+            error_str = {
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+            break
+        except OSError as e:
+            attempt_i += 1
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            break
+
+    if error_str is not None:
+        try_remove_file(evicted_path)
+    return error_str
+
+def try_read_evicted(evicted_path: Path) -> tuple[ParkedCanvas | None, str | None]:
+    """
+    Reads a temporary project as a parked canvas with retries.
+
+    Args:
+        path
+    Returns:
+        parked canvas (None on failure), error string (can be None)
+    """
+
+    attempt_i: int
+    should_retry: bool
+    info: dict[str, Any]
+
+    tiles: NDArray[uint32] | None = None
+    history: list[HistorySnapshot] = []
+    history_i: int = 0
+    error_str: str | None = None
+    for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+        try:
+            with evicted_path.open("rb") as f:
+                try_lock_file(f, should_be_shared=True)
+                tiles = read_project_tiles(f)
+                info, history = read_project_info(f)
+            history_i = info["history_i"]
+            error_str = None
+            break
+        except (FileNotFoundError, PermissionError, LockError, FileError) as e:
+            error_str = {
+                FileNotFoundError: "File missing.",
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+            break
+        except OSError as e:
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            break
+
+    if tiles is None or history == []:
+        return None, error_str or "Invalid project."
+    return (get_snapshot(tiles), history, history_i), None
+
+
+class Document:
+    """Class to store an open file with its view, canvas and journal."""
+
+    __slots__ = (
+        "file_str", "is_saved", "visible_cols", "visible_rows", "offset_x", "offset_y",
+        "journal_path", "journal_file_str", "num_journal_records",
+        "canvas", "_parked_canvas", "_evicted_path", "_evicting_path", "_is_reading",
+    )
+
+    def __init__(self: Self, file_str: str, canvas: Canvas) -> None:
+        """
+        Creates an active document.
+
+        Args:
+            file string, canvas
+        """
+
+        self.file_str: str = file_str
+        self.is_saved: bool = False
+        self.visible_cols: int = canvas.tiles.shape[0]
+        self.visible_rows: int = canvas.tiles.shape[1]
+        self.offset_x: int = 0
+        self.offset_y: int = 0
+
+        self.journal_path: Path = get_new_journal_path()
+        # File the journal was started for, None if it wasn't written yet
+        self.journal_file_str: str | None = None
+        self.num_journal_records: int = 0
+
+        # None when inactive
+        self.canvas: Canvas | None = canvas
+        # Set when inactive and in memory
+        self._parked_canvas: ParkedCanvas | None = None
+        # Set when inactive and on disk
+        self._evicted_path: Path | None = None
+        # Set while the parked canvas is written to disk
+        self._evicting_path: Path | None = None
+        self._is_reading: bool = False
+
+    @property
+    def parked_size(self: Self) -> int:
+        """
+        Gets the memory that evicting the document would free.
+
+        Returns:
+            size (0 if active, on disk or being moved there)
+        """
+
+        if self._parked_canvas is None or self._evicting_path is not None:
+            return 0
+        return _get_parked_size(self._parked_canvas)
+
+    @property
+    def is_evicted(self: Self) -> bool:
+        """
+        Checks if the canvas has to be read from disk before activating the document.
+
+        Returns:
+            evicted flag
+        """
+
+        return self._parked_canvas is None and self._evicted_path is not None
+
+    def park(self: Self) -> None:
+        """Compresses the tiles and drops the canvas, the history is already compressed."""
+
+        if self.canvas is None:
+            return
+
+        history: list[HistorySnapshot] = list(self.canvas.history)
+        tiles_snapshot: HistorySnapshot = get_snapshot(self.canvas.tiles)
+        if tiles_snapshot == history[self.canvas.history_i]:
+            tiles_snapshot = history[self.canvas.history_i]  # Shares the bytes
+
+        self._parked_canvas = (tiles_snapshot, history, self.canvas.history_i)
+        self.canvas = None
+
+    def start_evict(self: Self) -> EvictInfo | None:
+        """
+        Starts moving the parked canvas to a temporary project, it's written by try_write_evicted.
+
+        It stays in memory until finish_evict.
+
+        Returns:
+            evict info (None if not parked or already being moved)
+        """
+
+        if self._parked_canvas is None or self._evicting_path is not None:
+            return None
+
+        self._evicting_path = Path(
+            gettempdir(), f"dixel_{os.getpid()}_{next(_EVICTED_IDS)}.dixel"
+        )
+        info_bytes: bytes = get_project_info_bytes(
+            self.visible_cols, self.visible_rows, self.offset_x, self.offset_y,
+            [], self._parked_canvas[1], self._parked_canvas[2]
+        )
+        return self._evicting_path, self._parked_canvas, info_bytes
+
+    def finish_evict(self: Self, evict_info: EvictInfo, error_str: str | None) -> None:
+        """
+        Drops the parked canvas if it was written and it wasn't activated or removed meanwhile.
+
+        Args:
+            evict info, error string of try_write_evicted
+        """
+
+        evicted_path: Path = evict_info[0]
+        if (
+            error_str is None and
+            self._evicting_path == evicted_path and self._parked_canvas is evict_info[1]
+        ):
+            self._parked_canvas = None
+            self._evicted_path = evicted_path
+        else:
+            try_remove_file(evicted_path)
+        if self._evicting_path == evicted_path:
+            self._evicting_path = None
+
+    def start_read(self: Self) -> Path | None:
+        """
+        Starts reading the temporary project, it's read by try_read_evicted.
+
+        Returns:
+            path (None if not evicted or already being read)
+        """
+
+        if not self.is_evicted or self._is_reading:
+            return None
+
+        self._is_reading = True
+        return self._evicted_path
+
+    def finish_read(self: Self, parked_canvas: ParkedCanvas | None) -> None:
+        """
+        Keeps the read canvas in memory and removes the temporary project.
+
+        Args:
+            parked canvas of try_read_evicted (None on failure, the temporary project is kept)
+        """
+
+        self._is_reading = False
+        if parked_canvas is not None:
+            self._parked_canvas = parked_canvas
+            self.discard_evicted()
+
+    def try_load(self: Self, history_max_len: int | None) -> str | None:
+        """
+        Creates the canvas from the parked one, evicted ones are read with retries.
+
+        Changed tiles aren't marked as unjournaled.
+
+        Args:
+            maximum history length (None = unlimited)
+        Returns:
+            error string (can be None)
+        """
+
+        parked_canvas: ParkedCanvas | None
+
+        if self.canvas is not None:
+            return None
+
+        if self.is_evicted:
+            assert self._evicted_path is not None
+            # Blocks, the main loop reads them in the background before activating
+            parked_canvas, error_str = try_read_evicted(self._evicted_path)
+            if parked_canvas is None:
+                return error_str
+            self.finish_read(parked_canvas)
+
+        if self._parked_canvas is None or self._parked_canvas[1] == []:
+            return "Invalid project."
+
+        tiles: NDArray[uint32] = get_snapshot_tiles(self._parked_canvas[0])
+        canvas: Canvas = Canvas(1, 1)
+        canvas.set_tiles(tiles, should_reset_history=False)
+        canvas.set_history_max_len(history_max_len)
+        canvas.set_history(self._parked_canvas[1], self._parked_canvas[2])
+        canvas.unjournaled_box = None
+
+        self.canvas = canvas
+        self._parked_canvas = None
+        self.discard_evicted()
+        return None
+
+    def discard_evicted(self: Self) -> None:
+        """Removes the temporary project, includes the one being written."""
+
+        if self._evicted_path is not None:
+            try_remove_file(self._evicted_path)
+            self._evicted_path = None
+        if self._evicting_path is not None:
+            # If it's still being written finish_evict removes it again
+            try_remove_file(self._evicting_path)
+            self._evicting_path = None
+
+
+class Documents:
+    """Class to manage the open documents and the memory of the inactive ones."""
+
+    __slots__ = (
+        "docs", "active_i", "_lru_docs",
+    )
+
+    def __init__(self: Self, doc: Document) -> None:
+        """
+        Creates the documents with an active one.
+
+        Args:
+            document
+        """
+
+        self.docs: list[Document] = [doc]
+        self.active_i: int = 0
+        # Least recently used first
+        self._lru_docs: list[Document] = [doc]
+
+    @property
+    def active(self: Self) -> Document:
+        """
+        Gets the active document.
+
+        Returns:
+            document
+        """
+
+        return self.docs[self.active_i]
+
+    def start_evict_unused(self: Self) -> list[tuple[Document, EvictInfo]]:
+        """
+        Starts evicting the least recently used inactive documents until they fit in the budget.
+
+        Returns:
+            documents and their evict info
+        """
+
+        doc: Document
+
+        evict_infos: list[tuple[Document, EvictInfo]] = []
+        parked_size: int = sum([doc.parked_size for doc in self.docs])
+        for doc in self._lru_docs:
+            if parked_size <= _PARKED_MAX_SIZE:
+                break
+
+            doc_parked_size: int = doc.parked_size
+            evict_info: EvictInfo | None = doc.start_evict()
+            if evict_info is not None:
+                evict_infos.append((doc, evict_info))
+                parked_size -= doc_parked_size
+
+        return evict_infos
+
+    def activate(self: Self, i: int) -> str | None:
+        """
+        Parks the active document and loads another one.
+
+        Args:
+            index
+        Returns:
+            error string (if not None the document is removed and the active one is kept)
+        """
+
+        prev_doc: Document = self.active
+        doc: Document = self.docs[i]
+        if doc is prev_doc:
+            return None
+
+        assert prev_doc.canvas is not None
+        error_str: str | None = doc.try_load(prev_doc.canvas.history.maxlen)
+        if error_str is not None:
+            self.remove(doc)
+            return f"{Path(doc.file_str).name or 'New File'}: {error_str}"
+
+        prev_doc.park()
+        self.active_i = i
+        self._lru_docs.remove(doc)
+        self._lru_docs.append(doc)
+        return None
+
+    def add_inactive(self: Self, doc: Document) -> None:
+        """
+        Parks a document and adds it at the end as the least recently used.
+
+        Args:
+            document
+        """
+
+        doc.park()
+        self.docs.append(doc)
+        self._lru_docs.insert(0, doc)
+
+    def add(self: Self, doc: Document) -> None:
+        """
+        Parks the active document and adds an active one after it.
+
+        Args:
+            document
+        """
+
+        self.active.park()
+        self.active_i += 1
+        self.docs.insert(self.active_i, doc)
+        self._lru_docs.append(doc)
+
+    def remove(self: Self, doc: Document) -> None:
+        """
+        Removes an inactive document and its temporary project.
+
+        Args:
+            document
+        """
+
+        active_doc: Document = self.active
+        self.docs.remove(doc)
+        self._lru_docs.remove(doc)
+        doc.discard_evicted()
+        self.active_i = self.docs.index(active_doc)
+
+    def discard_all_evicted(self: Self) -> None:
+        """Removes the temporary projects of every document."""
+
+        doc: Document
+
+        for doc in self.docs:
+            doc.discard_evicted()
@@ -167,6 +167,35 @@ def try_write_file(f: BinaryIO, content: bytes) -> None:
     for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
         try:
             f.truncate(0)
+            break
+        except PermissionError:
+            raise
+        except OSError as e:
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            raise FileError(error_str) from e
+
+    try_append_file(f, content)
+
+def try_append_file(f: BinaryIO, content: bytes) -> None:
+    """
+    Writes to a file from its current position with retries.
+
+    Args:
+        file, content
+    Raises:
+        FileError: on failure
+    """
+
+    attempt_i: int
+    error_str: str
+    should_retry: bool
+
+    for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+        try:
             written_bytes: int = f.write(content)
             if written_bytes != len(content):
                 raise FileError("Failed to write full file.")
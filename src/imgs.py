@@ -1,23 +1,38 @@
-"""Images shared between files."""
+"""
+Images shared between files.
 
-from tkinter import messagebox
+Sprites and their variants are packed in an atlas with a json of their rects,
+it's rebuilt when a sprite is modified so startup only reads one image.
+"""
+
+import json
 from pathlib import Path
+from json import JSONDecodeError
 from io import BytesIO
-from typing import Final
+from typing import Final, Any
 
 import pygame as pg
-import numpy as np
-from pygame import Surface, surfarray, draw, transform
-from numpy import uint8, uint32, bool_
+from pygame import Color, Surface, Rect, surfarray, draw, transform
+from numpy import bool_
 from numpy.typing import NDArray
 
-from src.utils import add_border
-from src.file_utils import FileError, handle_file_os_error, try_read_file
+from src.utils import get_packed_pixels, pack_color, add_border
+from src.file_utils import (
+    FileError, handle_file_os_error,
+    try_read_file, try_write_file, try_replace_file, try_remove_file, try_create_dir,
+)
 from src.lock_utils import LockError, try_lock_file
 from src.type_utils import WH
 from src.consts import WHITE, FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I
 
 
+_SPRITES_DIR_PATH: Final[Path] = Path("assets", "sprites")
+_ATLAS_PATH: Final[Path] = Path("assets", "data", "sprites_atlas.png")
+_ATLAS_INFO_PATH: Final[Path] = Path("assets", "data", "sprites_atlas.json")
+# Increase it when the variants change
+_ATLAS_VERSION: Final[int] = 1
+_ATLAS_MAX_W: Final[int] = 512
+
 _ERRORS: Final[list[str]] = []
 _MISSING_IMG: Final[Surface] = Surface((64, 64))
 _MISSING_IMG.fill((255, 0, 0))
@@ -38,7 +53,7 @@ def _try_get_img(file_str: str, missing_img_wh: WH) -> Surface:
     error_str: str
     should_retry: bool
 
-    file_path: Path = Path("assets", "sprites", file_str)
+    file_path: Path = _SPRITES_DIR_PATH / file_str
     img: Surface | None = None
     for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
         try:
@@ -85,9 +100,7 @@ def _change_brightness(img: Surface, brightness: float) -> Surface:
     """
 
     img = img.convert_alpha()
-    pixels: NDArray[uint8] = np.dstack((surfarray.pixels3d(img), surfarray.pixels_alpha(img)))
-    colorkey_arr: NDArray[uint8] = np.array((0, 0, 1, 0), uint8)
-    colorkey_mask: NDArray[bool_] = pixels.view(uint32)[..., 0] == colorkey_arr.view(uint32)[0]
+    colorkey_mask: NDArray[bool_] = get_packed_pixels(img) == pack_color(Color(0, 0, 1, 0))
 
     transform.hsl(img, lightness=brightness, dest_surface=img)
     surfarray.pixels3d(img)[colorkey_mask] = (0, 0, 1)
@@ -95,59 +108,259 @@ def _change_brightness(img: Surface, brightness: float) -> Surface:
     return img.convert()
 
 
-ICON_IMG: Final[Surface] = _try_get_img("icon.png", (32, 32))
+def _build_imgs() -> dict[str, Surface]:
+    """
+    Loads the sprites and creates their variants.
+
+    Returns:
+        images
+    """
+
+    imgs: dict[str, Surface] = {}
+
+    imgs["ICON_IMG"] = _try_get_img("icon.png", (32, 32))
 
-CHECKBOX_OFF_IMG: Final[Surface] = _try_get_img("checkbox.png", (48, 48))
-CHECK_IMG: Final[Surface] = _try_get_img("check.png", (32, 32))
-CHECKBOX_ON_IMG: Final[Surface] = CHECKBOX_OFF_IMG.copy()
-CHECKBOX_ON_IMG.blit(
-    CHECK_IMG,
-    (
-        CHECKBOX_OFF_IMG.get_rect().centerx - (CHECK_IMG.get_width()  / 2),
-        CHECKBOX_OFF_IMG.get_rect().centery - (CHECK_IMG.get_height() / 2),
+    checkbox_off_img: Surface = _try_get_img("checkbox.png", (48, 48))
+    check_img: Surface = _try_get_img("check.png", (32, 32))
+    checkbox_on_img: Surface = checkbox_off_img.copy()
+    checkbox_on_img.blit(
+        check_img,
+        (
+            checkbox_off_img.get_rect().centerx - (check_img.get_width()  / 2),
+            checkbox_off_img.get_rect().centery - (check_img.get_height() / 2),
+        )
     )
-)
+    imgs["CHECKBOX_OFF_IMG"], imgs["CHECKBOX_ON_IMG"] = checkbox_off_img, checkbox_on_img
+    imgs["CHECK_IMG"] = check_img
+
+    button_m_off_img: Surface = _try_get_img("button.png", (128, 64))
+    button_m_on_img: Surface = _change_brightness(button_m_off_img, 0.5)
+    imgs["BUTTON_M_OFF_IMG"], imgs["BUTTON_M_ON_IMG"] = button_m_off_img, button_m_on_img
+    imgs["BUTTON_S_OFF_IMG"] = transform.scale(button_m_off_img, (96, 48)).convert()
+    imgs["BUTTON_S_ON_IMG"]  = transform.scale(button_m_on_img , (96, 48)).convert()
+    imgs["BUTTON_XS_OFF_IMG"] = transform.scale(button_m_off_img, (64, 32)).convert()
+    imgs["BUTTON_XS_ON_IMG"]  = transform.scale(button_m_on_img , (64, 32)).convert()
+
+    x_mirror_off_img: Surface = _try_get_img("mirror.png", (72, 70))
+    x_mirror_on_img: Surface = add_border(x_mirror_off_img, WHITE)
+    imgs["X_MIRROR_OFF_IMG"], imgs["X_MIRROR_ON_IMG"] = x_mirror_off_img, x_mirror_on_img
+    imgs["Y_MIRROR_OFF_IMG"] = transform.rotate(x_mirror_off_img, -90).convert()
+    imgs["Y_MIRROR_ON_IMG"]  = transform.rotate(x_mirror_on_img , -90).convert()
+
+    arrow_up_off_img: Surface = _try_get_img("arrow.png", (16, 10))
+    arrow_up_on_img: Surface = _change_brightness(arrow_up_off_img, -0.5)
+    imgs["ARROW_UP_OFF_IMG"], imgs["ARROW_UP_ON_IMG"] = arrow_up_off_img, arrow_up_on_img
+    imgs["ARROW_DOWN_OFF_IMG"] = transform.rotate(arrow_up_off_img, 180).convert()
+    imgs["ARROW_DOWN_ON_IMG"]  = transform.rotate(arrow_up_on_img , 180).convert()
 
-BUTTON_M_OFF_IMG: Final[Surface] = _try_get_img("button.png", (128, 64))
-BUTTON_M_ON_IMG: Final[Surface] = _change_brightness(BUTTON_M_OFF_IMG, 0.5)
-BUTTON_S_OFF_IMG = transform.scale(BUTTON_M_OFF_IMG, (96, 48)).convert()
-BUTTON_S_ON_IMG  = transform.scale(BUTTON_M_ON_IMG , (96, 48)).convert()
-BUTTON_XS_OFF_IMG: Final[Surface] = transform.scale(BUTTON_M_OFF_IMG, (64, 32)).convert()
-BUTTON_XS_ON_IMG: Final[Surface]  = transform.scale(BUTTON_M_ON_IMG , (64, 32)).convert()
-
-X_MIRROR_OFF_IMG: Final[Surface] = _try_get_img("mirror.png", (72, 70))
-X_MIRROR_ON_IMG: Final[Surface] = add_border(X_MIRROR_OFF_IMG, WHITE)
-Y_MIRROR_OFF_IMG: Final[Surface] = transform.rotate(X_MIRROR_OFF_IMG, -90).convert()
-Y_MIRROR_ON_IMG: Final[Surface]  = transform.rotate(X_MIRROR_ON_IMG , -90).convert()
-
-ARROW_UP_OFF_IMG: Final[Surface] = _try_get_img("arrow.png", (16, 10))
-ARROW_UP_ON_IMG: Final[Surface] = _change_brightness(ARROW_UP_OFF_IMG, -0.5)
-ARROW_DOWN_OFF_IMG: Final[Surface] = transform.rotate(ARROW_UP_OFF_IMG, 180).convert()
-ARROW_DOWN_ON_IMG: Final[Surface]  = transform.rotate(ARROW_UP_ON_IMG , 180).convert()
-
-ADD_OFF_IMG: Final[Surface] = _try_get_img("add.png", (32, 32))
-ADD_ON_IMG: Final[Surface] = _change_brightness(ADD_OFF_IMG, 0.5)
-INFO_OFF_IMG: Final[pg.Surface] = _try_get_img("info.png", (11, 3))
-INFO_ON_IMG: Final[pg.Surface] = _change_brightness(INFO_OFF_IMG, 0.5)
-
-PENCIL_IMG: Final[Surface]      = _try_get_img("pencil.png"     , (64, 64))
-ERASER_IMG: Final[Surface]      = _try_get_img("eraser.png"     , (64, 64))
-BUCKET_IMG: Final[Surface]      = _try_get_img("bucket.png"     , (64, 64))
-EYE_DROPPER_IMG: Final[Surface] = _try_get_img("eye_dropper.png", (64, 64))
-LINE_IMG: Final[Surface]        = _try_get_img("line.png"       , (64, 64))
-RECT_IMG: Final[Surface]        = _try_get_img("rect.png"       , (64, 64))
-
-SETTINGS_OFF_IMG: Final[Surface] = _try_get_img("settings.png", (48, 48))
-SETTINGS_ON_IMG: Final[Surface] = _change_brightness(SETTINGS_OFF_IMG, 0.5)
-
-CLOSE_OFF_IMG: Final[Surface] = _try_get_img("close.png", (48, 48))
-CLOSE_ON_IMG: Final[Surface] = _change_brightness(CLOSE_OFF_IMG, -0.5)
-
-ROTATE_LEFT_OFF_IMG: Final[Surface] = _try_get_img("rotate.png", (38, 44))
-ROTATE_LEFT_ON_IMG: Final[Surface] = _change_brightness(ROTATE_LEFT_OFF_IMG, -0.5)
-ROTATE_RIGHT_OFF_IMG: Final[Surface] = transform.flip(ROTATE_LEFT_OFF_IMG, True, False).convert()
-ROTATE_RIGHT_ON_IMG: Final[Surface]  = transform.flip(ROTATE_LEFT_ON_IMG , True, False).convert()
+    imgs["ADD_OFF_IMG"] = _try_get_img("add.png", (32, 32))
+    imgs["ADD_ON_IMG"] = _change_brightness(imgs["ADD_OFF_IMG"], 0.5)
+    imgs["INFO_OFF_IMG"] = _try_get_img("info.png", (11, 3))
+    imgs["INFO_ON_IMG"] = _change_brightness(imgs["INFO_OFF_IMG"], 0.5)
+
+    imgs["PENCIL_IMG"]      = _try_get_img("pencil.png"     , (64, 64))
+    imgs["ERASER_IMG"]      = _try_get_img("eraser.png"     , (64, 64))
+    imgs["BUCKET_IMG"]      = _try_get_img("bucket.png"     , (64, 64))
+    imgs["EYE_DROPPER_IMG"] = _try_get_img("eye_dropper.png", (64, 64))
+    imgs["LINE_IMG"]        = _try_get_img("line.png"       , (64, 64))
+    imgs["RECT_IMG"]        = _try_get_img("rect.png"       , (64, 64))
+    imgs["MAGIC_WAND_IMG"]  = _try_get_img("magic_wand.png" , (64, 64))
+
+    imgs["SETTINGS_OFF_IMG"] = _try_get_img("settings.png", (48, 48))
+    imgs["SETTINGS_ON_IMG"] = _change_brightness(imgs["SETTINGS_OFF_IMG"], 0.5)
+
+    imgs["CLOSE_OFF_IMG"] = _try_get_img("close.png", (48, 48))
+    imgs["CLOSE_ON_IMG"] = _change_brightness(imgs["CLOSE_OFF_IMG"], -0.5)
+
+    rotate_left_off_img: Surface = _try_get_img("rotate.png", (38, 44))
+    rotate_left_on_img: Surface = _change_brightness(rotate_left_off_img, -0.5)
+    imgs["ROTATE_LEFT_OFF_IMG"], imgs["ROTATE_LEFT_ON_IMG"] = (
+        rotate_left_off_img, rotate_left_on_img
+    )
+    imgs["ROTATE_RIGHT_OFF_IMG"] = transform.flip(rotate_left_off_img, True, False).convert()
+    imgs["ROTATE_RIGHT_ON_IMG"]  = transform.flip(rotate_left_on_img , True, False).convert()
+
+    return imgs
+
+
+def _get_sprites_mtimes() -> dict[str, int]:
+    """
+    Gets the modification time of every sprite.
+
+    Returns:
+        modification times (empty if the folder can't be read)
+    """
+
+    sprite_path: Path
+
+    try:
+        return {
+            sprite_path.name: sprite_path.stat().st_mtime_ns
+            for sprite_path in _SPRITES_DIR_PATH.glob("*.png")
+        }
+    except OSError:
+        return {}
+
+
+def _try_get_atlas_imgs(sprites_mtimes: dict[str, int]) -> dict[str, Surface] | None:
+    """
+    Loads the images from the atlas if it's up to date, there are no retries.
+
+    Args:
+        modification times of the sprites
+    Returns:
+        images (None if missing, outdated or invalid)
+    """
+
+    name: str
+    rect_info: list[int]
+    colorkey: list[int] | None
+
+    try:
+        with _ATLAS_INFO_PATH.open("rb") as f:
+            try_lock_file(f, should_be_shared=True)
+            info: dict[str, Any] = json.loads(try_read_file(f))
+        if info["version"] != _ATLAS_VERSION or info["sprites_mtimes"] != sprites_mtimes:
+            return None
+
+        with _ATLAS_PATH.open("rb") as f:
+            try_lock_file(f, should_be_shared=True)
+            img_bytes_io: BytesIO = BytesIO(try_read_file(f))
+        atlas_img: Surface = pg.image.load(img_bytes_io, namehint=".png").convert()
+
+        imgs: dict[str, Surface] = {}
+        for name, (rect_info, colorkey) in info["imgs"].items():
+            img: Surface = atlas_img.subsurface(rect_info).copy()
+            if colorkey is not None:
+                img.set_colorkey(colorkey)
+            imgs[name] = img
+    except (
+        OSError, LockError, FileError, pg.error,
+        JSONDecodeError, KeyError, TypeError, ValueError
+    ):
+        return None
+
+    return imgs
+
+
+def _try_save_atlas(imgs: dict[str, Surface], sprites_mtimes: dict[str, int]) -> None:
+    """
+    Packs the images in rows of an atlas and saves it with their rects, failures are ignored.
+
+    Args:
+        images, modification times of the sprites
+    """
+
+    name: str
+    img: Surface
+    file_path: Path
+    content: bytes
+
+    x: int = 0
+    y: int = 0
+    row_h: int = 0
+    rects: dict[str, Rect] = {}
+    for name, img in sorted(imgs.items(), key=lambda item: -item[1].get_height()):
+        if x + img.get_width() > _ATLAS_MAX_W:
+            x, y, row_h = 0, y + row_h, 0
+        rects[name] = Rect((x, y), img.get_size())
+        x += img.get_width()
+        row_h = max(row_h, img.get_height())
+
+    atlas_img: Surface = Surface((_ATLAS_MAX_W, y + row_h))
+    atlas_img.fill((0, 0, 1))
+    for name, img in imgs.items():
+        atlas_img.blit(img, rects[name])
+    atlas_bytes_io: BytesIO = BytesIO()
+    pg.image.save(atlas_img, atlas_bytes_io, ".png")
+
+    info: dict[str, Any] = {
+        "version": _ATLAS_VERSION,
+        "sprites_mtimes": sprites_mtimes,
+        "imgs": {
+            name: (tuple(rects[name]), img.get_colorkey())
+            for name, img in imgs.items()
+        },
+    }
+    info_bytes: bytes = json.dumps(info).encode("utf-8")
+
+    if try_create_dir(_ATLAS_PATH.parent, FILE_ATTEMPT_START_I) is not None:
+        return
+    # The info is written last so an interrupted save leaves an outdated atlas
+    files_info: tuple[tuple[Path, bytes], ...] = (
+        (_ATLAS_PATH, atlas_bytes_io.getvalue()),
+        (_ATLAS_INFO_PATH, info_bytes),
+    )
+    for file_path, content in files_info:
+        temp_file_path: Path = file_path.with_suffix(".tmp")
+        try:
+            # If you open in write mode it will clear the file even if it's locked
+            with temp_file_path.open("ab") as f:
+                try_lock_file(f, should_be_shared=False)
+                try_write_file(f, content)
+            try_replace_file(temp_file_path, file_path)
+        except (OSError, LockError, FileError):
+            try_remove_file(temp_file_path)
+            return
+
+
+_SPRITES_MTIMES: Final[dict[str, int]] = _get_sprites_mtimes()
+_IMGS: Final[dict[str, Surface]] = _try_get_atlas_imgs(_SPRITES_MTIMES) or {}
+if _IMGS == {}:
+    _IMGS.update(_build_imgs())
+    # Placeholders of missing sprites aren't cached
+    if _ERRORS == []:
+        _try_save_atlas(_IMGS, _SPRITES_MTIMES)
+
+ICON_IMG: Final[Surface] = _IMGS["ICON_IMG"]
+
+CHECKBOX_OFF_IMG: Final[Surface] = _IMGS["CHECKBOX_OFF_IMG"]
+CHECK_IMG: Final[Surface] = _IMGS["CHECK_IMG"]
+CHECKBOX_ON_IMG: Final[Surface] = _IMGS["CHECKBOX_ON_IMG"]
+
+BUTTON_M_OFF_IMG: Final[Surface] = _IMGS["BUTTON_M_OFF_IMG"]
+BUTTON_M_ON_IMG: Final[Surface] = _IMGS["BUTTON_M_ON_IMG"]
+BUTTON_S_OFF_IMG: Final[Surface] = _IMGS["BUTTON_S_OFF_IMG"]
+BUTTON_S_ON_IMG: Final[Surface]  = _IMGS["BUTTON_S_ON_IMG"]
+BUTTON_XS_OFF_IMG: Final[Surface] = _IMGS["BUTTON_XS_OFF_IMG"]
+BUTTON_XS_ON_IMG: Final[Surface]  = _IMGS["BUTTON_XS_ON_IMG"]
+
+X_MIRROR_OFF_IMG: Final[Surface] = _IMGS["X_MIRROR_OFF_IMG"]
+X_MIRROR_ON_IMG: Final[Surface] = _IMGS["X_MIRROR_ON_IMG"]
+Y_MIRROR_OFF_IMG: Final[Surface] = _IMGS["Y_MIRROR_OFF_IMG"]
+Y_MIRROR_ON_IMG: Final[Surface]  = _IMGS["Y_MIRROR_ON_IMG"]
+
+ARROW_UP_OFF_IMG: Final[Surface] = _IMGS["ARROW_UP_OFF_IMG"]
+ARROW_UP_ON_IMG: Final[Surface] = _IMGS["ARROW_UP_ON_IMG"]
+ARROW_DOWN_OFF_IMG: Final[Surface] = _IMGS["ARROW_DOWN_OFF_IMG"]
+ARROW_DOWN_ON_IMG: Final[Surface]  = _IMGS["ARROW_DOWN_ON_IMG"]
+
+ADD_OFF_IMG: Final[Surface] = _IMGS["ADD_OFF_IMG"]
+ADD_ON_IMG: Final[Surface] = _IMGS["ADD_ON_IMG"]
+INFO_OFF_IMG: Final[pg.Surface] = _IMGS["INFO_OFF_IMG"]
+INFO_ON_IMG: Final[pg.Surface] = _IMGS["INFO_ON_IMG"]
+
+PENCIL_IMG: Final[Surface]      = _IMGS["PENCIL_IMG"]
+ERASER_IMG: Final[Surface]      = _IMGS["ERASER_IMG"]
+BUCKET_IMG: Final[Surface]      = _IMGS["BUCKET_IMG"]
+EYE_DROPPER_IMG: Final[Surface] = _IMGS["EYE_DROPPER_IMG"]
+LINE_IMG: Final[Surface]        = _IMGS["LINE_IMG"]
+RECT_IMG: Final[Surface]        = _IMGS["RECT_IMG"]
+MAGIC_WAND_IMG: Final[Surface]  = _IMGS["MAGIC_WAND_IMG"]
+
+SETTINGS_OFF_IMG: Final[Surface] = _IMGS["SETTINGS_OFF_IMG"]
+SETTINGS_ON_IMG: Final[Surface] = _IMGS["SETTINGS_ON_IMG"]
+
+CLOSE_OFF_IMG: Final[Surface] = _IMGS["CLOSE_OFF_IMG"]
+CLOSE_ON_IMG: Final[Surface] = _IMGS["CLOSE_ON_IMG"]
+
+ROTATE_LEFT_OFF_IMG: Final[Surface] = _IMGS["ROTATE_LEFT_OFF_IMG"]
+ROTATE_LEFT_ON_IMG: Final[Surface] = _IMGS["ROTATE_LEFT_ON_IMG"]
+ROTATE_RIGHT_OFF_IMG: Final[Surface] = _IMGS["ROTATE_RIGHT_OFF_IMG"]
+ROTATE_RIGHT_ON_IMG: Final[Surface]  = _IMGS["ROTATE_RIGHT_ON_IMG"]
 
 if _ERRORS != []:
+    from tkinter import messagebox  # Lazy, only needed on errors
+
     messagebox.showerror("Images Load Failed", "\n".join(_ERRORS))
-del _ERRORS, _MISSING_IMG
+del _ERRORS, _MISSING_IMG, _SPRITES_MTIMES, _IMGS
@@ -0,0 +1,94 @@
+"""
+Background thread for file operations, their retries and waits don't block the main loop.
+
+Jobs run one at a time in submission order so writes to the same file never race,
+when one finishes an IO_JOB_DONE event is posted with its kind, info, result and exception.
+Long jobs can post IO_JOB_PROGRESS events with their kind, info, progress and partial result.
+
+CPU heavy jobs run in their own thread so file operations don't wait for them,
+their results are posted with the same event.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections.abc import Callable
+from typing import Any, Final
+
+import pygame as pg
+from pygame import Event, event
+
+IO_JOB_DONE: Final[int]     = event.custom_type()
+IO_JOB_PROGRESS: Final[int] = event.custom_type()
+
+_EXECUTOR: Final[ThreadPoolExecutor] = ThreadPoolExecutor(1, thread_name_prefix="dixel_io")
+_COMPUTE_EXECUTOR: Final[ThreadPoolExecutor] = ThreadPoolExecutor(
+    1, thread_name_prefix="dixel_compute"
+)
+
+
+def _post_result(kind: int, info: Any, future: Future[Any]) -> None:
+    """
+    Posts the result of a finished job, runs in the background thread.
+
+    Args:
+        kind, info, future
+    """
+
+    result: Any = None
+    exception: Exception | None = None
+    try:
+        result = future.result()
+    except Exception as e:
+        exception = e
+
+    try:
+        event.post(Event(IO_JOB_DONE, {
+            "kind": kind, "info": info, "result": result, "exception": exception,
+        }))
+    except pg.error:  # Display closed while exiting
+        pass
+
+
+def submit_io_job(kind: int, info: Any, func: Callable[..., Any], *args: Any) -> None:
+    """
+    Runs a function in the background thread.
+
+    Args:
+        kind, info passed back in the event, function, arguments
+    """
+
+    future: Future[Any] = _EXECUTOR.submit(func, *args)
+    future.add_done_callback(lambda future: _post_result(kind, info, future))
+
+def submit_compute_job(kind: int, info: Any, func: Callable[..., Any], *args: Any) -> None:
+    """
+    Runs a CPU heavy function in the compute thread, it doesn't delay file operations.
+
+    Args:
+        kind, info passed back in the event, function, arguments
+    """
+
+    future: Future[Any] = _COMPUTE_EXECUTOR.submit(func, *args)
+    future.add_done_callback(lambda future: _post_result(kind, info, future))
+
+
+def post_io_progress(kind: int, info: Any, progress: float, partial_result: Any) -> None:
+    """
+    Posts the progress of a running job, called by the job in the background thread.
+
+    Args:
+        kind, info, progress (0-1), partial result
+    """
+
+    try:
+        event.post(Event(IO_JOB_PROGRESS, {
+            "kind": kind, "info": info, "progress": progress, "partial_result": partial_result,
+        }))
+    except pg.error:  # Display closed while exiting
+        pass
+
+
+def wait_io_jobs() -> None:
+    """Waits for every submitted job, used before synchronous file operations and on exit."""
+
+    # Jobs run in order, when this one runs the previous ones are done
+    _EXECUTOR.submit(lambda: None).result()
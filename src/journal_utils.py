@@ -0,0 +1,302 @@
+"""
+Functions to manage the journals of the grid edits, every open document has its own.
+
+A journal is appended after every edit so a session can be recovered after a hard kill,
+it starts with the file the edits are applied to, then every record has
+grid columns, grid rows, x, y, width, height, compressed size, checksum and compressed pixels.
+"""
+
+from pathlib import Path
+from struct import Struct
+from itertools import count
+from zlib import compress, decompress, crc32
+from typing import TypeAlias, Final
+
+import pygame as pg
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+from src.file_utils import (
+    FileError, handle_file_os_error,
+    try_read_file, try_write_file, try_append_file, try_replace_file, try_remove_file,
+    try_create_dir,
+)
+from src.lock_utils import LockError, try_lock_file
+from src.consts import FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I
+
+JournalRecord: TypeAlias = tuple[int, int, int, int, NDArray[uint32]]
+
+JOURNALS_DIR_PATH: Final[Path] = Path("assets", "data", "journals")
+JOURNAL_MAX_RECORDS: Final[int] = 128
+
+_MAGIC: Final[bytes] = b"DXJ1"
+_HEADER_STRUCT: Final[Struct] = Struct("<4sI")
+_RECORD_STRUCT: Final[Struct] = Struct("<IIIIIIII")
+
+_JOURNAL_IDS: Final[count[int]] = count()
+
+
+def get_new_journal_path() -> Path:
+    """
+    Gets the path of a journal that isn't used, journals of a previous session are skipped.
+
+    Returns:
+        path
+    """
+
+    journal_path: Path = JOURNALS_DIR_PATH / f"{next(_JOURNAL_IDS)}.bin"
+    while journal_path.exists():
+        journal_path = JOURNALS_DIR_PATH / f"{next(_JOURNAL_IDS)}.bin"
+
+    return journal_path
+
+
+def get_journals_paths() -> list[Path]:
+    """
+    Gets the paths of the journals in the journals directory by creation order.
+
+    Returns:
+        paths
+    """
+
+    journal_path: Path
+
+    try:
+        journals_paths: list[Path] = [
+            journal_path for journal_path in JOURNALS_DIR_PATH.glob("*.bin")
+            if journal_path.stem.isdigit()
+        ]
+    except OSError:
+        return []
+
+    return sorted(journals_paths, key=lambda journal_path: int(journal_path.stem))
+
+
+def get_journal_record(tiles: NDArray[uint32], x: int, y: int, w: int, h: int) -> bytes:
+    """
+    Gets the record of an edited section of the tiles.
+
+    Args:
+        tiles, x, y, width, height
+    Returns:
+        record
+    """
+
+    compressed_pixels: bytes = compress(tiles[x:x + w, y:y + h].tobytes(), level=1)
+    return _RECORD_STRUCT.pack(
+        tiles.shape[0], tiles.shape[1], x, y, w, h,
+        len(compressed_pixels), crc32(compressed_pixels)
+    ) + compressed_pixels
+
+
+def _parse_journal(content: bytes) -> tuple[str, list[JournalRecord]] | None:
+    """
+    Parses a journal, a record that was cut while writing ends it.
+
+    Args:
+        content
+    Returns:
+        file string, records (None if it's invalid)
+    """
+
+    magic: bytes
+    file_str_len: int
+    cols: int
+    rows: int
+    x: int
+    y: int
+    w: int
+    h: int
+    compressed_len: int
+    checksum: int
+
+    if len(content) < _HEADER_STRUCT.size:
+        return None
+    magic, file_str_len = _HEADER_STRUCT.unpack_from(content)
+    if magic != _MAGIC:
+        return None
+
+    i: int = _HEADER_STRUCT.size + file_str_len
+    file_str: str = content[_HEADER_STRUCT.size:i].decode("utf-8", errors="ignore")
+
+    records: list[JournalRecord] = []
+    while i + _RECORD_STRUCT.size <= len(content):
+        (
+            cols, rows, x, y, w, h,
+            compressed_len, checksum,
+        ) = _RECORD_STRUCT.unpack_from(content, i)
+        i += _RECORD_STRUCT.size
+
+        compressed_pixels: bytes = content[i:i + compressed_len]
+        if len(compressed_pixels) != compressed_len or crc32(compressed_pixels) != checksum:
+            break
+        i += compressed_len
+
+        pixels: NDArray[uint32] = np.frombuffer(decompress(compressed_pixels), uint32)
+        records.append((cols, rows, x, y, pixels.reshape((w, h))))
+
+    return file_str, records
+
+
+def replay_journal(tiles: NDArray[uint32], records: list[JournalRecord]) -> NDArray[uint32]:
+    """
+    Applies the records of a journal to tiles.
+
+    Args:
+        tiles, records
+    Returns:
+        tiles
+    """
+
+    cols: int
+    rows: int
+    x: int
+    y: int
+    pixels: NDArray[uint32]
+
+    for cols, rows, x, y, pixels in records:
+        if tiles.shape != (cols, rows):
+            resized_tiles: NDArray[uint32] = np.zeros((cols, rows), uint32)
+            common_cols: int = min(cols, tiles.shape[0])
+            common_rows: int = min(rows, tiles.shape[1])
+            resized_tiles[:common_cols, :common_rows] = tiles[:common_cols, :common_rows]
+            tiles = resized_tiles
+        else:
+            tiles = tiles.copy()
+
+        tiles[x:x + pixels.shape[0], y:y + pixels.shape[1]] = pixels
+
+    return tiles
+
+
+def try_read_journal(journal_path: Path) -> tuple[str, list[JournalRecord]] | None:
+    """
+    Reads a journal with retries.
+
+    Args:
+        path
+    Returns:
+        file string, records (None if it's missing or invalid)
+    """
+
+    attempt_i: int
+    _error_str: str
+    should_retry: bool
+
+    content: bytes = b""
+    for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+        try:
+            with journal_path.open("rb") as f:
+                try_lock_file(f, should_be_shared=True)
+                content = try_read_file(f)
+            break
+        except (FileNotFoundError, PermissionError, LockError, FileError):
+            break
+        except OSError as e:
+            _error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            break
+
+    return _parse_journal(content)
+
+
+def try_write_journal(journal_path: Path, file_str: str, records: bytes) -> str | None:
+    """
+    Replaces a journal with a new one with retries.
+
+    Args:
+        path, file string, records
+    Returns:
+        error string (can be None)
+    """
+
+    should_retry: bool
+
+    temp_journal_path: Path = journal_path.with_suffix(".tmp")
+    file_str_bytes: bytes = file_str.encode("utf-8", errors="ignore")
+    journal_bytes: bytes = (
+        _HEADER_STRUCT.pack(_MAGIC, len(file_str_bytes)) + file_str_bytes + records
+    )
+
+    error_str: str | None = None
+    dir_creation_attempt_i: int = FILE_ATTEMPT_START_I
+    system_attempt_i: int       = FILE_ATTEMPT_START_I
+    while (
+        dir_creation_attempt_i <= FILE_ATTEMPT_STOP_I and
+        system_attempt_i       <= FILE_ATTEMPT_STOP_I
+    ):
+        try:
+            # If you open in write mode it will clear the file even if it's locked
+            with temp_journal_path.open("ab") as f:
+                try_lock_file(f, should_be_shared=False)
+                try_write_file(f, journal_bytes)
+            try_replace_file(temp_journal_path, journal_path)
+            error_str = None
+            break
+        except FileNotFoundError:
+            dir_creation_attempt_i += 1
+            error_str = try_create_dir(journal_path.parent, dir_creation_attempt_i)
+            if error_str is not None:
+                break
+        except (PermissionError, LockError, FileError) as e:
+            error_str = {
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+            break
+        except OSError as e:
+            system_attempt_i += 1
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and system_attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** system_attempt_i)
+                continue
+
+            try_remove_file(temp_journal_path)
+            break
+
+    return error_str
+
+
+def try_append_journal(journal_path: Path, record: bytes) -> str | None:
+    """
+    Appends a record to a journal with retries.
+
+    Args:
+        path, record
+    Returns:
+        error string (can be None)
+    """
+
+    attempt_i: int
+    should_retry: bool
+
+    error_str: str | None = None
+    for attempt_i in range(FILE_ATTEMPT_START_I, FILE_ATTEMPT_STOP_I + 1):
+        try:
+            with journal_path.open("ab") as f:
+                try_lock_file(f, should_be_shared=False)
+                try_append_file(f, record)
+            error_str = None
+            break
+        except (FileNotFoundError, PermissionError, LockError, FileError) as e:
+            error_str = {
+                FileNotFoundError: "Directory missing.",
+                PermissionError: "Permission denied.",
+                LockError: "File locked.",
+                FileError: e.error_str if isinstance(e, FileError) else "",
+            }[type(e)]
+            break
+        except OSError as e:
+            error_str, should_retry = handle_file_os_error(e)
+            if should_retry and attempt_i != FILE_ATTEMPT_STOP_I:
+                pg.time.wait(2 ** attempt_i)
+                continue
+
+            break
+
+    return error_str
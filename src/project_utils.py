@@ -0,0 +1,453 @@
+"""
+Functions to read and write dixel projects.
+
+A project starts with two header slots with magic, sequence number, columns, rows, chunk size,
+table offset, info offset, info size and checksum, the valid one with the highest number is used.
+They're followed by the compressed chunks of tiles, the info (view, palette and history)
+and a table with offset, compressed size and checksum of every chunk.
+
+Chunks are compressed independently, saving the same project only appends the changed ones,
+the info and the table, then it writes the other slot,
+a save cut midway leaves the previous header valid.
+It also reads images as tiles for the code that handles both formats.
+"""
+
+import json
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
+from struct import Struct
+from zlib import compress, decompress, crc32, error as ZlibError
+from math import ceil
+from collections.abc import Callable
+from typing import BinaryIO, TypeAlias, Final, Any
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+from src.tiles_utils import get_pil_img_tiles
+from src.file_utils import FileError, try_write_file, try_append_file, try_replace_file
+from src.lock_utils import try_lock_file
+
+_HistorySnapshot: TypeAlias = tuple[int, int, bytes, bytes]
+_ChunkInfo: TypeAlias = tuple[int, int, int]
+# Partially read tiles, read fraction
+ProgressCallback: TypeAlias = Callable[[NDArray[uint32], float], None]
+
+PROJECT_SUFFIX: Final[str] = ".dixel"
+_CHUNK_DIM: Final[int] = 64
+_PROGRESS_NUM_CHUNKS: Final[int] = 64
+
+_MAGIC: Final[bytes] = b"DXP2"
+_HEADER_STRUCT: Final[Struct] = Struct("<4sQIIIQQQI")
+_HEADERS_LEN: Final[int] = 2 * _HEADER_STRUCT.size
+_CHECKSUM_STRUCT: Final[Struct] = Struct("<I")
+# Older projects have one header followed by the table
+_LEGACY_MAGIC: Final[bytes] = b"DXP1"
+_LEGACY_HEADER_STRUCT: Final[Struct] = Struct("<4sIIIQQ")
+_CHUNK_STRUCT: Final[Struct] = Struct("<QII")
+_INFO_LEN_STRUCT: Final[Struct] = Struct("<I")
+
+
+def _get_chunks_xys(cols: int, rows: int) -> list[tuple[int, int]]:
+    """
+    Gets the start of every chunk.
+
+    Args:
+        columns, rows
+    Returns:
+        xys
+    """
+
+    return [
+        (x * _CHUNK_DIM, y * _CHUNK_DIM)
+        for x in range(ceil(cols / _CHUNK_DIM))
+        for y in range(ceil(rows / _CHUNK_DIM))
+    ]
+
+
+def get_project_info_bytes(
+        visible_cols: int, visible_rows: int, offset_x: int, offset_y: int,
+        palette: list[str], history: list[_HistorySnapshot], history_i: int
+) -> bytes:
+    """
+    Gets the info section of a project.
+
+    Args:
+        visible columns, visible rows, x offset, y offset,
+        palette, history, history index
+    Returns:
+        info
+    """
+
+    snapshot: _HistorySnapshot
+
+    info: dict[str, Any] = {
+        "visible_cols": visible_cols,
+        "visible_rows": visible_rows,
+        "offset_x": offset_x,
+        "offset_y": offset_y,
+        "palette": palette,
+        "history_i": history_i,
+        "history": [
+            (snapshot[0], snapshot[1], len(snapshot[2]), len(snapshot[3]))
+            for snapshot in history
+        ],
+    }
+
+    info_bytes: bytes = json.dumps(info).encode("utf-8")
+    history_bytes: bytes = b"".join([snapshot[2] + snapshot[3] for snapshot in history])
+    return _INFO_LEN_STRUCT.pack(len(info_bytes)) + info_bytes + history_bytes
+
+
+def _get_header(content: mmap) -> tuple[int, int, int, int, int, int]:
+    """
+    Gets the valid header slot with the highest sequence number of a project.
+
+    Args:
+        content
+    Returns:
+        sequence number (-1 for older projects), columns, rows, table offset,
+        info offset, info size
+    Raises:
+        FileError: if it's invalid
+    """
+
+    magic: bytes
+    seq: int
+    cols: int
+    rows: int
+    chunk_dim: int
+    table_offset: int
+    info_offset: int
+    info_len: int
+    checksum: int
+    slot_offset: int
+
+    if content[:len(_LEGACY_MAGIC)] == _LEGACY_MAGIC and len(content) >= _LEGACY_HEADER_STRUCT.size:
+        magic, cols, rows, chunk_dim, info_offset, info_len = _LEGACY_HEADER_STRUCT.unpack_from(
+            content
+        )
+        if chunk_dim != _CHUNK_DIM:
+            raise FileError("Invalid project.")
+        return -1, cols, rows, _LEGACY_HEADER_STRUCT.size, info_offset, info_len
+
+    header: tuple[int, int, int, int, int, int] | None = None
+    for slot_offset in range(0, min(len(content), _HEADERS_LEN), _HEADER_STRUCT.size):
+        if slot_offset + _HEADER_STRUCT.size > len(content):
+            break
+
+        (
+            magic, seq, cols, rows, chunk_dim,
+            table_offset, info_offset, info_len, checksum,
+        ) = _HEADER_STRUCT.unpack_from(content, slot_offset)
+        # A slot cut while writing has a wrong checksum
+        checked_bytes: bytes = content[
+            slot_offset:slot_offset + _HEADER_STRUCT.size - _CHECKSUM_STRUCT.size
+        ]
+        if (
+            magic == _MAGIC and chunk_dim == _CHUNK_DIM and crc32(checked_bytes) == checksum and
+            (header is None or seq > header[0])
+        ):
+            header = (seq, cols, rows, table_offset, info_offset, info_len)
+
+    if header is None:
+        raise FileError("Invalid project.")
+    return header
+
+
+def _get_header_and_table(content: mmap) -> tuple[int, int, int, int, int, list[_ChunkInfo]]:
+    """
+    Gets the header and chunks table of a project.
+
+    Args:
+        content
+    Returns:
+        sequence number (-1 for older projects), columns, rows, info offset, info size,
+        chunks table
+    Raises:
+        FileError: if it's invalid
+    """
+
+    seq, cols, rows, table_offset, info_offset, info_len = _get_header(content)
+    num_chunks: int = len(_get_chunks_xys(cols, rows))
+    if (
+        table_offset + (num_chunks * _CHUNK_STRUCT.size) > len(content) or
+        info_offset + info_len > len(content)
+    ):
+        raise FileError("Invalid project.")
+    table: list[_ChunkInfo] = [
+        _CHUNK_STRUCT.unpack_from(content, table_offset + (i * _CHUNK_STRUCT.size))
+        for i in range(num_chunks)
+    ]
+
+    return seq, cols, rows, info_offset, info_len, table
+
+
+def read_project_tiles(
+        f: BinaryIO, on_progress: ProgressCallback | None = None
+) -> NDArray[uint32]:
+    """
+    Reads the tiles of a project, chunks are decompressed directly from the mapped file.
+
+    Args:
+        file, function called every few chunks (default = None)
+    Returns:
+        tiles
+    Raises:
+        FileError: if it's invalid
+    """
+
+    chunk_offset: int
+    compressed_len: int
+    _checksum: int
+    x: int
+    y: int
+    chunk_i: int
+
+    try:
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as content:
+            _seq, cols, rows, _info_offset, _info_len, table = _get_header_and_table(content)
+            # Chunks that aren't read yet are transparent in progress callbacks
+            tiles: NDArray[uint32] = np.zeros((cols, rows), uint32)
+            for chunk_i, ((chunk_offset, compressed_len, _checksum), (x, y)) in enumerate(zip(
+                table, _get_chunks_xys(cols, rows)
+            )):
+                if on_progress is not None and chunk_i % _PROGRESS_NUM_CHUNKS == 0:
+                    on_progress(tiles, chunk_i / len(table))
+
+                chunk_w: int = min(_CHUNK_DIM, cols - x)
+                chunk_h: int = min(_CHUNK_DIM, rows - y)
+                chunk_bytes: bytes = decompress(content[chunk_offset:chunk_offset + compressed_len])
+                tiles[x:x + chunk_w, y:y + chunk_h] = np.frombuffer(chunk_bytes, uint32).reshape(
+                    (chunk_w, chunk_h)
+                )
+    except (ValueError, ZlibError) as e:  # Empty files can't be mapped
+        raise FileError("Invalid project.") from e
+
+    return tiles
+
+
+def read_tiles(file_path: Path, on_progress: ProgressCallback | None = None) -> NDArray[uint32]:
+    """
+    Reads the tiles of an image or project, doesn't need pygame surfaces.
+
+    Images are decoded at once, only projects report their progress.
+
+    Args:
+        path, function called every few project chunks (default = None)
+    Returns:
+        tiles
+    Raises:
+        OSError, LockError, FileError, UnidentifiedImageError: on failure
+    """
+
+    with file_path.open("rb") as f:
+        try_lock_file(f, should_be_shared=True)
+        if file_path.suffix == PROJECT_SUFFIX:
+            return read_project_tiles(f, on_progress)
+
+        from PIL import Image  # Lazy, only needed for images
+
+        img: Image.Image
+        with Image.open(f) as img:
+            return get_pil_img_tiles(img)
+
+
+def read_project_info(f: BinaryIO) -> tuple[dict[str, Any], list[_HistorySnapshot]]:
+    """
+    Reads the info of a project without decompressing the tiles.
+
+    Args:
+        file
+    Returns:
+        info, history
+    Raises:
+        FileError: if it's invalid
+    """
+
+    snapshot_cols: int
+    snapshot_rows: int
+    palette_len: int
+    indexes_len: int
+
+    try:
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as content:
+            _seq, _cols, _rows, info_offset, info_len, _table = _get_header_and_table(content)
+            info_section: bytes = content[info_offset:info_offset + info_len]
+
+        info_bytes_len: int = _INFO_LEN_STRUCT.unpack_from(info_section)[0]
+        i: int = _INFO_LEN_STRUCT.size + info_bytes_len
+        info: dict[str, Any] = json.loads(info_section[_INFO_LEN_STRUCT.size:i])
+
+        history: list[_HistorySnapshot] = []
+        for snapshot_cols, snapshot_rows, palette_len, indexes_len in info["history"]:
+            compressed_palette: bytes = info_section[i:i + palette_len]
+            i += palette_len
+            compressed_indexes: bytes = info_section[i:i + indexes_len]
+            i += indexes_len
+            history.append((snapshot_cols, snapshot_rows, compressed_palette, compressed_indexes))
+    except (ValueError, KeyError, TypeError) as e:  # JSONDecodeError is a ValueError
+        raise FileError("Invalid project.") from e
+
+    return info, history
+
+
+def _try_get_saved_table(
+        file_path: Path, cols: int, rows: int
+) -> tuple[list[_ChunkInfo], int, int] | None:
+    """
+    Gets the chunks table of a saved project if it has the same size.
+
+    Args:
+        path, columns, rows
+    Returns:
+        chunks table, file size, sequence number
+        (None if missing, invalid, older or with a different size)
+    """
+
+    seq: int
+    saved_cols: int
+    saved_rows: int
+    table: list[_ChunkInfo]
+
+    try:
+        with file_path.open("rb") as f:
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as content:
+                (
+                    seq, saved_cols, saved_rows, _info_offset, _info_len, table
+                ) = _get_header_and_table(content)
+                file_size: int = len(content)
+    except (OSError, ValueError, FileError):  # Empty files can't be mapped
+        return None
+
+    is_appendable: bool = seq != -1 and (saved_cols, saved_rows) == (cols, rows)
+    return (table, file_size, seq) if is_appendable else None
+
+
+def _get_chunks_sections(
+        tiles: NDArray[uint32], saved_table: list[_ChunkInfo] | None, end_offset: int
+) -> tuple[list[_ChunkInfo], list[bytes], int]:
+    """
+    Gets the chunks table and the compressed chunks that aren't in the saved table.
+
+    Args:
+        tiles, saved table (None = compress all), end of the saved file
+    Returns:
+        chunks table, compressed chunks, size of the used chunks
+    """
+
+    x: int
+    y: int
+
+    chunks_xys: list[tuple[int, int]] = _get_chunks_xys(tiles.shape[0], tiles.shape[1])
+    table: list[_ChunkInfo] = [] if saved_table is None else saved_table.copy()
+    compressed_chunks: list[bytes] = []
+    used_len: int = 0
+    for i, (x, y) in enumerate(chunks_xys):
+        chunk_bytes: bytes = tiles[x:x + _CHUNK_DIM, y:y + _CHUNK_DIM].tobytes()
+        checksum: int = crc32(chunk_bytes)
+        if saved_table is None or saved_table[i][2] != checksum:
+            compressed_chunk: bytes = compress(chunk_bytes)
+            chunk_info: _ChunkInfo = (end_offset, len(compressed_chunk), checksum)
+            if saved_table is None:
+                table.append(chunk_info)
+            else:
+                table[i] = chunk_info
+            compressed_chunks.append(compressed_chunk)
+            end_offset += len(compressed_chunk)
+        used_len += table[i][1]
+
+    return table, compressed_chunks, used_len
+
+
+def _get_header_bytes(
+        seq: int, cols: int, rows: int, table_offset: int, info_offset: int, info_len: int
+) -> bytes:
+    """
+    Gets a header slot.
+
+    Args:
+        sequence number, columns, rows, table offset, info offset, info size
+    Returns:
+        header slot
+    """
+
+    header_bytes: bytes = _HEADER_STRUCT.pack(
+        _MAGIC, seq, cols, rows, _CHUNK_DIM, table_offset, info_offset, info_len, 0
+    )[:-_CHECKSUM_STRUCT.size]
+    return header_bytes + _CHECKSUM_STRUCT.pack(crc32(header_bytes))
+
+
+def save_project(file_path: Path, tiles: NDArray[uint32], info_bytes: bytes) -> None:
+    """
+    Saves a project, if it has the same size the changed chunks, info and table are appended.
+
+    It's fully rewritten when the unused space (old chunks, infos and tables)
+    gets bigger than the used one.
+
+    Args:
+        path, tiles, info
+    Raises:
+        FileNotFoundError, PermissionError, LockError, FileError, OSError: on failure
+    """
+
+    table: list[_ChunkInfo]
+    compressed_chunks: list[bytes]
+    used_len: int
+    saved_table: list[_ChunkInfo]
+    file_size: int
+    saved_seq: int
+    start_offset: int
+
+    cols: int = tiles.shape[0]
+    rows: int = tiles.shape[1]
+    table_len: int = len(_get_chunks_xys(cols, rows)) * _CHUNK_STRUCT.size
+    seq: int
+
+    saved_table_info: tuple[list[_ChunkInfo], int, int] | None = _try_get_saved_table(
+        file_path, cols, rows
+    )
+    is_appending: bool = saved_table_info is not None
+    if saved_table_info is not None:
+        saved_table, file_size, saved_seq = saved_table_info
+        table, compressed_chunks, used_len = _get_chunks_sections(tiles, saved_table, file_size)
+        start_offset = file_size
+        seq = saved_seq + 1
+
+        end_offset: int = (
+            file_size + sum([len(chunk) for chunk in compressed_chunks]) +
+            len(info_bytes) + table_len
+        )
+        live_len: int = _HEADERS_LEN + used_len + len(info_bytes) + table_len
+        is_appending = end_offset - live_len < live_len
+    if not is_appending:
+        table, compressed_chunks, used_len = _get_chunks_sections(tiles, None, _HEADERS_LEN)
+        start_offset = _HEADERS_LEN
+        seq = 0
+
+    info_offset: int = start_offset + sum([len(chunk) for chunk in compressed_chunks])
+    table_offset: int = info_offset + len(info_bytes)
+    appended_bytes: bytes = b"".join(
+        compressed_chunks + [info_bytes] +
+        [_CHUNK_STRUCT.pack(*chunk_info) for chunk_info in table]
+    )
+    header_bytes: bytes = _get_header_bytes(
+        seq, cols, rows, table_offset, info_offset, len(info_bytes)
+    )
+
+    if is_appending:
+        with file_path.open("r+b") as f:
+            try_lock_file(f, should_be_shared=False)
+            # The new slot is written after what it references is on disk
+            f.seek(start_offset)
+            try_append_file(f, appended_bytes)
+            f.seek((seq % 2) * _HEADER_STRUCT.size)
+            try_append_file(f, header_bytes)
+    else:
+        temp_file_path: Path = Path(str(file_path) + ".tmp")
+        # If you open in write mode it will empty the file even if it's locked
+        with temp_file_path.open("ab") as f:
+            try_lock_file(f, should_be_shared=False)
+            try_write_file(f, header_bytes + bytes(_HEADER_STRUCT.size) + appended_bytes)
+        try_replace_file(temp_file_path, file_path)
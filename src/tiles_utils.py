@@ -0,0 +1,363 @@
+"""
+Functions to transform, encode and decode tiles without the UI.
+
+Tiles are packed colors with shape (columns, rows), the same layout of the grid,
+these functions don't need pygame so they're also used by the batch mode and the canvas.
+"""
+
+from io import BytesIO
+from typing import TYPE_CHECKING, TypeAlias, Final, Any
+
+import numpy as np
+from numpy import uint8, uint16, uint32, int32, intp, float32, bool_, newaxis
+from numpy.typing import NDArray
+
+from src.type_utils import HexColor
+
+if TYPE_CHECKING:  # PIL is imported by the functions that need it
+    from PIL import Image
+
+_IndexesDtype: TypeAlias = type[uint8] | type[uint16] | type[uint32]
+
+SAVE_MODE_FAST: Final[int]     = 0
+SAVE_MODE_DEFAULT: Final[int]  = 1
+SAVE_MODE_ARCHIVAL: Final[int] = 2
+
+_QUANTIZE_CHUNK_MAX_SIZE: Final[int] = 1_048_576
+_KMEANS_MAX_SAMPLES: Final[int]      = 65_536
+
+
+def get_rgba_view(packed_pixels: NDArray[uint32]) -> NDArray[uint8]:
+    """
+    Gets the rgba values of packed pixels without copying.
+
+    Args:
+        packed pixels
+    Returns:
+        pixels
+    """
+
+    return packed_pixels[..., newaxis].view(uint8)
+
+def get_indexes_dtype(num_colors: int) -> _IndexesDtype:
+    """
+    Gets the smallest type that can index a palette.
+
+    Args:
+        number of colors
+    Returns:
+        type
+    """
+
+    if num_colors <= 256:
+        return uint8
+    if num_colors <= 65_536:
+        return uint16
+    return uint32
+
+def get_indexed_tiles(tiles: NDArray[uint32]) -> tuple[NDArray[uint32], NDArray[uint8]]:
+    """
+    Splits tiles into their packed colors and the index of every tile in them.
+
+    Args:
+        tiles
+    Returns:
+        palette, indexes (uint8, uint16 or uint32 depending on the number of colors)
+    """
+
+    palette: NDArray[uint32]
+    indexes: NDArray[intp]
+
+    palette, indexes = np.unique(tiles.ravel(), return_inverse=True)
+    indexes_dtype: _IndexesDtype = get_indexes_dtype(palette.size)
+    return palette, indexes.astype(indexes_dtype).reshape(tiles.shape)
+
+
+def get_pil_img_tiles(img: "Image.Image") -> NDArray[uint32]:
+    """
+    Gets the tiles of a PIL image.
+
+    Args:
+        image
+    Returns:
+        tiles
+    """
+
+    rgba_pixels: NDArray[uint8] = np.asarray(img.convert("RGBA")).transpose((1, 0, 2))
+    return np.ascontiguousarray(rgba_pixels).view(uint32)[..., 0]
+
+def _get_pil_img(
+        tiles: NDArray[uint32], should_index: bool
+) -> tuple["Image.Image", bytes | None]:
+    """
+    Creates a PIL image from tiles, palette indexed if it has at most 256 colors.
+
+    Args:
+        tiles, index flag
+    Returns:
+        image, alpha of every palette color (None if not indexed or fully opaque)
+    """
+
+    palette: NDArray[uint32]
+    indexes: NDArray[uint8]
+
+    from PIL import Image  # Lazy, only needed to encode
+
+    if should_index:
+        palette, indexes = get_indexed_tiles(tiles)
+        if palette.size <= 256:
+            rgba_palette: NDArray[uint8] = get_rgba_view(palette)
+            img: Image.Image = Image.fromarray(np.ascontiguousarray(indexes.T))
+            img.putpalette(rgba_palette[:, :3].tobytes(), "RGB")
+
+            alphas: NDArray[uint8] = rgba_palette[:, 3]
+            return img, None if (alphas == 255).all() else alphas.tobytes()
+
+    rgba_tiles: NDArray[uint8] = get_rgba_view(tiles).transpose((1, 0, 2))
+    return Image.fromarray(np.ascontiguousarray(rgba_tiles)), None
+
+def get_img_bytes(tiles: NDArray[uint32], img_format: str, save_mode: int) -> bytes:
+    """
+    Encodes tiles as an image, PNGs with at most 256 colors are palette indexed.
+
+    Fast mode lowers the compression and archival mode optimizes it.
+
+    Args:
+        tiles, format (e.g. png), save mode
+    Returns:
+        image bytes
+    """
+
+    img: Image.Image
+    transparency: bytes | None
+
+    img_format = img_format.lower()
+    img, transparency = _get_pil_img(tiles, should_index=img_format == "png")
+
+    save_kwargs: dict[str, Any] = {}
+    if img_format == "png":
+        if transparency is not None:
+            save_kwargs["transparency"] = transparency
+        if save_mode == SAVE_MODE_FAST:
+            save_kwargs["compress_level"] = 1
+        elif save_mode == SAVE_MODE_ARCHIVAL:
+            save_kwargs["optimize"] = True
+    elif img_format == "webp":
+        save_kwargs["lossless"] = True
+        save_kwargs["method"] = {
+            SAVE_MODE_FAST: 0, SAVE_MODE_DEFAULT: 4, SAVE_MODE_ARCHIVAL: 6,
+        }[save_mode]
+
+    dummy_file: BytesIO = BytesIO()
+    img.save(dummy_file, img_format, **save_kwargs)
+    return dummy_file.getvalue()
+
+
+def crop_tiles(tiles: NDArray[uint32]) -> NDArray[uint32]:
+    """
+    Removes the transparent padding of tiles without copying.
+
+    Args:
+        tiles
+    Returns:
+        tiles (1x1 if they're all transparent)
+    """
+
+    left: intp
+    right: intp
+    top: intp
+    bottom: intp
+
+    colored_tiles_indexes: NDArray[intp] = np.argwhere(get_rgba_view(tiles)[..., 3] != 0)
+    if colored_tiles_indexes.size == 0:
+        left  = top    = intp(0)
+        right = bottom = intp(1)
+    else:
+        left , top    = colored_tiles_indexes.min(0)
+        right, bottom = colored_tiles_indexes.max(0) + 1
+
+    return tiles[left:right, top:bottom]
+
+def rotate_tiles(tiles: NDArray[uint32], num_turns: int) -> NDArray[uint32]:
+    """
+    Rotates tiles clockwise by 90 degrees a number of times.
+
+    Args:
+        tiles, number of turns
+    Returns:
+        tiles
+    """
+
+    # Tiles are indexed by column first, rotating them counterclockwise rotates the image clockwise
+    return np.ascontiguousarray(np.rot90(tiles, num_turns % 4))
+
+def resize_tiles(tiles: NDArray[uint32], cols: int, rows: int) -> NDArray[uint32]:
+    """
+    Resizes the canvas of tiles, cropping or padding with transparent tiles from the top left.
+
+    Args:
+        tiles, columns, rows
+    Returns:
+        tiles
+    """
+
+    resized_tiles: NDArray[uint32] = np.zeros((cols, rows), uint32)
+    common_cols: int = min(cols, tiles.shape[0])
+    common_rows: int = min(rows, tiles.shape[1])
+    resized_tiles[:common_cols, :common_rows] = tiles[:common_cols, :common_rows]
+    return resized_tiles
+
+def _get_hex_colors(rgbs: NDArray[uint8]) -> list[HexColor]:
+    """
+    Gets the hexadecimal colors of rgb values.
+
+    Args:
+        rgb values
+    Returns:
+        hexadecimal colors
+    """
+
+    rgbs_hex: str = np.ascontiguousarray(rgbs).tobytes().hex()
+    return [rgbs_hex[i:i + 6] for i in range(0, len(rgbs_hex), 6)]
+
+def _get_visible_rgbs(tiles: NDArray[uint32]) -> NDArray[uint32]:
+    """
+    Gets the packed colors of the visible tiles without the alpha.
+
+    Args:
+        tiles
+    Returns:
+        packed colors
+    """
+
+    rgb_mask: uint32 = np.array((255, 255, 255, 0), uint8).view(uint32)[0]
+    return tiles[get_rgba_view(tiles)[..., 3] != 0] & rgb_mask
+
+def get_tiles_palette(
+        tiles: NDArray[uint32], max_size: int, should_sort_by_hue: bool
+) -> list[HexColor]:
+    """
+    Gets the colors of the visible tiles ignoring the alpha, the most used first.
+
+    If there are more colors than the maximum size the least used ones are dropped.
+
+    Args:
+        tiles, maximum size, sort by hue flag (grays first by lightness)
+    Returns:
+        hexadecimal colors
+    """
+
+    colors: NDArray[uint32]
+    counts: NDArray[intp]
+
+    colors, counts = np.unique(_get_visible_rgbs(tiles), return_counts=True)
+    if colors.size > max_size:
+        most_used_indexes: NDArray[intp] = np.argpartition(-counts, max_size - 1)[:max_size]
+        colors, counts = colors[most_used_indexes], counts[most_used_indexes]
+    colors = colors[np.lexsort((colors, -counts))]  # Ties are sorted by color
+
+    rgbs: NDArray[uint8] = get_rgba_view(colors)[:, :3]
+    if should_sort_by_hue:
+        float_rgbs: NDArray[np.float64] = rgbs.astype(np.float64)
+        r, g, b = float_rgbs[:, 0], float_rgbs[:, 1], float_rgbs[:, 2]
+        max_values: NDArray[np.float64] = float_rgbs.max(1)
+        deltas: NDArray[np.float64] = max_values - float_rgbs.min(1)
+        safe_deltas: NDArray[np.float64] = np.where(deltas == 0, 1, deltas)
+
+        hues: NDArray[np.float64] = np.select(
+            (max_values == r, max_values == g),
+            (((g - b) / safe_deltas) % 6, (b - r) / safe_deltas + 2),
+            (r - g) / safe_deltas + 4
+        )
+        hues[deltas == 0] = -1  # Grays
+        rgbs = rgbs[np.lexsort((float_rgbs.sum(1), hues))]
+
+    return _get_hex_colors(rgbs)
+
+def get_kmeans_palette(tiles: NDArray[uint32], num_colors: int) -> list[HexColor]:
+    """
+    Gets a palette for the visible tiles with k-means, the centers of the biggest clusters first.
+
+    The colors of the tiles are kept if they're at most the number of colors,
+    big images are sampled so the time doesn't depend on their size.
+
+    Args:
+        tiles, number of colors
+    Returns:
+        hexadecimal colors
+    """
+
+    _compactness: float
+    labels: NDArray[int32]
+    centers: NDArray[float32]
+
+    visible_rgbs: NDArray[uint32] = _get_visible_rgbs(tiles)
+    sampled_rgbs: NDArray[uint32] = visible_rgbs
+    if visible_rgbs.size > _KMEANS_MAX_SAMPLES:
+        # Sampling tiles instead of colors keeps the weight of the most used ones
+        sampled_rgbs = np.random.default_rng(0).choice(visible_rgbs, _KMEANS_MAX_SAMPLES)
+
+    colors: NDArray[uint32] = np.unique(sampled_rgbs)
+    if colors.size <= num_colors:
+        colors = np.unique(visible_rgbs)  # The sample can miss some
+        if colors.size <= num_colors:
+            return _get_hex_colors(get_rgba_view(colors)[:, :3])
+
+    import cv2  # Lazy, only needed to reduce the colors
+
+    samples: NDArray[float32] = get_rgba_view(sampled_rgbs)[:, :3].astype(float32)
+
+    cv2.setRNGSeed(0)  # Same palette for the same tiles
+    _compactness, labels, centers = cv2.kmeans(
+        samples, num_colors, None,
+        (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_MAX_ITER, 16, 1.0),
+        1, cv2.KMEANS_PP_CENTERS
+    )
+    clusters_sizes: NDArray[intp] = np.bincount(labels.ravel(), minlength=num_colors)
+    rgbs: NDArray[uint8] = np.rint(centers).clip(0, 255).astype(uint8)
+    rgbs = rgbs[np.argsort(-clusters_sizes, kind="stable")]
+
+    return list(dict.fromkeys(_get_hex_colors(rgbs)))  # Rounded centers can be equal
+
+def quantize_tiles(tiles: NDArray[uint32], hex_colors: list[HexColor]) -> NDArray[uint32]:
+    """
+    Replaces the color of every visible tile with the nearest one of a palette, keeps the alpha.
+
+    Distances are computed once for every unique color, in chunks to limit the memory.
+
+    Args:
+        tiles, palette
+    Returns:
+        tiles
+    """
+
+    hex_color: HexColor
+    colors: NDArray[uint32]
+    indexes: NDArray[uint8]
+    start_i: int
+
+    if hex_colors == []:
+        return tiles.copy()
+
+    palette_rgbs: NDArray[uint8] = np.array(
+        [tuple(bytes.fromhex(hex_color[:6])) for hex_color in hex_colors], uint8
+    )
+    colors, indexes = get_indexed_tiles(tiles)
+    rgba_colors: NDArray[uint8] = get_rgba_view(colors).copy()
+    visible_mask: NDArray[bool_] = rgba_colors[:, 3] != 0
+    visible_rgbs: NDArray[float32] = rgba_colors[visible_mask, :3].astype(float32)
+
+    # |color - palette color|^2 without |color|^2, the same for every palette color,
+    # float32 is exact because the values are below 2^24
+    float_palette_rgbs: NDArray[float32] = palette_rgbs.astype(float32)
+    palette_norms: NDArray[float32] = (float_palette_rgbs * float_palette_rgbs).sum(1)
+    nearest_indexes: NDArray[intp] = np.empty(visible_rgbs.shape[0], intp)
+    chunk_size: int = max(_QUANTIZE_CHUNK_MAX_SIZE // len(hex_colors), 1)
+    for start_i in range(0, visible_rgbs.shape[0], chunk_size):
+        dists: NDArray[float32] = (
+            palette_norms - 2 * (visible_rgbs[start_i:start_i + chunk_size] @ float_palette_rgbs.T)
+        )
+        nearest_indexes[start_i:start_i + chunk_size] = dists.argmin(1)
+    rgba_colors[visible_mask, :3] = palette_rgbs[nearest_indexes]
+
+    return rgba_colors.view(uint32)[..., 0][indexes]
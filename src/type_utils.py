@@ -1,9 +1,10 @@
 """Types shared between files."""
 
 from dataclasses import dataclass
-from typing import Literal, TypeAlias, Any
+from typing import TYPE_CHECKING, Literal, TypeAlias, Any
 
-from pygame import Surface, Rect
+if TYPE_CHECKING:  # Importable without pygame
+    from pygame import Surface, Rect
 
 XY: TypeAlias = tuple[int, int]
 WH: TypeAlias = tuple[int, int]
@@ -16,7 +17,7 @@ CoordType: TypeAlias = Literal[
 
 DropdownOptionsInfo: TypeAlias = tuple[tuple[str, str, Any], ...]
 
-BlitInfo: TypeAlias = tuple[Surface, Rect, int]
+BlitInfo: TypeAlias = tuple["Surface", "Rect", int]
 
 
 @dataclass(slots=True)
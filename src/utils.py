@@ -1,20 +1,27 @@
 """Functions shared between files."""
 
 from collections.abc import Callable
-from typing import Any
+from typing import Final, Any
 
 import pygame as pg
 import numpy as np
-from pygame import Color, Surface, Rect, draw, surfarray, transform
-from numpy import uint8
+from pygame import Color, Surface, Rect, draw, surfarray, transform, SRCALPHA
+from numpy import uint8, uint32
 from numpy.typing import NDArray
 
+from src.tiles_utils import get_rgba_view
+from src.type_utils import WH
 from src.consts import BLACK, EMPTY_TILE_ARR, TILE_W, TILE_H
 
 _FUNCS_NAMES: tuple[str, ...]       = ()
 _FUNCS_TOT_TIMES: tuple[float, ...] = ()
 _FUNCS_NUM_CALLS: tuple[int, ...]   = ()
 
+# Least recently used first, the source images are kept alive until they're evicted,
+# only long lived images like the sprites should use it
+_SCALED_IMGS_CACHE: Final[dict[tuple[Surface, WH], Surface]] = {}
+_SCALED_IMGS_CACHE_MAX_SIZE: Final[int] = 512
+
 
 def profile(func: Callable[..., Any]) -> Callable[..., Any]:
     """Decorator to time the average runtime of a function."""
@@ -93,6 +100,49 @@ def get_pixels(img: Surface) -> NDArray[uint8]:
     return np.dstack((surfarray.pixels3d(img), surfarray.pixels_alpha(img)))
 
 
+def get_packed_pixels(img: Surface) -> NDArray[uint32]:
+    """
+    Gets the rgba values of the pixels in an image packed as a uint32.
+
+    Args:
+        image
+    Returns:
+        pixels
+    """
+
+    return get_pixels(img).view(uint32)[..., 0]
+
+
+def get_img(packed_pixels: NDArray[uint32]) -> Surface:
+    """
+    Creates an image from packed pixels.
+
+    Args:
+        packed pixels
+    Returns:
+        image
+    """
+
+    rgba_pixels: NDArray[uint8] = get_rgba_view(packed_pixels)
+    img: Surface = Surface((packed_pixels.shape[0], packed_pixels.shape[1]), SRCALPHA)
+    surfarray.blit_array(img, rgba_pixels[..., :3])
+    surfarray.pixels_alpha(img)[...] = rgba_pixels[..., 3]
+    return img
+
+
+def pack_color(color: Color) -> uint32:
+    """
+    Packs an rgba color as a uint32 that can be compared with packed pixels.
+
+    Args:
+        color
+    Returns:
+        packed color
+    """
+
+    return np.array(color, uint8).view(uint32)[0]
+
+
 def add_border(img: Surface, border_color: Color) -> Surface:
     """
     Adds a border to an image.
@@ -107,3 +157,26 @@ def add_border(img: Surface, border_color: Color) -> Surface:
     smallest_dim: int = min(new_img.get_size())
     draw.rect(new_img, border_color, new_img.get_rect(), width=round(smallest_dim / 10))
     return new_img
+
+
+def get_scaled_img(img: Surface, wh: WH) -> Surface:
+    """
+    Gets a scaled copy of a long lived image from the cache, it shouldn't be modified.
+
+    Images created often should be scaled with transform.scale, they would evict the others.
+
+    Args:
+        image (shouldn't be modified after), size
+    Returns:
+        image
+    """
+
+    key: tuple[Surface, WH] = (img, wh)
+    if key in _SCALED_IMGS_CACHE:
+        _SCALED_IMGS_CACHE[key] = _SCALED_IMGS_CACHE.pop(key)  # Moves it to the end
+        return _SCALED_IMGS_CACHE[key]
+
+    if len(_SCALED_IMGS_CACHE) == _SCALED_IMGS_CACHE_MAX_SIZE:
+        del _SCALED_IMGS_CACHE[next(iter(_SCALED_IMGS_CACHE))]
+    _SCALED_IMGS_CACHE[key] = transform.scale(img, wh).convert()
+    return _SCALED_IMGS_CACHE[key]
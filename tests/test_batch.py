@@ -0,0 +1,140 @@
+"""Tests for the batch file."""
+
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from struct import pack
+from zlib import crc32
+from typing import Self
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+from src.batch import BatchOptions, _parse_options, _process_file
+from src.project_utils import read_tiles
+from src.tiles_utils import SAVE_MODE_DEFAULT, SAVE_MODE_FAST, get_img_bytes, rotate_tiles
+from src.file_utils import FileError
+
+
+def _get_options(**kwargs: object) -> BatchOptions:
+    """
+    Gets options that change nothing, with some values replaced.
+
+    Args:
+        values
+    Returns:
+        options
+    """
+
+    options: BatchOptions = BatchOptions(
+        should_crop=False, num_turns=0, canvas_wh=None, num_colors=None, hex_colors=None,
+        img_format=None, out_dir_path=None, save_mode=SAVE_MODE_DEFAULT
+    )
+    for name, value in kwargs.items():
+        setattr(options, name, value)
+
+    return options
+
+
+def _get_empty_png(w: int, h: int) -> bytes:
+    """
+    Gets a PNG with a size and no pixels.
+
+    Args:
+        width, height
+    Returns:
+        bytes
+    """
+
+    chunk_type: bytes
+    chunk_data: bytes
+
+    png_bytes: bytes = b"\x89PNG\r\n\x1a\n"
+    for chunk_type, chunk_data in (
+        (b"IHDR", pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)), (b"IDAT", b""), (b"IEND", b""),
+    ):
+        png_bytes += pack(">I", len(chunk_data)) + chunk_type + chunk_data
+        png_bytes += pack(">I", crc32(chunk_type + chunk_data))
+
+    return png_bytes
+
+
+class TestBatch(TestCase):
+    """Tests for the batch file."""
+
+    def test_parse_options(self: Self) -> None:
+        """Tests the _parse_options function, includes invalid flags and the palette."""
+
+        options: BatchOptions
+        files_strs: list[str]
+        num_jobs: int | None
+
+        options, files_strs, num_jobs = _parse_options([
+            "--batch", "--CROP", "--rotate=-1", "--resize=4X3", "--colors=2", "--format=.WEBP",
+            "--out-dir=out", "--fast", "--jobs=2", "a.png", "--", "--b.png",
+        ])
+        self.assertListEqual(files_strs, ["a.png", "--b.png"])
+        self.assertEqual(num_jobs, 2)
+        self.assertEqual(options, _get_options(
+            should_crop=True, num_turns=3, canvas_wh=(4, 3), num_colors=2,
+            img_format="webp", out_dir_path=Path("out"), save_mode=SAVE_MODE_FAST
+        ))
+
+        self.assertIsNone(_parse_options(["a.png"])[2])
+        for arg in ("--resize=0x1", "--colors=0", "--jobs=-1", "--rotate=a", "--unknown"):
+            with self.assertRaises(ValueError, msg=arg):
+                _parse_options([arg])
+
+        with TemporaryDirectory() as dir_str:
+            palette_path: Path = Path(dir_str, "palette.json")
+            palette_path.write_text('{"colors": ["ff0000", "00ff00"]}')
+            options = _parse_options([f"--palette={palette_path}"])[0]
+            self.assertListEqual(options.hex_colors, ["ff0000", "00ff00"])  # type: ignore[arg-type]
+
+            palette_path.write_text("{")
+            with self.assertRaises(FileError):
+                _parse_options([f"--palette={palette_path}"])
+
+    def test_process_file(self: Self) -> None:
+        """Tests the _process_file function, includes the operations order and failures."""
+
+        out_file_str: str
+        wh: tuple[int, int]
+        error_str: str | None
+
+        tiles: NDArray[uint32] = np.zeros((4, 2), uint32)
+        tiles[1, 0], tiles[1, 1], tiles[2, 1] = 0xFF0000FF, 0xFF00FF00, 0xFFFF0000
+        with TemporaryDirectory() as dir_str:
+            dir_path: Path = Path(dir_str)
+            (dir_path / "a.png").write_bytes(get_img_bytes(tiles, "png", SAVE_MODE_DEFAULT))
+            (dir_path / "out").mkdir()  # Created by run_batch
+
+            out_file_str, wh, _secs, error_str = _process_file(
+                str(dir_path / "a.png"),
+                _get_options(should_crop=True, num_turns=1, out_dir_path=dir_path / "out")
+            )
+            self.assertIsNone(error_str)
+            self.assertEqual(out_file_str, str(dir_path / "out" / "a.png"))
+            self.assertTupleEqual(wh, (2, 2))
+            np.testing.assert_array_equal(
+                read_tiles(dir_path / "out" / "a.png"), rotate_tiles(tiles[1:3], 1)
+            )
+
+            out_file_str, wh, _secs, error_str = _process_file(
+                str(dir_path / "missing.png"), _get_options()
+            )
+            self.assertEqual(error_str, "File missing.")
+            self.assertTupleEqual(wh, (0, 0))
+
+            (dir_path / "invalid.png").write_bytes(b"invalid")
+            error_str = _process_file(str(dir_path / "invalid.png"), _get_options())[3]
+            self.assertEqual(error_str, "Invalid image.")
+
+            (dir_path / "bomb.png").write_bytes(_get_empty_png(20_000, 20_000))
+            error_str = _process_file(str(dir_path / "bomb.png"), _get_options())[3]
+            self.assertEqual(error_str, "Image too big.")
+
+            error_str = _process_file(str(dir_path / "a.png"), _get_options(img_format="abc"))[3]
+            self.assertEqual(error_str, "Unsupported format.")
+            self.assertFalse((dir_path / "a.abc.tmp").exists())
@@ -0,0 +1,260 @@
+"""Tests for the canvas file."""
+
+from unittest import TestCase
+from typing import Self
+
+import numpy as np
+from numpy import uint8, uint32, int32, intp, bool_
+from numpy.typing import NDArray
+
+from src.canvas import (
+    SYMMETRY_NONE, SYMMETRY_DIAGONAL, SYMMETRY_RADIAL_4, SYMMETRY_RADIAL_8,
+    Canvas,
+    get_snapshot, get_snapshot_tiles, get_tiles_in_line, get_brush_kernel, get_img_brush_kernel,
+    stamp_brush, get_symmetry_maps, get_symmetric_tiles, _get_snapshot_indexes,
+)
+
+
+def _get_selected_xys(canvas: Canvas) -> set[tuple[int, int]]:
+    """
+    Gets the coordinates of the selected tiles.
+
+    Args:
+        canvas
+    Returns:
+        coordinates
+    """
+
+    return {(int(x), int(y)) for x, y in zip(*np.nonzero(canvas.selected_tiles))}
+
+
+class TestCanvas(TestCase):
+    """Tests for the canvas file."""
+
+    def test_get_tiles_in_line(self: Self) -> None:
+        """Tests the get_tiles_in_line function."""
+
+        self.assertListEqual(get_tiles_in_line(1, 1, 1, 1).tolist(), [[1, 1]])
+        self.assertListEqual(
+            get_tiles_in_line(0, 0, 3, 0).tolist(), [[0, 0], [1, 0], [2, 0], [3, 0]]
+        )
+        self.assertListEqual(get_tiles_in_line(2, 2, 0, 0).tolist(), [[2, 2], [1, 1], [0, 0]])
+
+    def test_stamp_brush(self: Self) -> None:
+        """Tests the stamp_brush function, includes brushes cut by the edges."""
+
+        selected_tiles: NDArray[bool_] = np.zeros((5, 5), bool_)
+        xs: NDArray[int32] = np.array((0,), int32)
+        ys: NDArray[int32] = np.array((0,), int32)
+        section: tuple[int, int, int, int] = stamp_brush(
+            selected_tiles, xs, ys, get_brush_kernel(3, False)
+        )
+        self.assertTupleEqual(section, (0, 0, 2, 2))
+        self.assertEqual(int(selected_tiles.sum()), 4)
+        self.assertTrue(selected_tiles[:2, :2].all())
+
+        # Even brushes extend to the top left
+        selected_tiles.fill(False)
+        xs, ys = np.array((2, 4), int32), np.array((2, 2), int32)
+        stamp_brush(selected_tiles, xs, ys, get_brush_kernel(2, False))
+        self.assertEqual(int(selected_tiles.sum()), 8)
+        self.assertTrue(selected_tiles[1:5, 1:3].all())
+
+        selected_tiles.fill(False)
+        xs, ys = np.array((2,), int32), np.array((2,), int32)
+        stamp_brush(selected_tiles, xs, ys, get_brush_kernel(5, True))
+        np.testing.assert_array_equal(selected_tiles, get_brush_kernel(5, True).view(bool_))
+        self.assertFalse(selected_tiles[0, 0])
+        self.assertTrue(selected_tiles[2, 0])
+
+    def test_get_img_brush_kernel(self: Self) -> None:
+        """Tests the get_img_brush_kernel function, includes a stamp of an asymmetric brush."""
+
+        tiles: NDArray[uint32] = np.zeros((5, 4), uint32)
+        tiles[1, 1] = tiles[2, 1] = tiles[1, 2] = 0xFF000000
+        tiles[2, 2] = 0x00FFFFFF  # Invisible
+        brush_kernel: NDArray[uint8] = get_img_brush_kernel(tiles)
+        self.assertListEqual(brush_kernel.tolist(), [[1, 1], [1, 0]])
+        self.assertFalse(get_img_brush_kernel(np.zeros((2, 2), uint32)).any())
+
+        selected_tiles: NDArray[bool_] = np.zeros((4, 4), bool_)
+        xs: NDArray[int32] = np.array((2,), int32)
+        ys: NDArray[int32] = np.array((2,), int32)
+        stamp_brush(selected_tiles, xs, ys, brush_kernel)
+        self.assertSetEqual(
+            {(int(x), int(y)) for x, y in zip(*np.nonzero(selected_tiles))},
+            {(1, 1), (2, 1), (1, 2)}
+        )
+
+    def test_get_symmetric_tiles(self: Self) -> None:
+        """Tests the get_symmetric_tiles function with every symmetry."""
+
+        xs: NDArray[intp]
+        ys: NDArray[intp]
+
+        symmetric_xys: set[tuple[int, int]]
+
+        start_xs: NDArray[intp] = np.array((0,), intp)
+        start_ys: NDArray[intp] = np.array((1,), intp)
+        maps = get_symmetry_maps(4, 4)
+
+        xs, ys = get_symmetric_tiles(start_xs, start_ys, maps, False, False, SYMMETRY_NONE)
+        self.assertSetEqual(set(zip(xs.tolist(), ys.tolist())), {(0, 1)})
+        xs, ys = get_symmetric_tiles(start_xs, start_ys, maps, True, True, SYMMETRY_NONE)
+        symmetric_xys = set(zip(xs.tolist(), ys.tolist()))
+        self.assertSetEqual(symmetric_xys, {(0, 1), (3, 1), (0, 2), (3, 2)})
+        xs, ys = get_symmetric_tiles(start_xs, start_ys, maps, False, False, SYMMETRY_DIAGONAL)
+        self.assertSetEqual(set(zip(xs.tolist(), ys.tolist())), {(0, 1), (1, 0)})
+        xs, ys = get_symmetric_tiles(start_xs, start_ys, maps, False, False, SYMMETRY_RADIAL_4)
+        symmetric_xys = set(zip(xs.tolist(), ys.tolist()))
+        self.assertSetEqual(symmetric_xys, {(0, 1), (2, 0), (3, 2), (1, 3)})
+        xs, ys = get_symmetric_tiles(start_xs, start_ys, maps, False, False, SYMMETRY_RADIAL_8)
+        self.assertEqual(len(set(zip(xs.tolist(), ys.tolist()))), 8)
+
+        # Tiles outside the centered square have no diagonal
+        xs, ys = get_symmetric_tiles(
+            start_xs, start_ys, get_symmetry_maps(4, 2), False, False, SYMMETRY_DIAGONAL
+        )
+        self.assertSetEqual(set(zip(xs.tolist(), ys.tolist())), {(0, 1)})
+
+    def test_select_brush_line(self: Self) -> None:
+        """Tests the select_brush_line method, includes ends outside the tiles and symmetry."""
+
+        canvas: Canvas = Canvas(5, 5)
+        canvas.select_brush_line(
+            -3, 0, 9, 0, get_brush_kernel(1, False), (False, False, SYMMETRY_NONE)
+        )
+        self.assertSetEqual(_get_selected_xys(canvas), {(x, 0) for x in range(5)})
+
+        canvas.selected_tiles.fill(False)
+        canvas.select_brush_line(
+            0, 0, 0, 0, get_brush_kernel(1, False), (True, True, SYMMETRY_NONE)
+        )
+        self.assertSetEqual(_get_selected_xys(canvas), {(0, 0), (4, 0), (0, 4), (4, 4)})
+
+    def test_select_rect(self: Self) -> None:
+        """Tests the select_rect method, includes corners outside the tiles."""
+
+        canvas: Canvas = Canvas(6, 6)
+        canvas.select_rect(4, 4, 1, 1, 1, False, (False, False, SYMMETRY_NONE))
+        self.assertEqual(len(_get_selected_xys(canvas)), 12)
+        self.assertFalse(canvas.selected_tiles[2:4, 2:4].any())
+
+        canvas.selected_tiles.fill(False)
+        canvas.select_rect(1, 1, 1, 1, 3, True, (False, False, SYMMETRY_NONE))
+        self.assertTrue(canvas.selected_tiles[1:4, 1:4].all())
+        self.assertEqual(len(_get_selected_xys(canvas)), 9)
+
+        # Negative starts don't wrap around
+        canvas.selected_tiles.fill(False)
+        canvas.select_rect(-1, -1, -1, -1, 2, False, (False, False, SYMMETRY_NONE))
+        self.assertSetEqual(_get_selected_xys(canvas), {(0, 0)})
+
+        canvas.selected_tiles.fill(False)
+        canvas.select_rect(0, 0, 0, 0, 1, True, (True, False, SYMMETRY_NONE))
+        self.assertSetEqual(_get_selected_xys(canvas), {(0, 0), (5, 0)})
+
+    def test_get_region(self: Self) -> None:
+        """Tests the get_region method, includes the cache invalidation."""
+
+        canvas: Canvas = Canvas(4, 4)
+        canvas.tiles[2, :] = 1
+
+        region: NDArray[bool_] = canvas.get_region(0, 0, False)
+        self.assertTrue(region[:2].all())
+        self.assertFalse(region[2:].any())
+        canvas.tiles[0, 0] = 2  # Not a draw, the version is unchanged so the cache is stale
+        self.assertTrue(canvas.get_region(0, 1, False)[0, 0])
+
+        canvas.selected_tiles[1, 0] = True
+        canvas.draw(uint32(2))
+        region = canvas.get_region(0, 1, False)
+        self.assertFalse(region[0, 0])
+        self.assertFalse(region[1, 0])
+        self.assertTrue(region[1, 1])
+        self.assertFalse(region[3, 0])
+        self.assertTrue(canvas.get_region(0, 1, True)[3, 0])
+
+    def test_select_region(self: Self) -> None:
+        """Tests the select_region and add_to_selection methods."""
+
+        canvas: Canvas = Canvas(3, 3)
+        canvas.tiles[1, :] = 1
+        region: NDArray[bool_] = canvas.select_region(2, 0, False)
+        np.testing.assert_array_equal(canvas.selected_tiles, region)
+        self.assertEqual(int(region.sum()), 3)
+
+        canvas.add_to_selection(region)
+        canvas.selected_tiles.fill(True)
+        canvas.limit_to_selection()
+        np.testing.assert_array_equal(canvas.selected_tiles, region)
+
+        canvas.add_to_selection(canvas.get_region(1, 0, False))
+        self.assertIsNotNone(canvas.selection)
+        self.assertEqual(int(canvas.selection.sum()), 6)  # type: ignore[union-attr]
+
+    def test_history(self: Self) -> None:
+        """Tests the snapshots and the add_to_history method, includes unchanged tiles."""
+
+        canvas: Canvas = Canvas(2, 3)
+        canvas.tiles[1, 2] = 0xFF0000FF
+        np.testing.assert_array_equal(get_snapshot_tiles(get_snapshot(canvas.tiles)), canvas.tiles)
+
+        canvas.selected_tiles[0, 0] = True
+        canvas.draw(uint32(0x00FF00FF))
+        canvas.add_to_history()
+        canvas.add_to_history()
+        self.assertEqual(len(canvas.history), 2)
+        self.assertEqual(canvas.history_i, 1)
+        self.assertTupleEqual(canvas.pop_unjournaled_box(), (0, 0, 1, 1))  # type: ignore[arg-type]
+        self.assertIsNone(canvas.pop_unjournaled_box())
+
+        # Adding after an undo drops the redo snapshots
+        canvas.history_i = 0
+        canvas.selected_tiles.fill(True)
+        canvas.draw(uint32(0x0000FFFF))
+        canvas.add_to_history()
+        self.assertEqual(len(canvas.history), 2)
+        np.testing.assert_array_equal(get_snapshot_tiles(canvas.history[1]), canvas.tiles)
+
+        canvas.set_history_max_len(1)
+        self.assertEqual(len(canvas.history), 1)
+        self.assertEqual(canvas.history_i, 0)
+
+    def test_indexed_history(self: Self) -> None:
+        """Tests the incremental indexes of the add_to_history method, includes undo and resize."""
+
+        canvas: Canvas = Canvas(16, 16)
+        for i in range(1, 256):
+            canvas.selected_tiles.fill(False)
+            canvas.selected_tiles[0, 0] = True
+            canvas.draw(uint32(0xFF000000 | i))
+            canvas.add_to_history()
+            np.testing.assert_array_equal(get_snapshot_tiles(canvas.history[-1]), canvas.tiles)
+        self.assertEqual(len(canvas.history), 256)
+        # Colors drawn over are kept until the indexes are full
+        self.assertEqual(_get_snapshot_indexes(canvas.history[-1])[0].size, 256)
+
+        canvas.selected_tiles[1, 0] = True
+        canvas.draw(uint32(0xFFFFFFFF))
+        canvas.add_to_history()
+        np.testing.assert_array_equal(get_snapshot_tiles(canvas.history[-1]), canvas.tiles)
+        self.assertEqual(_get_snapshot_indexes(canvas.history[-1])[0].size, 2)
+
+        # Viewing another snapshot without changes doesn't add one
+        canvas.history_i = 1
+        canvas.set_tiles(get_snapshot_tiles(canvas.history[1]), should_reset_history=False)
+        canvas.add_to_history()
+        self.assertEqual(len(canvas.history), 257)
+        self.assertEqual(canvas.history_i, 1)
+
+        canvas.selected_tiles[0, 0] = True
+        canvas.draw(uint32(0xFFFFFFFF))
+        canvas.add_to_history()
+        self.assertEqual(len(canvas.history), 3)
+        np.testing.assert_array_equal(get_snapshot_tiles(canvas.history[2]), canvas.tiles)
+
+        canvas.set_tiles(np.zeros((2, 2), uint32), should_reset_history=False)
+        canvas.add_to_history()
+        self.assertEqual(len(canvas.history), 4)
+        np.testing.assert_array_equal(get_snapshot_tiles(canvas.history[3]), canvas.tiles)
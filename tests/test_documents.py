@@ -0,0 +1,166 @@
+"""Tests for the documents file."""
+
+from unittest import TestCase, mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Self
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+import src.documents as documents
+from src.documents import (
+    ParkedCanvas, EvictInfo, Document, Documents, try_write_evicted, try_read_evicted,
+)
+from src.canvas import Canvas
+
+
+def _get_canvas(cols: int, rows: int, packed_color: int) -> Canvas:
+    """
+    Gets a canvas with a history entry of a color.
+
+    Args:
+        columns, rows, packed color
+    Returns:
+        canvas
+    """
+
+    canvas: Canvas = Canvas(cols, rows)
+    canvas.selected_tiles.fill(True)
+    canvas.draw(uint32(packed_color))
+    canvas.add_to_history()
+    canvas.selected_tiles.fill(False)
+
+    return canvas
+
+
+class TestDocuments(TestCase):
+    """Tests for the documents file."""
+
+    def setUp(self: Self) -> None:
+        """Creates a temporary directory for the evicted documents."""
+
+        temp_dir: TemporaryDirectory[str] = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._temp_dir_path: Path = Path(temp_dir.name)
+
+        mock.patch.object(documents, "gettempdir", return_value=temp_dir.name).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_park(self: Self) -> None:
+        """Tests the park and try_load methods, includes unchanged tiles sharing the history."""
+
+        doc: Document = Document("a.png", _get_canvas(3, 2, 0xFF0000FF))
+        tiles: NDArray[uint32] = doc.canvas.tiles.copy()  # type: ignore[union-attr]
+        self.assertEqual(doc.parked_size, 0)
+
+        doc.park()
+        self.assertIsNone(doc.canvas)
+        parked_size: int = doc.parked_size
+        self.assertGreater(parked_size, 0)
+
+        # Edited tiles are stored next to the history
+        edited_doc: Document = Document("b.png", _get_canvas(3, 2, 0xFF0000FF))
+        edited_doc.canvas.tiles[0, 0] = 0  # type: ignore[union-attr]
+        edited_doc.park()
+        self.assertGreater(edited_doc.parked_size, parked_size)
+
+        self.assertIsNone(doc.try_load(history_max_len=None))
+        assert doc.canvas is not None
+        np.testing.assert_array_equal(doc.canvas.tiles, tiles)
+        self.assertEqual(len(doc.canvas.history), 2)
+        self.assertEqual(doc.canvas.history_i, 1)
+        self.assertIsNone(doc.canvas.unjournaled_box)
+
+    def test_evict(self: Self) -> None:
+        """Tests the eviction and read of a document, includes activations while writing."""
+
+        doc: Document = Document("a.png", _get_canvas(4, 4, 0x00FF00FF))
+        tiles: NDArray[uint32] = doc.canvas.tiles.copy()  # type: ignore[union-attr]
+        self.assertIsNone(doc.start_evict())
+
+        doc.park()
+        evict_info: EvictInfo | None = doc.start_evict()
+        assert evict_info is not None
+        self.assertIsNone(doc.start_evict())
+        self.assertEqual(doc.parked_size, 0)
+
+        self.assertIsNone(try_write_evicted(evict_info))
+        doc.finish_evict(evict_info, None)
+        self.assertTrue(doc.is_evicted)
+        self.assertTrue(evict_info[0].exists())
+
+        read_path: Path | None = doc.start_read()
+        assert read_path is not None
+        self.assertIsNone(doc.start_read())
+        parked_canvas: ParkedCanvas | None
+        error_str: str | None
+        parked_canvas, error_str = try_read_evicted(read_path)
+        self.assertIsNone(error_str)
+        doc.finish_read(parked_canvas)
+        self.assertFalse(doc.is_evicted)
+        self.assertFalse(evict_info[0].exists())
+
+        self.assertIsNone(doc.try_load(history_max_len=None))
+        assert doc.canvas is not None
+        np.testing.assert_array_equal(doc.canvas.tiles, tiles)
+
+        # Loaded before the write ended, the written project is removed
+        doc.park()
+        evict_info = doc.start_evict()
+        assert evict_info is not None
+        self.assertIsNone(doc.try_load(history_max_len=None))
+        self.assertIsNone(try_write_evicted(evict_info))
+        doc.finish_evict(evict_info, None)
+        self.assertFalse(doc.is_evicted)
+        self.assertListEqual(list(self._temp_dir_path.iterdir()), [])
+
+    def test_read_failure(self: Self) -> None:
+        """Tests the read of missing and invalid temporary projects."""
+
+        parked_canvas: ParkedCanvas | None
+        error_str: str | None
+
+        parked_canvas, error_str = try_read_evicted(self._temp_dir_path / "missing.dixel")
+        self.assertIsNone(parked_canvas)
+        self.assertEqual(error_str, "File missing.")
+
+        invalid_path: Path = self._temp_dir_path / "invalid.dixel"
+        invalid_path.write_bytes(b"invalid")
+        parked_canvas, error_str = try_read_evicted(invalid_path)
+        self.assertIsNone(parked_canvas)
+        self.assertIsNotNone(error_str)
+
+    def test_documents(self: Self) -> None:
+        """Tests the activation, eviction and removal of documents."""
+
+        docs: Documents = Documents(Document("a.png", _get_canvas(2, 2, 0xFF0000FF)))
+        docs.add(Document("b.png", _get_canvas(2, 2, 0x00FF00FF)))
+        docs.add(Document("c.png", _get_canvas(2, 2, 0x0000FFFF)))
+        self.assertEqual(docs.active_i, 2)
+
+        # The least recently used is evicted first
+        self.assertListEqual(docs.start_evict_unused(), [])
+        with mock.patch.object(documents, "_PARKED_MAX_SIZE", docs.docs[1].parked_size):
+            evict_infos: list[tuple[Document, EvictInfo]] = docs.start_evict_unused()
+        self.assertListEqual([doc.file_str for doc, _evict_info in evict_infos], ["a.png"])
+        doc, evict_info = evict_infos[0]
+        doc.finish_evict(evict_info, try_write_evicted(evict_info))
+        self.assertTrue(docs.docs[0].is_evicted)
+
+        # Activating an evicted document reads it
+        self.assertIsNone(docs.activate(0))
+        self.assertEqual(docs.active.file_str, "a.png")
+        self.assertEqual(docs.active.canvas.tiles[0, 0], 0xFF0000FF)  # type: ignore[union-attr]
+        self.assertIsNone(docs.docs[2].canvas)
+
+        docs.remove(docs.docs[1])
+        self.assertListEqual([doc.file_str for doc in docs.docs], ["a.png", "c.png"])
+        self.assertEqual(docs.active_i, 0)
+
+        # Documents that fail to load are removed
+        docs.docs[1]._parked_canvas = None  # Lost canvas
+        self.assertIsNotNone(docs.activate(1))
+        self.assertListEqual([doc.file_str for doc in docs.docs], ["a.png"])
+        self.assertListEqual(list(self._temp_dir_path.iterdir()), [])
@@ -0,0 +1,125 @@
+"""Tests for the journal_utils file."""
+
+from unittest import TestCase, mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Self
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+import src.journal_utils as journal_utils
+from src.journal_utils import (
+    JournalRecord,
+    get_new_journal_path, get_journals_paths, get_journal_record, _parse_journal, replay_journal,
+    try_read_journal, try_write_journal, try_append_journal,
+)
+
+_TILES: NDArray[uint32] = np.arange(4 * 5, dtype=uint32).reshape((4, 5))
+
+
+def _get_num_records(content: bytes) -> int:
+    """
+    Gets the number of records of a valid journal.
+
+    Args:
+        content
+    Returns:
+        number of records
+    """
+
+    journal: tuple[str, list[JournalRecord]] | None = _parse_journal(content)
+    assert journal is not None
+    return len(journal[1])
+
+
+class TestJournalUtils(TestCase):
+    """Tests for the journal_utils file."""
+
+    def test_journals_paths(self: Self) -> None:
+        """Tests the get_new_journal_path and get_journals_paths functions."""
+
+        journal_name: str
+        journal_path: Path
+
+        with TemporaryDirectory() as dir_str:
+            journals_dir_path: Path = Path(dir_str, "journals")
+            with mock.patch.object(journal_utils, "JOURNALS_DIR_PATH", journals_dir_path):
+                self.assertListEqual(get_journals_paths(), [])
+
+                journals_dir_path.mkdir()
+                for journal_name in ("10.bin", "9.bin", "a.bin", "1.tmp"):
+                    (journals_dir_path / journal_name).write_bytes(b"")
+                self.assertListEqual(
+                    [journal_path.name for journal_path in get_journals_paths()],
+                    ["9.bin", "10.bin"]
+                )
+
+                # Journals of a previous session are skipped
+                with mock.patch.object(journal_utils, "_JOURNAL_IDS", iter((9, 10, 11, 12))):
+                    self.assertEqual(get_new_journal_path(), journals_dir_path / "11.bin")
+                    self.assertEqual(get_new_journal_path(), journals_dir_path / "12.bin")
+
+    def test_read_write(self: Self) -> None:
+        """Tests writing, appending and reading a journal in a temporary directory."""
+
+        journal: tuple[str, list[JournalRecord]] | None
+
+        with TemporaryDirectory() as dir_str:
+            journal_path: Path = Path(dir_str, "journals", "0.bin")
+            self.assertIsNone(try_read_journal(journal_path))
+
+            # Creates the directory
+            record: bytes = get_journal_record(_TILES, 1, 2, 2, 3)
+            self.assertIsNone(try_write_journal(journal_path, "a.png", record))
+            self.assertIsNone(
+                try_append_journal(journal_path, get_journal_record(_TILES, 0, 0, 1, 1))
+            )
+            journal = try_read_journal(journal_path)
+
+        assert journal is not None
+        self.assertEqual(journal[0], "a.png")
+        self.assertListEqual([record[:4] for record in journal[1]], [(4, 5, 1, 2), (4, 5, 0, 0)])
+        self.assertTrue(np.array_equal(journal[1][0][4], _TILES[1:3, 2:5]))
+        self.assertTrue(np.array_equal(journal[1][1][4], _TILES[:1, :1]))
+
+    def test_parse_journal(self: Self) -> None:
+        """Tests the _parse_journal function with invalid, cut and corrupted journals."""
+
+        with TemporaryDirectory() as dir_str:
+            journal_path: Path = Path(dir_str, "0.bin")
+            try_write_journal(journal_path, "a.png", b"")
+            header: bytes = journal_path.read_bytes()
+
+        first_record: bytes = get_journal_record(_TILES, 0, 0, 4, 5)
+        second_record: bytes = get_journal_record(_TILES, 1, 1, 2, 2)
+        content: bytes = header + first_record + second_record
+
+        self.assertIsNone(_parse_journal(b""))
+        self.assertIsNone(_parse_journal(b"DXJ0" + content[4:]))
+        self.assertEqual(_parse_journal(header), ("a.png", []))
+        self.assertEqual(_get_num_records(content), 2)
+
+        # A record cut while writing or with a wrong checksum ends the journal
+        self.assertEqual(_get_num_records(content[:-1]), 1)
+        self.assertEqual(_get_num_records(content[:-len(second_record) + 3]), 1)
+        corrupted_content: bytearray = bytearray(content)
+        corrupted_content[-1] ^= 1
+        self.assertEqual(_get_num_records(bytes(corrupted_content)), 1)
+
+    def test_replay_journal(self: Self) -> None:
+        """Tests the replay_journal function."""
+
+        records: list[JournalRecord] = [
+            (4, 5, 1, 1, np.full((2, 2), 7, uint32)),
+            (3, 6, 2, 5, np.full((1, 1), 9, uint32)),  # Resized
+        ]
+        tiles: NDArray[uint32] = replay_journal(_TILES, records)
+
+        expected_tiles: NDArray[uint32] = np.zeros((3, 6), uint32)
+        expected_tiles[:, :5] = _TILES[:3]
+        expected_tiles[1:3, 1:3] = 7
+        expected_tiles[2, 5] = 9
+        self.assertTrue(np.array_equal(tiles, expected_tiles))
+        self.assertTrue(np.array_equal(_TILES, np.arange(4 * 5, dtype=uint32).reshape((4, 5))))
@@ -0,0 +1,172 @@
+"""Tests for the main file."""
+
+from unittest import TestCase, mock
+from unittest.mock import Mock, call
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Self
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+import main
+from main import (
+    _Dixel, _EXIT_OK, _EXIT_CRASH, _EXIT_INTERRUPT, _SETTINGS_UI, _GRID_MANAGER,
+)
+from src.consts import WHITE
+from src.classes.dropdown import Dropdown
+from src.classes.grid import Grid
+from src.canvas import Canvas
+from src.documents import Document, Documents
+import src.journal_utils as journal_utils
+from src.journal_utils import get_journal_record, try_read_journal, try_write_journal
+
+
+class TestDixel(TestCase):
+    """Tests for the _Dixel class."""
+
+    @mock.patch.object(main, "try_remove_file", autospec=True)
+    @mock.patch.object(main, "_try_save_file", autospec=True, return_value=None)
+    @mock.patch.object(_Dixel, "_save_inactive_docs", autospec=True)
+    @mock.patch.object(_Dixel, "_save_palettes", autospec=True)
+    def test_save_journal(
+            self: Self, _mock_save_palettes: Mock, _mock_save_inactive_docs: Mock,
+            _mock_try_save_file: Mock, mock_try_remove_file: Mock
+    ) -> None:
+        """Tests the journal on exit with every autosave mode, mocks the file writes."""
+
+        option_i: int
+        exit_type: int
+        doc: Document
+
+        dixel: _Dixel = object.__new__(_Dixel)
+        dixel._file_str = ""
+        dixel._is_saved = False
+        dixel._orig_win_xy, dixel._orig_win_wh = (0, 0), (1, 1)
+        dixel._is_maximized = dixel._is_fullscreen = False
+        dixel._grid_editor, dixel._grid_ratio = None, None
+        dixel._docs = Documents(Document("", Canvas(1, 1)))
+        dixel._docs.add(Document("a.png", Canvas(1, 1)))
+
+        autosave_dropdown: Dropdown = _SETTINGS_UI.general_settings_manager.autosave_dropdown
+        prev_option_i: int = autosave_dropdown.option_i
+        try:
+            for option_i in range(len(autosave_dropdown.values)):
+                autosave_dropdown.option_i = option_i
+                for exit_type in (_EXIT_OK, _EXIT_CRASH, _EXIT_INTERRUPT):
+                    mock_try_remove_file.reset_mock()
+                    dixel._save(exit_type, should_ask_create_dir=False)
+
+                    # They survive only crashes whether the images are autosaved or not
+                    for doc in dixel._docs.docs:
+                        self.assertEqual(
+                            call(doc.journal_path) in mock_try_remove_file.call_args_list,
+                            exit_type != _EXIT_CRASH
+                        )
+        finally:
+            autosave_dropdown.option_i = prev_option_i
+
+    @mock.patch.object(_Dixel, "_refresh_unsaved_icon", autospec=True)
+    def test_mark_unsaved(self: Self, mock_refresh_unsaved_icon: Mock) -> None:
+        """Tests that edits stay unsaved when the check result is outdated or dropped."""
+
+        dixel: _Dixel = object.__new__(_Dixel)
+        dixel._file_str = "a.png"
+        dixel._is_saved = True
+        dixel._is_checking_unsaved = False
+        dixel._queued_unsaved_color = None
+
+        dixel._mark_unsaved()
+        self.assertFalse(dixel._is_saved)
+        mock_refresh_unsaved_icon.assert_called_once_with(dixel, unsaved_color=WHITE)
+
+        # The file was switched before the check ended
+        dixel._finish_unsaved_check("b.png", WHITE, _GRID_MANAGER.grid.tiles.copy())
+        self.assertFalse(dixel._is_saved)
+        dixel._finish_unsaved_check("a.png", WHITE, _GRID_MANAGER.grid.tiles.copy())
+        self.assertTrue(dixel._is_saved)
+
+    @mock.patch.object(main, "submit_io_job", autospec=True)
+    def test_docs_journals(self: Self, mock_submit_io_job: Mock) -> None:
+        """Tests that every document appends to its own journal, includes new files."""
+
+        grid: Grid = _GRID_MANAGER.grid
+        dixel: _Dixel = object.__new__(_Dixel)
+        dixel._file_str = ""
+        first_doc: Document = Document("", grid.canvas)
+        dixel._docs = Documents(first_doc)
+
+        dixel._upt_journal()  # Started in the first frame
+        grid.canvas.unjournaled_box = (0, 0, 1, 1)
+        dixel._upt_journal()
+        self.assertTrue(all([
+            journal_call.args[3] == first_doc.journal_path
+            for journal_call in mock_submit_io_job.call_args_list
+        ]))
+        self.assertEqual(first_doc.num_journal_records, 1)
+
+        # Both are new files, the journal of the second one is started anyway
+        mock_submit_io_job.reset_mock()
+        second_doc: Document = Document("", Canvas(2, 2))
+        dixel._docs.add(second_doc)
+        with mock.patch.object(grid, "canvas", second_doc.canvas):
+            dixel._upt_journal()
+            grid.canvas.unjournaled_box = (0, 0, 2, 2)
+            dixel._upt_journal()
+        self.assertNotEqual(first_doc.journal_path, second_doc.journal_path)
+        self.assertTrue(all([
+            journal_call.args[3] == second_doc.journal_path
+            for journal_call in mock_submit_io_job.call_args_list
+        ]))
+        self.assertEqual(mock_submit_io_job.call_count, 2)  # Reset and append
+        self.assertEqual(first_doc.num_journal_records, 1)
+
+    @mock.patch.object(main, "_UNSAVED_ICON")
+    def test_recover_journals(self: Self, _mock_unsaved_icon: Mock) -> None:
+        """Tests the recovery of the journals of the active and inactive documents."""
+
+        grid: Grid = _GRID_MANAGER.grid
+        prev_tiles: NDArray[uint32] = grid.tiles
+        with TemporaryDirectory() as dir_str:
+            journals_dir_path: Path = Path(dir_str)
+            with mock.patch.object(journal_utils, "JOURNALS_DIR_PATH", journals_dir_path):
+                edited_tiles: NDArray[uint32] = np.full((3, 2), 0xFF0000FF, uint32)
+                try_write_journal(
+                    journals_dir_path / "0.bin", "", get_journal_record(edited_tiles, 0, 0, 3, 2)
+                )
+                try_write_journal(
+                    journals_dir_path / "1.bin", "", get_journal_record(edited_tiles, 1, 1, 1, 1)
+                )
+                try_write_journal(journals_dir_path / "2.bin", "", b"")
+
+                dixel: _Dixel = object.__new__(_Dixel)
+                dixel._file_str = ""
+                dixel._is_saved = True
+                dixel._docs = Documents(Document("", grid.canvas))
+                try:
+                    dixel._recover_journals()
+
+                    np.testing.assert_array_equal(grid.tiles, edited_tiles)
+                    self.assertFalse(dixel._is_saved)
+                finally:
+                    grid.set_info(
+                        prev_tiles, grid.visible_cols, grid.visible_rows,
+                        grid.offset_x, grid.offset_y, should_reset_history=True
+                    )
+
+                self.assertEqual(dixel._docs.active_i, 0)
+                self.assertListEqual(
+                    [doc.journal_path.name for doc in dixel._docs.docs], ["0.bin", "1.bin"]
+                )
+                self.assertListEqual([doc.num_journal_records for doc in dixel._docs.docs], [1, 1])
+
+                # Without a file only the edited tiles are recovered
+                inactive_doc: Document = dixel._docs.docs[1]
+                self.assertIsNone(inactive_doc.try_load(history_max_len=None))
+                expected_tiles: NDArray[uint32] = np.zeros((3, 2), uint32)
+                expected_tiles[1, 1] = 0xFF0000FF
+                np.testing.assert_array_equal(
+                    inactive_doc.canvas.tiles, expected_tiles  # type: ignore[union-attr]
+                )
+                self.assertIsNone(try_read_journal(journals_dir_path / "2.bin"))
@@ -0,0 +1,171 @@
+"""Tests for the project_utils file."""
+
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from zlib import compress, crc32
+from typing import Self, Any
+
+import numpy as np
+from numpy import uint32
+from numpy.typing import NDArray
+
+from src.project_utils import (
+    _HEADER_STRUCT, _CHUNK_STRUCT, _LEGACY_MAGIC, _LEGACY_HEADER_STRUCT,
+    get_project_info_bytes, read_project_tiles, read_project_info, save_project,
+)
+from src.file_utils import FileError
+
+_HISTORY: list[tuple[int, int, bytes, bytes]] = [(3, 4, b"palette", b"indexes")]
+
+
+def _read_project(file_path: Path) -> tuple[NDArray[uint32], dict[str, Any]]:
+    """
+    Reads the tiles and info of a project.
+
+    Args:
+        path
+    Returns:
+        tiles, info
+    """
+
+    with file_path.open("rb") as f:
+        tiles: NDArray[uint32] = read_project_tiles(f)
+        info: dict[str, Any] = read_project_info(f)[0]
+
+    return tiles, info
+
+
+class TestProjectUtils(TestCase):
+    """Tests for the project_utils file."""
+
+    _tiles: NDArray[uint32]
+    _info_bytes: bytes
+
+    @classmethod
+    def setUpClass(cls: type["TestProjectUtils"]) -> None:
+        """Creates the tiles with more than one chunk and the info."""
+
+        cls._tiles = np.random.default_rng(0).integers(0, 2 ** 32, (130, 70), uint32)
+        cls._info_bytes = get_project_info_bytes(10, 11, 1, 2, ["ff0000"], _HISTORY, 0)
+
+    def test_round_trip(self: Self) -> None:
+        """Tests saving and reading a project."""
+
+        with TemporaryDirectory() as dir_str:
+            file_path: Path = Path(dir_str, "a.dixel")
+            save_project(file_path, self._tiles, self._info_bytes)
+
+            tiles: NDArray[uint32]
+            info: dict[str, Any]
+            tiles, info = _read_project(file_path)
+            with file_path.open("rb") as f:
+                history: list[tuple[int, int, bytes, bytes]] = read_project_info(f)[1]
+
+        self.assertTrue(np.array_equal(tiles, self._tiles))
+        self.assertEqual(
+            (info["visible_cols"], info["visible_rows"], info["offset_x"], info["offset_y"]),
+            (10, 11, 1, 2)
+        )
+        self.assertListEqual(info["palette"], ["ff0000"])
+        self.assertListEqual(history, _HISTORY)
+
+    def test_append(self: Self) -> None:
+        """Tests that saving the same project appends the changed chunk in the other slot."""
+
+        with TemporaryDirectory() as dir_str:
+            file_path: Path = Path(dir_str, "a.dixel")
+            save_project(file_path, self._tiles, self._info_bytes)
+            prev_content: bytes = file_path.read_bytes()
+
+            tiles: NDArray[uint32] = self._tiles.copy()
+            tiles[0, 0] += 1
+            save_project(file_path, tiles, self._info_bytes)
+            content: bytes = file_path.read_bytes()
+            read_tiles: NDArray[uint32] = _read_project(file_path)[0]
+
+        self.assertTrue(np.array_equal(read_tiles, tiles))
+        self.assertGreater(len(content), len(prev_content))
+        # Only the second slot is written, the first one still references the previous save
+        self.assertEqual(content[:_HEADER_STRUCT.size], prev_content[:_HEADER_STRUCT.size])
+        self.assertEqual(
+            content[2 * _HEADER_STRUCT.size:len(prev_content)],
+            prev_content[2 * _HEADER_STRUCT.size:]
+        )
+        self.assertEqual(_HEADER_STRUCT.unpack_from(content, _HEADER_STRUCT.size)[1], 1)
+
+    def test_cut_save(self: Self) -> None:
+        """Tests that a save cut while writing the slot leaves the previous one readable."""
+
+        with TemporaryDirectory() as dir_str:
+            file_path: Path = Path(dir_str, "a.dixel")
+            save_project(file_path, self._tiles, self._info_bytes)
+
+            tiles: NDArray[uint32] = self._tiles.copy()
+            tiles[-1, -1] += 1
+            save_project(file_path, tiles, self._info_bytes)
+            content: bytearray = bytearray(file_path.read_bytes())
+            content[_HEADER_STRUCT.size + 8] ^= 1  # Columns of the new slot
+            file_path.write_bytes(content)
+            read_tiles: NDArray[uint32] = _read_project(file_path)[0]
+
+            content[8] ^= 1
+            file_path.write_bytes(content)
+            with file_path.open("rb") as f, self.assertRaises(FileError):
+                read_project_tiles(f)
+
+        self.assertTrue(np.array_equal(read_tiles, self._tiles))
+
+    def test_repack(self: Self) -> None:
+        """Tests that repeated saves with the same info don't grow the file without bound."""
+
+        i: int
+
+        with TemporaryDirectory() as dir_str:
+            file_path: Path = Path(dir_str, "a.dixel")
+            save_project(file_path, self._tiles, self._info_bytes)
+            first_size: int = file_path.stat().st_size
+
+            big_info_bytes: bytes = get_project_info_bytes(
+                10, 11, 1, 2, [], [(3, 4, bytes(100_000), b"")], 0
+            )
+            sizes: list[int] = []
+            for i in range(16):
+                tiles: NDArray[uint32] = self._tiles.copy()
+                tiles[0, 0] += i
+                save_project(file_path, tiles, big_info_bytes)
+                sizes.append(file_path.stat().st_size)
+            read_tiles: NDArray[uint32] = _read_project(file_path)[0]
+
+        self.assertTrue(np.array_equal(read_tiles, tiles))
+        # Stale infos are unused space, with the used space they can at most double the file
+        self.assertLess(max(sizes), 2 * (first_size + len(big_info_bytes)))
+        self.assertLess(min(sizes[1:]), sizes[0] + len(big_info_bytes))
+
+    def test_legacy(self: Self) -> None:
+        """Tests reading a project with one header followed by the table."""
+
+        chunk_bytes: bytes = compress(self._tiles[:64, :64].tobytes())
+        tiles: NDArray[uint32] = np.ascontiguousarray(self._tiles[:64, :64])
+        data_offset: int = _LEGACY_HEADER_STRUCT.size + _CHUNK_STRUCT.size
+        content: bytes = (
+            _LEGACY_HEADER_STRUCT.pack(
+                _LEGACY_MAGIC, 64, 64, 64, data_offset + len(chunk_bytes), len(self._info_bytes)
+            ) +
+            _CHUNK_STRUCT.pack(data_offset, len(chunk_bytes), crc32(tiles.tobytes())) +
+            chunk_bytes + self._info_bytes
+        )
+
+        with TemporaryDirectory() as dir_str:
+            file_path: Path = Path(dir_str, "a.dixel")
+            file_path.write_bytes(content)
+            read_tiles: NDArray[uint32]
+            info: dict[str, Any]
+            read_tiles, info = _read_project(file_path)
+
+            # Saving rewrites it with the new header
+            save_project(file_path, tiles, self._info_bytes)
+            self.assertTrue(np.array_equal(_read_project(file_path)[0], tiles))
+
+        self.assertTrue(np.array_equal(read_tiles, tiles))
+        self.assertListEqual(info["palette"], ["ff0000"])
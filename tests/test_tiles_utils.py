@@ -0,0 +1,109 @@
+"""Tests for the tiles_utils file."""
+
+from unittest import TestCase
+from typing import Self
+
+import numpy as np
+from numpy import uint8, uint32
+from numpy.typing import NDArray
+
+from src.tiles_utils import (
+    get_rgba_view, get_indexed_tiles, get_tiles_palette, get_kmeans_palette, quantize_tiles,
+)
+
+
+def _get_tiles(rgbas: list[list[tuple[int, int, int, int]]]) -> NDArray[uint32]:
+    """
+    Gets tiles from rgba values.
+
+    Args:
+        rgba values with shape (columns, rows)
+    Returns:
+        tiles
+    """
+
+    return np.array(rgbas, uint8).view(uint32)[..., 0]
+
+
+class TestTilesUtils(TestCase):
+    """Tests for the tiles_utils file."""
+
+    def test_get_indexed_tiles(self: Self) -> None:
+        """Tests the get_indexed_tiles function."""
+
+        tiles: NDArray[uint32] = _get_tiles([
+            [(1, 2, 3, 255), (0, 0, 0, 0)],
+            [(1, 2, 3, 255), (4, 5, 6, 255)],
+        ])
+        colors: NDArray[uint32]
+        indexes: NDArray[uint8]
+
+        colors, indexes = get_indexed_tiles(tiles)
+        self.assertEqual(colors.size, 3)
+        self.assertEqual(indexes.dtype, uint8)
+        np.testing.assert_array_equal(colors[indexes], tiles)
+
+    def test_get_tiles_palette(self: Self) -> None:
+        """Tests the get_tiles_palette function, includes transparent tiles and the maximum size."""
+
+        tiles: NDArray[uint32] = _get_tiles([
+            [(255, 0, 0, 255), (255, 0, 0, 128), (0, 0, 255, 255)],
+            [(0, 255, 0, 255), (0, 255, 0, 255), (9, 9, 9, 0)],
+            [(128, 128, 128, 255), (0, 0, 255, 255), (0, 0, 255, 255)],
+        ])
+
+        # Alpha is ignored and transparent tiles are skipped, ties are sorted by color
+        self.assertListEqual(
+            get_tiles_palette(tiles, max_size=8, should_sort_by_hue=False),
+            ["0000ff", "ff0000", "00ff00", "808080"]
+        )
+        self.assertListEqual(
+            get_tiles_palette(tiles, max_size=1, should_sort_by_hue=False), ["0000ff"]
+        )
+        # Grays first, then red, green and blue
+        self.assertListEqual(
+            get_tiles_palette(tiles, max_size=8, should_sort_by_hue=True),
+            ["808080", "ff0000", "00ff00", "0000ff"]
+        )
+        self.assertListEqual(
+            get_tiles_palette(np.zeros((2, 2), uint32), max_size=8, should_sort_by_hue=True), []
+        )
+
+    def test_get_kmeans_palette(self: Self) -> None:
+        """Tests the get_kmeans_palette function, includes tiles with few colors."""
+
+        tiles: NDArray[uint32] = _get_tiles([
+            [(255, 0, 0, 255), (250, 0, 0, 255), (0, 0, 255, 255)],
+            [(255, 0, 0, 255), (0, 0, 250, 255), (0, 0, 0, 0)],
+        ])
+
+        self.assertSetEqual(
+            set(get_kmeans_palette(tiles, 8)), {"ff0000", "fa0000", "0000ff", "0000fa"}
+        )
+
+        hex_colors: list[str] = get_kmeans_palette(tiles, 2)
+        self.assertEqual(len(hex_colors), 2)
+        self.assertListEqual(hex_colors, ["fd0000", "0000fc"])  # The biggest cluster is first
+        self.assertListEqual(get_kmeans_palette(tiles, 2), hex_colors)
+
+    def test_quantize_tiles(self: Self) -> None:
+        """Tests the quantize_tiles function, includes the alpha and an empty palette."""
+
+        tiles: NDArray[uint32] = _get_tiles([
+            [(250, 10, 10, 255), (10, 10, 240, 128)],
+            [(100, 100, 100, 0), (20, 200, 20, 255)],
+        ])
+
+        quantized_tiles: NDArray[uint32] = quantize_tiles(tiles, ["ff0000", "0000ff"])
+        np.testing.assert_array_equal(quantized_tiles, _get_tiles([
+            [(255, 0, 0, 255), (0, 0, 255, 128)],
+            [(100, 100, 100, 0), (255, 0, 0, 255)],  # Equal distances pick the first color
+        ]))
+
+        quantized_tiles = quantize_tiles(tiles, ["00ff00"])
+        np.testing.assert_array_equal(
+            get_rgba_view(quantized_tiles)[..., 3], [[255, 128], [0, 255]]
+        )
+        self.assertTrue((get_rgba_view(quantized_tiles)[[0, 0, 1], [0, 1, 1], 1] == 255).all())
+
+        np.testing.assert_array_equal(quantize_tiles(tiles, []), tiles)